@@ -1,39 +1,234 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-from models import db, Movie
-import requests
+from markupsafe import Markup
+from models import db, Movie, ensure_indexes
+import browse
+import cards
+import compression
+import cooccur
+import database
+import fragments
+import httpcache
+import images
+import metrics
+import profiling
+import recommender
+import recs_store
+import refresh
+import shadow
+import snapshot
+from sqlalchemy import insert
 from urllib.parse import quote_plus
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import math
 import os
+import threading
+import time
 import uuid
 from dotenv import load_dotenv
 
 # Load environment variables (.env) early so TMDB_API_KEY is available when app starts
 load_dotenv()
 
-# Simple in-memory store for recommendations keyed by a short token.
-# This avoids putting large lists into the cookie-based session.
-RECS_STORE = {}
+# Recommendation page size; /recommendations_data also accepts per_page and pages (several pages per response)
+RECS_PAGE_SIZE = int(os.environ.get('RECS_PAGE_SIZE', 10))
+RECS_MAX_PAGES = 10
+# Hydrated cards per recommendation token, filled as its pages are served: token -> (data version, {id: card})
+RECS_ROWS = {}
+RECS_ROWS_MAX_TOKENS = 256
+_recs_rows_lock = threading.Lock()
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///movies.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.secret_key = os.urandom(24)
-db.init_app(app)
+metrics.instrument_sqlalchemy()
+metrics.Gauge('recs_store_entries', 'Recommendation lists cached by this worker (see recs_store.py).', recs_store.size)
+metrics.Gauge('card_cache_entries', 'Movie cards held in the card cache.', cards.size)
+metrics.Gauge('tmdb_list_cache_entries', 'TMDb list pages held in TMDB_LIST_CACHE.', lambda: len(TMDB_LIST_CACHE))
 
 # TMDb settings
 TMDB_API_KEY = os.environ.get('TMDB_API_KEY')
+TMDB_API_BASE = 'https://api.themoviedb.org/3'
 TMDB_IMAGE_BASE = 'https://image.tmdb.org/t/p'
 
 # simple in-memory cache for discovered top movies
 TMDB_DISCOVER_CACHE = {'ts': 0, 'movies': []}
 TMDB_CACHE_TTL = 60 * 60  # 1 hour
 
+# Parsed TMDb discover pages keyed by URL: url -> (fetched_at, data)
+TMDB_LIST_CACHE = {}
+TMDB_LIST_CACHE_MAX = 1024
+# /movies_api warms this many following pages in the background after serving a page (0 disables)
+TMDB_PREFETCH_DEPTH = int(os.environ.get('TMDB_PREFETCH_DEPTH', 1))
+_list_cache_lock = threading.Lock()
+_list_prefetching = {}  # url -> Future of an in-flight background fetch
+_prefetch_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('TMDB_PREFETCH_WORKERS', 4)),
+                                    thread_name_prefix='tmdb-prefetch')
+
+# The home carousels and first discover pages are refreshed in the background every
+# TMDB_REFRESH_INTERVAL seconds (+/- TMDB_REFRESH_JITTER), ahead of expiry; 0 disables it.
+TMDB_REFRESH_INTERVAL = float(os.environ.get('TMDB_REFRESH_INTERVAL', 300))
+TMDB_REFRESH_JITTER = float(os.environ.get('TMDB_REFRESH_JITTER', 0.1))
+TMDB_WARM_PAGES = int(os.environ.get('TMDB_WARM_PAGES', 2))
+# after a failed fetch the last good copy is served for this long before the next attempt
+TMDB_RETRY_AFTER = 60
+# refreshed lists are shared with the other workers through files here
+TMDB_SHARED_DIR = os.environ.get('TMDB_SHARED_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                 'instance', 'tmdb_lists'))
+_shared_lists = refresh.SharedStore(TMDB_SHARED_DIR)
+_warm_urls = set()
+_refresh_scheduler = None
+
+# Browser/CDN caching per endpoint. TMDb-backed responses are stable for as long as
+# the list cache keeps a page; a session's recommendation list never changes.
+CACHE_POLICIES = {
+    'movies_api': httpcache.Policy(f'public, max-age={TMDB_CACHE_TTL}', TMDB_CACHE_TTL),
+    'search': httpcache.Policy('public, max-age=300', 300),
+    'movie_detail': httpcache.Policy(f'public, max-age={TMDB_CACHE_TTL}', TMDB_CACHE_TTL),
+    'external_movie': httpcache.Policy(f'public, max-age={TMDB_CACHE_TTL}', TMDB_CACHE_TTL),
+    'recommendations_data': httpcache.Policy(f'private, max-age={TMDB_CACHE_TTL}', TMDB_CACHE_TTL,
+                                             vary=('Cookie',), per_session=True),
+}
+
+# JSON recommendation API limits
+API_MAX_K = 100
+API_MAX_SEEDS = 20
+# longer (or weighted) seed lists are scored as a taste profile, up to this many
+API_MAX_HISTORY = 1000
+API_MAX_BATCH = 500
+API_MAX_UPSERT = 1000
+# ids are stored and serialized as signed 64-bit integers
+ID_LIMIT = 2 ** 63
+# concurrent TMDb detail fetches per upsert batch
+_upsert_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('TMDB_UPSERT_WORKERS', 8)),
+                                  thread_name_prefix='tmdb-upsert')
+
+
+# (rule, view, options) collected by @route; create_app registers them with the
+# view function names as endpoints, so url_for('home') etc. work on every app
+_routes = []
+
+
+def route(rule, **options):
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
+
+
+# endpoint -> function(**view_args) returning the [(endpoint, url, timeout)] TMDb GETs
+# that endpoint's view is going to make for the current request (run in a request
+# context); asgi.py fetches them concurrently before the view runs
+TMDB_CALLS = {}
+
+
+def tmdb_calls(endpoint):
+    def decorator(fn):
+        TMDB_CALLS[endpoint] = fn
+        return fn
+    return decorator
+
+
+# Upstream responses already fetched for this request by the ASGI front end
+# (asgi.py), keyed by URL. Values are responses or the exception raised.
+TMDB_PREFETCHED = contextvars.ContextVar('tmdb_prefetched', default=None)
+
+
+def tmdb_get(endpoint, url, timeout=10):
+    """GET a TMDb URL, recording latency and errors under ``endpoint``."""
+    prefetched = TMDB_PREFETCHED.get()
+    if prefetched and url in prefetched:
+        r = prefetched.pop(url)
+        if isinstance(r, Exception):
+            raise r
+        return r
+    import requests  # deferred so workers and scripts that never call TMDb start without it
+
+    try:
+        with metrics.TMDB_LATENCY.time(timing='tmdb', endpoint=endpoint):
+            r = requests.get(url, timeout=timeout)
+    except Exception:
+        metrics.TMDB_ERRORS.inc(endpoint=endpoint)
+        raise
+    if r.status_code != 200:
+        metrics.TMDB_ERRORS.inc(endpoint=endpoint)
+    return r
+
+
+def tmdb_detail_url(tmdb_id):
+    return f'{TMDB_API_BASE}/movie/{tmdb_id}?api_key={TMDB_API_KEY}&append_to_response=credits,videos'
+
+
+def tmdb_search_url(query, page=1):
+    return f'{TMDB_API_BASE}/search/movie?api_key={TMDB_API_KEY}&query={quote_plus(query)}&page={page}'
+
+
+def tmdb_discover_url(page=1, min_vote_count=50, sort_by='rating', order='desc', min_rating=0.0, bound=None):
+    """Discover URL; ``bound`` keeps only movies at or past that rating/year in the sort order."""
+    sort_mapping = {
+        'rating': 'vote_average',
+        'year': 'primary_release_date',
+        'title': 'original_title'
+    }
+    tmdb_sort_field = sort_mapping.get(sort_by, 'vote_average')
+    tmdb_order = 'asc' if order == 'asc' else 'desc'
+    sort_param = f'{tmdb_sort_field}.{tmdb_order}'
+
+    min_rating = max(0.0, min(10.0, float(min_rating or 0.0)))
+    max_rating = None
+    if bound is not None and tmdb_sort_field == 'vote_average':
+        if tmdb_order == 'asc':
+            min_rating = max(min_rating, float(bound))
+        else:
+            max_rating = float(bound)
+
+    url = (
+        f'{TMDB_API_BASE}/discover/movie'
+        f'?api_key={TMDB_API_KEY}'
+        f'&sort_by={sort_param}'
+        f'&vote_count.gte={min_vote_count}'
+        f'&page={page}'
+        f'&include_adult=false'
+    )
+
+    if min_rating > 0:
+        url += f'&vote_average.gte={min_rating}'
+    if max_rating is not None:
+        url += f'&vote_average.lte={max_rating}'
+    if bound is not None and tmdb_sort_field == 'primary_release_date':
+        if tmdb_order == 'asc':
+            url += f'&primary_release_date.gte={int(bound):04d}-01-01'
+        else:
+            url += f'&primary_release_date.lte={int(bound):04d}-12-31'
+    return url
+
+
+# Home page carousels: name -> URL
+TMDB_LIST_URLS = {
+    'trending': f'{TMDB_API_BASE}/trending/movie/week?api_key={TMDB_API_KEY}',
+    'now_playing': f'{TMDB_API_BASE}/movie/now_playing?api_key={TMDB_API_KEY}&region=US',
+    'upcoming': f'{TMDB_API_BASE}/movie/upcoming?api_key={TMDB_API_KEY}&region=US',
+}
+
+
+def wants_overview(args):
+    """Overviews are left out of list payloads unless the client asks with ?include=overview."""
+    return 'overview' in args.get('include', '').split(',')
+
+
+def movies_api_params(args):
+    """Parse /movies_api query args (shared with the ASGI front end)."""
+    return {
+        'page': args.get('page', 1, type=int),
+        'per_page': args.get('per_page', 20, type=int),
+        'sort_by': args.get('sort_by', 'rating'),
+        'order': args.get('order', 'desc'),
+        'min_rating': args.get('min_rating', 0, type=float),
+    }
+
 
 def tmdb_popular(page=1):
     if not TMDB_API_KEY:
         return []
     url = f'https://api.themoviedb.org/3/movie/popular?api_key={TMDB_API_KEY}&page={page}'
-    r = requests.get(url, timeout=10)
+    r = tmdb_get('popular', url, timeout=10)
     if r.status_code != 200:
         return []
     data = r.json()
@@ -54,8 +249,7 @@ def tmdb_popular(page=1):
 def tmdb_movie_detail(tmdb_id):
     if not TMDB_API_KEY:
         return None
-    url = f'https://api.themoviedb.org/3/movie/{tmdb_id}?api_key={TMDB_API_KEY}&append_to_response=credits,videos'
-    r = requests.get(url, timeout=10)
+    r = tmdb_get('movie_detail', tmdb_detail_url(tmdb_id), timeout=10)
     if r.status_code != 200:
         return None
     data = r.json()
@@ -106,82 +300,177 @@ def tmdb_movie_detail(tmdb_id):
     }
 
 
-def get_top_tmdb_movies(page=1, per_page=20, min_vote_count=50, sort_by='rating', order='desc', min_rating=0.0):
-    """Fetch movies from TMDb discover API with pagination support for infinite scroll."""
-    sort_mapping = {
-        'rating': 'vote_average',
-        'year': 'primary_release_date',
-        'title': 'original_title'
-    }
-    tmdb_sort_field = sort_mapping.get(sort_by, 'vote_average')
-    tmdb_order = 'asc' if order == 'asc' else 'desc'
-    sort_param = f'{tmdb_sort_field}.{tmdb_order}'
+def list_cache_get(url):
+    entry = TMDB_LIST_CACHE.get(url)
+    if entry and time.time() - entry[0] < TMDB_CACHE_TTL:
+        return entry[1]
+    if url in _warm_urls:
+        # another worker may have refreshed it since
+        shared = _shared_lists.load(url)
+        if shared and time.time() - shared[0] < TMDB_CACHE_TTL and (not entry or shared[0] > entry[0]):
+            list_cache_put(url, shared[1], fetched_at=shared[0])
+            return shared[1]
+    return None
+
+
+def list_cache_put(url, data, fetched_at=None):
+    with _list_cache_lock:
+        TMDB_LIST_CACHE.pop(url, None)
+        while len(TMDB_LIST_CACHE) >= TMDB_LIST_CACHE_MAX:
+            # dicts keep insertion order, so this drops the oldest page
+            TMDB_LIST_CACHE.pop(next(iter(TMDB_LIST_CACHE)))
+        TMDB_LIST_CACHE[url] = (time.time() if fetched_at is None else fetched_at, data)
+
+
+def list_cache_fallback(url):
+    """The last good copy of ``url`` after a failed fetch (or None), kept for TMDB_RETRY_AFTER more seconds."""
+    entry = TMDB_LIST_CACHE.get(url) or _shared_lists.load(url)
+    if entry is None:
+        return None
+    list_cache_put(url, entry[1], fetched_at=max(entry[0], time.time() - TMDB_CACHE_TTL + TMDB_RETRY_AFTER))
+    return entry[1]
 
-    min_rating = max(0.0, min(10.0, float(min_rating or 0.0)))
 
-    url = (
-        f'https://api.themoviedb.org/3/discover/movie'
-        f'?api_key={TMDB_API_KEY}'
-        f'&sort_by={sort_param}'
-        f'&vote_count.gte={min_vote_count}'
-        f'&page={page}'
-        f'&include_adult=false'
-    )
+def list_cache_version(url):
+    """When the cached page for ``url`` was fetched, or None if it is not cached."""
+    entry = TMDB_LIST_CACHE.get(url)
+    if entry and time.time() - entry[0] < TMDB_CACHE_TTL:
+        return entry[0]
+    return None
 
-    if min_rating > 0:
-        url += f'&vote_average.gte={min_rating}'
+
+def list_cache_ready(url):
+    """True if ``url`` is cached or already being fetched in the background."""
+    return url in _list_prefetching or list_cache_get(url) is not None
+
+
+def fetch_discover_page(url):
+    """All results of one discover page, from TMDb; cached. None if TMDb did not answer 200."""
+    r = tmdb_get('discover', url, timeout=10)
+    if r.status_code != 200:
+        return None
+
+    data = r.json()
+    movies = []
+    for item in data.get('results', []):
+        poster = item.get('poster_path')
+        poster_url = (TMDB_IMAGE_BASE + '/w342' + poster) if poster else 'https://via.placeholder.com/500x750.png?text=No+Image'
+        movies.append({
+            'tmdb_id': item.get('id'),
+            'title': item.get('title'),
+            'poster_url': poster_url,
+            'overview': item.get('overview') or '',
+            'year': (item.get('release_date') or '')[:4],
+            'vote_average': item.get('vote_average') or 0,
+            'vote_count': item.get('vote_count') or 0
+        })
+    page = {'results': movies, 'total_pages': data.get('total_pages', 1)}
+    list_cache_put(url, page)
+    return page
+
+
+def _prefetch_discover_page(url):
+    try:
+        fetch_discover_page(url)
+    except Exception as e:
+        print(f"TMDb prefetch error: {e}")
+    finally:
+        with _list_cache_lock:
+            _list_prefetching.pop(url, None)
+
+
+def prefetch_discover_pages(page, total_pages, depth=None, min_vote_count=50, sort_by='rating', order='desc',
+                            min_rating=0.0, bound=None):
+    """Warm the list cache with the ``depth`` pages after ``page`` for the same sort and filters."""
+    depth = TMDB_PREFETCH_DEPTH if depth is None else depth
+    for next_page in range(page + 1, min(page + depth, total_pages) + 1):
+        url = tmdb_discover_url(page=next_page, min_vote_count=min_vote_count, sort_by=sort_by, order=order,
+                                min_rating=min_rating, bound=bound)
+        with _list_cache_lock:
+            if list_cache_ready(url):
+                continue
+            _list_prefetching[url] = _prefetch_pool.submit(_prefetch_discover_page, url)
+
+
+def get_top_tmdb_movies(page=1, per_page=20, min_vote_count=50, sort_by='rating', order='desc', min_rating=0.0,
+                        bound=None):
+    """Fetch movies from TMDb discover API with pagination support for infinite scroll."""
+    url = tmdb_discover_url(page=page, min_vote_count=min_vote_count, sort_by=sort_by, order=order,
+                            min_rating=min_rating, bound=bound)
     try:
-        r = requests.get(url, timeout=10)
-        if r.status_code != 200:
+        # a background prefetch of this page may still be in flight; wait for it rather than fetch twice
+        pending = _list_prefetching.get(url)
+        if pending is not None:
+            pending.result(timeout=10)
+        data = list_cache_get(url)
+        metrics.cache_lookup('tmdb_list', data is not None)
+        if data is None:
+            try:
+                data = fetch_discover_page(url)
+            except Exception as e:
+                print(f"TMDb API error: {e}")
+            if data is None:
+                data = list_cache_fallback(url)
+        if data is None:
             return {'results': [], 'total_pages': 0, 'page': page}
-        
-        data = r.json()
-        movies = []
-        for item in data.get('results', [])[:per_page]:
-            poster = item.get('poster_path')
-            poster_url = (TMDB_IMAGE_BASE + '/w342' + poster) if poster else 'https://via.placeholder.com/500x750.png?text=No+Image'
-            movies.append({
-                'tmdb_id': item.get('id'),
-                'title': item.get('title'),
-                'poster_url': poster_url,
-                'overview': item.get('overview') or '',
-                'year': (item.get('release_date') or '')[:4],
-                'vote_average': item.get('vote_average') or 0,
-                'vote_count': item.get('vote_count') or 0
-            })
-        
+
         return {
-            'results': movies,
-            'total_pages': data.get('total_pages', 1),
+            'results': data['results'][:per_page],
+            'total_pages': data['total_pages'],
             'page': page
         }
     except Exception as e:
         print(f"TMDb API error: {e}")
         return {'results': [], 'total_pages': 0, 'page': page}
 
+
+def fetch_list_page(name, limit=10):
+    """Movies of a home carousel (TMDB_LIST_URLS[name]) from TMDb; cached. None if TMDb did not answer 200."""
+    url = TMDB_LIST_URLS[name]
+    r = tmdb_get(name, url, timeout=10)
+    if r.status_code != 200:
+        return None
+    data = r.json()
+    movies = []
+    for item in data.get('results', [])[:limit]:
+        poster = item.get('poster_path')
+        poster_url = (TMDB_IMAGE_BASE + '/w342' + poster) if poster else 'https://via.placeholder.com/500x750.png?text=No+Image'
+        movies.append({
+            'tmdb_id': item.get('id'),
+            'title': item.get('title'),
+            'poster_url': poster_url,
+            'overview': item.get('overview') or '',
+            'year': (item.get('release_date') or '')[:4],
+            'vote_average': item.get('vote_average') or 0,
+            'release_date': item.get('release_date') or ''
+        })
+    list_cache_put(url, movies)
+    return movies
+
+
+def fetch_tmdb_list(name):
+    """Parsed movies of a home carousel, through the list cache; the last good copy if TMDb fails."""
+    url = TMDB_LIST_URLS[name]
+    movies = list_cache_get(url)
+    metrics.cache_lookup('tmdb_list', movies is not None)
+    if movies is not None:
+        return movies
+    try:
+        movies = fetch_list_page(name)
+    except Exception as e:
+        print(f"TMDb {name} API error: {e}")
+        movies = None
+    if movies is None:
+        movies = list_cache_fallback(url)
+    return movies or []
+
+
 def get_tmdb_trending_week():
     """Fetch trending movies this week from TMDb."""
     if not TMDB_API_KEY:
         return []
     try:
-        url = f'https://api.themoviedb.org/3/trending/movie/week?api_key={TMDB_API_KEY}'
-        r = requests.get(url, timeout=10)
-        if r.status_code != 200:
-            return []
-        data = r.json()
-        movies = []
-        for item in data.get('results', [])[:10]:
-            poster = item.get('poster_path')
-            poster_url = (TMDB_IMAGE_BASE + '/w342' + poster) if poster else 'https://via.placeholder.com/500x750.png?text=No+Image'
-            movies.append({
-                'tmdb_id': item.get('id'),
-                'title': item.get('title'),
-                'poster_url': poster_url,
-                'overview': item.get('overview') or '',
-                'year': (item.get('release_date') or '')[:4],
-                'vote_average': item.get('vote_average') or 0
-            })
-        return movies
+        return fetch_tmdb_list('trending')
     except Exception as e:
         print(f"TMDb trending API error: {e}")
         return []
@@ -192,24 +481,7 @@ def get_tmdb_now_playing():
     if not TMDB_API_KEY:
         return []
     try:
-        url = f'https://api.themoviedb.org/3/movie/now_playing?api_key={TMDB_API_KEY}&region=US'
-        r = requests.get(url, timeout=10)
-        if r.status_code != 200:
-            return []
-        data = r.json()
-        movies = []
-        for item in data.get('results', [])[:10]:
-            poster = item.get('poster_path')
-            poster_url = (TMDB_IMAGE_BASE + '/w342' + poster) if poster else 'https://via.placeholder.com/500x750.png?text=No+Image'
-            movies.append({
-                'tmdb_id': item.get('id'),
-                'title': item.get('title'),
-                'poster_url': poster_url,
-                'overview': item.get('overview') or '',
-                'year': (item.get('release_date') or '')[:4],
-                'vote_average': item.get('vote_average') or 0
-            })
-        return movies
+        return fetch_tmdb_list('now_playing')
     except Exception as e:
         print(f"TMDb now playing API error: {e}")
         return []
@@ -220,84 +492,179 @@ def get_tmdb_upcoming():
     if not TMDB_API_KEY:
         return []
     try:
-        url = f'https://api.themoviedb.org/3/movie/upcoming?api_key={TMDB_API_KEY}&region=US'
-        r = requests.get(url, timeout=10)
-        if r.status_code != 200:
-            return []
-        data = r.json()
-        movies = []
-        for item in data.get('results', [])[:10]:
-            poster = item.get('poster_path')
-            poster_url = (TMDB_IMAGE_BASE + '/w342' + poster) if poster else 'https://via.placeholder.com/500x750.png?text=No+Image'
-            movies.append({
-                'tmdb_id': item.get('id'),
-                'title': item.get('title'),
-                'poster_url': poster_url,
-                'overview': item.get('overview') or '',
-                'year': (item.get('release_date') or '')[:4],
-                'vote_average': item.get('vote_average') or 0,
-                'release_date': item.get('release_date') or ''
-            })
-        return movies
+        return fetch_tmdb_list('upcoming')
     except Exception as e:
         print(f"TMDb upcoming API error: {e}")
         return []
 
 
-@app.route('/')
-def home():
-    """Renders the home page with movies loaded directly from TMDb API."""
-    movies = []
-    total_movies = 0
-    trending = []
-    now_playing = []
-    upcoming = []
-    has_next_initial = False
-    
-    if TMDB_API_KEY:
+def warm_jobs():
+    """[(url, fetch)] kept warm by refresh_lists: the carousels, plus the first discover pages in TMDb browse mode."""
+    jobs = [(url, lambda name=name: fetch_list_page(name)) for name, url in TMDB_LIST_URLS.items()]
+    if not browse.use_local():
+        for page in range(1, TMDB_WARM_PAGES + 1):
+            url = tmdb_discover_url(page=page)
+            jobs.append((url, lambda url=url: fetch_discover_page(url)))
+    _warm_urls.update(url for url, _ in jobs)
+    return jobs
+
+
+def refresh_lists(wait=0):
+    """Refresh the warm lists that are due, one worker at a time (needs an app context).
+
+    The worker holding the lock fetches every list older than TMDB_CACHE_TTL minus
+    two refresh intervals, so lists are replaced before they expire, and publishes
+    them through TMDB_SHARED_DIR; the other workers pick those copies up. A failed
+    fetch keeps the last good copy. ``wait`` is how long to wait for the lock.
+    """
+    jobs = warm_jobs()
+    due_age = max(0, TMDB_CACHE_TTL - 2 * TMDB_REFRESH_INTERVAL)
+    with refresh.file_lock(os.path.join(TMDB_SHARED_DIR, 'refresh.lock'), wait) as locked:
+        due = []
+        for url, fetch in jobs:
+            shared = _shared_lists.load(url)
+            if shared is not None and (not locked or time.time() - shared[0] < due_age):
+                entry = TMDB_LIST_CACHE.get(url)
+                if entry is None or entry[0] < shared[0]:
+                    list_cache_put(url, shared[1], fetched_at=shared[0])
+            elif locked:
+                due.append((url, _prefetch_pool.submit(fetch)))
+        for url, future in due:
+            try:
+                data = future.result(timeout=30)
+            except Exception as e:
+                print(f"TMDb refresh error: {e}")
+                data = None
+            if data is None:
+                metrics.TMDB_LIST_REFRESHES.inc(result='error')
+                list_cache_fallback(url)
+                continue
+            entry = TMDB_LIST_CACHE.get(url)
+            _shared_lists.save(url, entry[0] if entry else time.time(), data)
+            metrics.TMDB_LIST_REFRESHES.inc(result='ok')
+
+
+def start_list_refresh(app):
+    """Warm the TMDb lists before this worker serves traffic, then keep them warm in the background."""
+    global _refresh_scheduler
+    if not TMDB_API_KEY or TMDB_REFRESH_INTERVAL <= 0 or _refresh_scheduler is not None:
+        return
+
+    def tick():
+        with app.app_context():
+            refresh_lists()
+
+    with app.app_context():
         try:
-            data = get_top_tmdb_movies(page=1, per_page=20)
-            movies = data.get('results', [])
-            total_movies = data.get('total_pages', 0) * 20
-            has_next_initial = data.get('total_pages', 0) > 1
-            
-            trending = get_tmdb_trending_week()
-            now_playing = get_tmdb_now_playing()
-            upcoming = get_tmdb_upcoming()
+            # the first worker fetches; the others wait for it and load its copies
+            refresh_lists(wait=60)
         except Exception as e:
-            print(f"TMDb API error: {e}")
-            movies = []
-    
-    return render_template('index.html', 
-                         movies=movies, 
-                         total_movies=total_movies,
-                         has_next_initial=has_next_initial,
-                         trending=trending,
-                         now_playing=now_playing,
-                         upcoming=upcoming)
-
-@app.route('/search')
+            print(f"TMDb warm-up error: {e}")
+    _refresh_scheduler = refresh.Scheduler(tick, TMDB_REFRESH_INTERVAL, TMDB_REFRESH_JITTER, 'tmdb-refresh').start()
+
+
+HOME_CAROUSELS = {
+    'trending': get_tmdb_trending_week,
+    'now_playing': get_tmdb_now_playing,
+    'upcoming': get_tmdb_upcoming,
+}
+
+
+def _grid_meta(total_movies, has_next, next_cursor=None):
+    """The hidden element the grid's "Show More" script reads its paging state from."""
+    return Markup(render_template('fragments/movies_meta.html', total_movies=total_movies,
+                                  has_next_initial=has_next, next_cursor=next_cursor))
+
+
+def _home_grid(local):
+    """(html, meta html) of the home movies grid; re-rendered only when its data version changes."""
+    if local:
+        # local writes bump the data version; writes by other processes show up after the TTL
+        version = ('local', httpcache.data_version())
+        hit = fragments.cached('movies_grid', version)
+        if hit:
+            return hit
+        data = browse.local_page(per_page=20)
+        has_next, next_cursor = data['has_next'], data['next_cursor']
+        if not has_next and TMDB_API_KEY:
+            # "Show More" carries on with TMDb discover, past the last local row, once the local rows are used up
+            has_next = True
+            next_cursor = browse.tmdb_cursor(1, browse.sort_name('rating', 'desc'), data['last_value'])
+        meta = _grid_meta(browse.local_count(), has_next, next_cursor)
+        return fragments.render('movies_grid', version, browse.ENRICHED_CHECK_INTERVAL, data['results'], meta)
+
+    if not TMDB_API_KEY:
+        return fragments.render('movies_grid', None, 0, [], _grid_meta(0, False))
+    url = tmdb_discover_url(page=1)
+    hit = fragments.cached('movies_grid', list_cache_version(url))
+    if hit:
+        return hit
+    data = get_top_tmdb_movies(page=1, per_page=20)
+    meta = _grid_meta(data.get('total_pages', 0) * 20, data.get('total_pages', 0) > 1)
+    return fragments.render('movies_grid', list_cache_version(url), TMDB_CACHE_TTL, data.get('results', []), meta)
+
+
+def _home_carousel(name):
+    if not TMDB_API_KEY:
+        return ''
+    url = TMDB_LIST_URLS[name]
+    hit = fragments.cached(name, list_cache_version(url))
+    if hit:
+        return hit[0]
+    movies = HOME_CAROUSELS[name]()
+    return fragments.render(name, list_cache_version(url), TMDB_CACHE_TTL, movies)[0]
+
+
+@route('/')
+def home():
+    """Renders the home page; the grid comes from the local catalog or TMDb (see browse.use_local), carousels from TMDb.
+
+    Each section is a cached fragment (see fragments.py) keyed by the version of the
+    list-cache entry or local data it was rendered from, and the page is those
+    fragments joined into the pre-rendered page shell.
+    """
+    grid, meta = _home_grid(browse.use_local())
+    sections = {name: _home_carousel(name) for name in HOME_CAROUSELS}
+    return fragments.assemble('index.html', dict(sections, movies_grid=grid, movies_meta=meta))
+
+
+@tmdb_calls('home')
+def _home_tmdb_calls():
+    calls = [(name, url, 10) for name, url in TMDB_LIST_URLS.items() if not list_cache_ready(url)]
+    url = tmdb_discover_url(page=1)
+    if not browse.use_local() and not list_cache_ready(url):
+        calls.insert(0, ('discover', url, 10))
+    return calls
+
+
+@route('/search')
 def search():
-    """Searches for movies based on a query string and returns JSON."""
+    """Searches for movies based on a query string and returns JSON (overviews with ?include=overview)."""
     query = request.args.get('q', '')
     page = request.args.get('page', 1, type=int)
     if not query:
         return jsonify({'results': [], 'page': page, 'has_next': False})
 
+    with_overview = wants_overview(request.args)
     results = []
     # first, DB search (only on page 1)
     if page == 1:
         try:
-            db_results = Movie.query.filter(Movie.title.ilike(f'%{query}%')).limit(10).all()
-            for m in db_results:
-                results.append({
+            columns = (Movie.id, Movie.description) if with_overview else (Movie.id,)
+            db_results = db.session.query(*columns).filter(Movie.title.ilike(f'%{query}%')).limit(10).all()
+            found = cards.get_many([row.id for row in db_results])
+            for row in db_results:
+                m = found[row.id]
+                result = {
                     'source': 'db',
                     'id': m.id,
                     'title': m.title,
-                    'poster_url': m.poster_url,
-                    'overview': m.description or '',
+                    'poster_url': images.local_url(m.poster_url, 'w185'),
                     'year': m.year
-                })
+                }
+                if with_overview:
+                    result['overview'] = row.description or ''
+                results.append(result)
         except Exception:
             pass
 
@@ -305,8 +672,7 @@ def search():
     has_next = False
     if TMDB_API_KEY and len(query) >= 2:
         try:
-            url = f'https://api.themoviedb.org/3/search/movie?api_key={TMDB_API_KEY}&query={quote_plus(query)}&page={page}'
-            r = requests.get(url, timeout=8)
+            r = tmdb_get('search', tmdb_search_url(query, page), timeout=8)
             if r.status_code == 200:
                 data = r.json()
                 has_next = data.get('page', 1) < data.get('total_pages', 1)
@@ -317,14 +683,16 @@ def search():
                         continue
                     poster = item.get('poster_path')
                     poster_url = (TMDB_IMAGE_BASE + '/w185' + poster) if poster else 'https://via.placeholder.com/200x300.png?text=No+Image'
-                    results.append({
+                    result = {
                         'source': 'tmdb',
                         'tmdb_id': item.get('id'),
                         'title': title,
-                        'poster_url': poster_url,
-                        'overview': item.get('overview') or '',
+                        'poster_url': images.local_url(poster_url, 'w185'),
                         'year': (item.get('release_date') or '')[:4]
-                    })
+                    }
+                    if with_overview:
+                        result['overview'] = item.get('overview') or ''
+                    results.append(result)
         except Exception:
             pass
 
@@ -334,211 +702,528 @@ def search():
         return jsonify({'results': results, 'page': page, 'has_next': has_next})
 
 
-@app.route('/movies_api')
+def _list_cards(movies):
+    """Copies of list results for the browser: proxied posters, overview only if asked for."""
+    with_overview = wants_overview(request.args)
+    cards = []
+    for movie in movies:
+        card = {k: v for k, v in movie.items() if with_overview or k != 'overview'}
+        card['poster_url'] = images.local_url(movie.get('poster_url'), 'w342')
+        cards.append(card)
+    return cards
+
+
+@tmdb_calls('search')
+def _search_tmdb_calls():
+    query = request.args.get('q', '')
+    if len(query) < 2:
+        return []
+    return [('search', tmdb_search_url(query, request.args.get('page', 1, type=int)), 8)]
+
+
+@route('/movies_api')
 def movies_api():
-    """Return paginated movies from TMDb API for infinite scroll. Params: page (1-based), per_page"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    sort_by = request.args.get('sort_by', 'rating')
-    order = request.args.get('order', 'desc')
-    min_rating = request.args.get('min_rating', 0, type=float)
+    """Return paginated movies for infinite scroll. Params: page (1-based), per_page, cursor (local browse)
+
+    Served from the local catalog when browse.use_local() (keyset pages, the
+    response carries next_cursor) and, once the local rows run out, from TMDb
+    discover without the movies already served; otherwise from TMDb discover.
+    """
+    params = movies_api_params(request.args)
+    page = params['page']
+    if browse.use_local():
+        cursor = request.args.get('cursor')
+        sort = browse.sort_name(params['sort_by'], params['order'])
+        results, has_next, next_cursor = [], False, None
+        try:
+            position = browse.tmdb_position(cursor, sort) if cursor else None
+            if position is None:
+                data = browse.local_page(per_page=params['per_page'], sort_by=params['sort_by'],
+                                         order=params['order'], min_rating=params['min_rating'], cursor=cursor,
+                                         page=page)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if position is None:
+            results, has_next, next_cursor = data['results'], data['has_next'], data['next_cursor']
+            # a ?page= past the local rows has no last row to continue from
+            position = (1, data['last_value']) if results or (not cursor and page <= 1) else None
+        if not has_next and position and TMDB_API_KEY and params['sort_by'] in browse.TMDB_CONTINUED_SORTS:
+            more, next_cursor = _tmdb_continuation(*position, params)
+            results = results + more
+            has_next = next_cursor is not None
+        return jsonify({'results': _list_cards(results), 'page': page, 'has_next': has_next,
+                        'next_cursor': next_cursor})
+
     if not TMDB_API_KEY:
         return jsonify({'results': [], 'page': page, 'has_next': False})
 
-    data = get_top_tmdb_movies(
-        page=page,
-        per_page=per_page,
-        sort_by=sort_by,
-        order=order,
-        min_rating=min_rating
-    )
+    data = get_top_tmdb_movies(**params)
     has_next = page < data.get('total_pages', 0)
-    return jsonify({'results': data.get('results', []), 'page': page, 'has_next': has_next})
+    if has_next:
+        prefetch_discover_pages(page, data['total_pages'], sort_by=params['sort_by'], order=params['order'],
+                                min_rating=params['min_rating'])
+    return jsonify({'results': _list_cards(data.get('results', [])), 'page': page, 'has_next': has_next})
 
-@app.route('/recommend', methods=['POST'])
+
+def _tmdb_continuation(page, bound, params, max_skip=3):
+    """Discover results from ``page`` on without the movies the local browse served, and the next cursor.
+
+    Only movies at or past ``bound`` (the last local row's rating or year) are
+    asked for, so the order carries on from the local rows. Pages whose movies
+    were all served locally are skipped, up to ``max_skip`` pages per call.
+    """
+    discover = {key: params[key] for key in ('sort_by', 'order', 'min_rating')}
+    discover['bound'] = bound
+    for page in range(page, page + max_skip):
+        data = get_top_tmdb_movies(page=page, per_page=params['per_page'], **discover)
+        total_pages = data.get('total_pages', 0)
+        served = browse.served_tmdb_ids([m.get('tmdb_id') for m in data['results']], params['sort_by'],
+                                        params['min_rating'])
+        results = [m for m in data['results'] if m.get('tmdb_id') not in served]
+        if results or page >= total_pages:
+            break
+    if page >= total_pages:
+        return results, None
+    prefetch_discover_pages(page, total_pages, **discover)
+    return results, browse.tmdb_cursor(page + 1, browse.sort_name(params['sort_by'], params['order']), bound)
+
+
+@tmdb_calls('movies_api')
+def _movies_api_tmdb_calls():
+    params = movies_api_params(request.args)
+    params.pop('per_page')
+    if browse.use_local():
+        # only a continuation cursor is known to go to TMDb before the local query runs
+        cursor = request.args.get('cursor')
+        try:
+            position = browse.tmdb_position(cursor, browse.sort_name(params['sort_by'], params['order'])) \
+                if cursor else None
+        except ValueError:
+            return []
+        if position is None or params['sort_by'] not in browse.TMDB_CONTINUED_SORTS:
+            return []
+        params['page'], params['bound'] = position
+    url = tmdb_discover_url(**params)
+    # pages warmed by the /movies_api prefetch are answered from the list cache
+    return [] if list_cache_ready(url) else [('discover', url, 10)]
+
+
+@route('/recommend', methods=['POST'])
 def recommend():
     """Calculates and stores recommendations in the session, then redirects."""
     selected_movie_ids = request.form.getlist('movies')
-    if not selected_movie_ids or len(selected_movie_ids) > 3:
-        return "Please select up to three movies.", 400
-
-    selected_movies = Movie.query.filter(Movie.id.in_(selected_movie_ids)).all()
-
-    # Recommendation scoring: configurable weights
-    WEIGHT_GENRE = 40
-    WEIGHT_DIRECTOR = 20
-    WEIGHT_WRITER = 10
-    WEIGHT_ACTORS = 20
-    WEIGHT_YEAR = 10
-    ACTORS_TOP_N = 3
-    YEAR_WINDOW = 5
-
-    # build helper sets from selected movies
-    union_selected_genres = set()
-    union_selected_top_actors = set()
-    selected_years = []
-    selected_directors = set()
-    selected_writers = set()
-    for sm in selected_movies:
-        if sm.genre:
-            union_selected_genres.update([g.strip() for g in sm.genre.split(',') if g.strip()])
-        if sm.actors:
-            union_selected_top_actors.update([a.strip() for a in sm.actors.split(',')][:ACTORS_TOP_N])
-        if getattr(sm, 'year', None):
-            try:
-                selected_years.append(int(sm.year))
-            except Exception:
-                pass
-        if sm.director:
-            selected_directors.add(sm.director.strip())
-        if getattr(sm, 'writer', None):
-            selected_writers.update([w.strip() for w in sm.writer.split(',') if w.strip()])
-
-    mean_selected_year = None
-    if selected_years:
-        mean_selected_year = sum(selected_years) / len(selected_years)
-
-    recommendations = defaultdict(float)
-    for movie in Movie.query.filter(Movie.id.notin_(selected_movie_ids)).all():
-        score = 0.0
-
-        # candidate genres and actors
-        movie_genres = set([g.strip() for g in (movie.genre or '').split(',') if g.strip()])
-        movie_actors = [a.strip() for a in (movie.actors or '').split(',') if a.strip()]
-        movie_top_actors = set(movie_actors[:ACTORS_TOP_N])
-
-        # Genre score: proportion of union_selected_genres that candidate covers
-        if union_selected_genres:
-            shared_genres = union_selected_genres.intersection(movie_genres)
-            # If user selections all share a single genre, require candidate to have it
-            if len(union_selected_genres) == 1:
-                only_genre = next(iter(union_selected_genres))
-                if only_genre not in movie_genres:
-                    # candidate doesn't have the required genre -> skip (score remains 0)
-                    recommendations[movie.id] = 0.0
-                    continue
-            genre_fraction = len(shared_genres) / len(union_selected_genres)
-            score += WEIGHT_GENRE * genre_fraction
-
-        # Director / Writer score: split weights so each can contribute
-        director_match = movie.director and movie.director.strip() in selected_directors
-        writer_match = getattr(movie, 'writer', None) and any(w.strip() in selected_writers for w in (movie.writer or '').split(','))
-        if director_match:
-            score += WEIGHT_DIRECTOR
-        if writer_match:
-            score += WEIGHT_WRITER
-
-        # Actors: threshold-based scoring for shared top N actors
-        shared_actor_count = len(union_selected_top_actors.intersection(movie_top_actors)) if union_selected_top_actors and movie_top_actors else 0
-        # threshold mapping: 0 -> 0, 1 -> 8, 2 -> 15, 3 -> 20 (approximate proportions of WEIGHT_ACTORS)
-        actor_score = 0.0
-        if shared_actor_count >= 3:
-            actor_score = WEIGHT_ACTORS
-        elif shared_actor_count == 2:
-            actor_score = round(0.75 * WEIGHT_ACTORS, 2)  # 15
-        elif shared_actor_count == 1:
-            actor_score = round(0.4 * WEIGHT_ACTORS, 2)   # 8
-        score += actor_score
-
-        # Year proximity: linear scaling within YEAR_WINDOW
-        if mean_selected_year and getattr(movie, 'year', None):
-            try:
-                diff = abs(int(movie.year) - mean_selected_year)
-                if diff <= YEAR_WINDOW:
-                    score += WEIGHT_YEAR * (1 - (diff / YEAR_WINDOW))
-            except Exception:
-                pass
-        
-        if score > 0:
-            recommendations[movie.id] = score
-
-    sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
-
-    # Store recommendations server-side and keep only a small token in the session
+    if not selected_movie_ids or len(selected_movie_ids) > API_MAX_HISTORY:
+        return f"Please select between 1 and {API_MAX_HISTORY} movies.", 400
+
+    try:
+        filters = _filter_params(request.form)
+        # ids come from the form's checkboxes; anything else is ignored, out-of-range ids are rejected
+        selected_movie_ids = _int_list([i for i in selected_movie_ids if str(i).isdigit()], 'movies')
+    except ValueError as e:
+        return str(e), 400
+    with metrics.SCORING_LATENCY.time(timing='score', mode='form'):
+        if len(selected_movie_ids) > 3:
+            # a whole watch history (e.g. an imported list) is scored as a taste profile
+            sorted_recommendations = recommender.recommend_taste(selected_movie_ids, filters=filters)
+        else:
+            started = time.perf_counter()
+            sorted_recommendations = recommender.recommend(selected_movie_ids, filters=filters)
+            shadow.submit(selected_movie_ids, sorted_recommendations, time.perf_counter() - started, filters)
+        sorted_recommendations = cooccur.blend(sorted_recommendations, selected_movie_ids,
+                                               keep=recommender.filter_predicate(filters))
+    cooccur.log_selection(selected_movie_ids)
+
+    # Store recommendations server-side (shared by all workers) and keep only a small token in the session
     token = str(uuid.uuid4())
-    RECS_STORE[token] = sorted_recommendations
+    recs_store.put(token, sorted_recommendations)
     session['recs_token'] = token
 
     return redirect(url_for('recommendations_list'))
 
-@app.route('/recommendations')
+
+def _recs_rows(token, movie_ids):
+    """Cards for ``movie_ids`` from the token's hydrated-row cache; only ids not seen before are looked up."""
+    version = httpcache.data_version()
+    with _recs_rows_lock:
+        entry = RECS_ROWS.get(token)
+        if entry is None or entry[0] != version:
+            while len(RECS_ROWS) >= RECS_ROWS_MAX_TOKENS:
+                RECS_ROWS.pop(next(iter(RECS_ROWS)))
+            entry = RECS_ROWS[token] = (version, {})
+    rows = entry[1]
+    missing = [movie_id for movie_id in movie_ids if movie_id not in rows]
+    metrics.cache_lookup('recs_rows', not missing)
+    if missing:
+        rows.update(cards.get_many(missing))
+    return rows
+
+
+def _recs_start(all_recommendations, per_page):
+    """Index of the first recommendation to serve, from ?cursor= (or the legacy ?page=)."""
+    cursor = request.args.get('cursor')
+    if not cursor:
+        page = max(1, request.args.get('page', 1, type=int))
+        return (page - 1) * per_page
+    rank, last_id = browse.decode_cursor(cursor)
+    # the cursor names the last movie served, so a cursor from another list is rejected
+    if not isinstance(rank, int) or not 0 < rank <= len(all_recommendations) \
+            or all_recommendations[rank - 1][0] != last_id:
+        raise ValueError('invalid cursor')
+    return rank
+
+
+def _recs_cursor(all_recommendations, end):
+    if end >= len(all_recommendations):
+        return None
+    return browse.encode_cursor(end, all_recommendations[end - 1][0])
+
+
+@route('/recommendations')
 def recommendations_list():
     """Displays paginated recommendations."""
     if 'recs_token' not in session:
         return redirect(url_for('home'))
 
     # We'll render the first page server-side (for SEO / no-JS fallback)
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
+    per_page = RECS_PAGE_SIZE
 
     token = session.get('recs_token')
-    all_recommendations = RECS_STORE.get(token)
+    all_recommendations = recs_store.get(token)
+    metrics.cache_lookup('recs_store', all_recommendations is not None)
     if not all_recommendations:
         return redirect(url_for('home'))
-    total_pages = (len(all_recommendations) + per_page - 1) // per_page
-
-    start = (page - 1) * per_page
+    try:
+        start = _recs_start(all_recommendations, per_page)
+    except ValueError:
+        return redirect(url_for('recommendations_list'))
     end = start + per_page
-    paginated_recs_ids = [rec[0] for rec in all_recommendations[start:end]]
+    page_recs = all_recommendations[start:end]
 
-    # Fetch movie objects from the database based on the paginated IDs
-    movies_dict = {movie.id: movie for movie in Movie.query.filter(Movie.id.in_(paginated_recs_ids)).all()}
-    paginated_movies = [movies_dict[movie_id] for movie_id in paginated_recs_ids if movie_id in movies_dict]
+    rows = _recs_rows(token, [movie_id for movie_id, _ in page_recs])
+    paginated_movies = [rows[movie_id] for movie_id, _ in page_recs if movie_id in rows]
 
     # Scores for the current page
-    paginated_scores = {rec[0]: rec[1] for rec in all_recommendations[start:end]}
+    paginated_scores = dict(page_recs)
 
     return render_template(
         'recommendations.html',
         recommendations=paginated_movies,
         scores=paginated_scores,
-        page=page,
-        has_next=page < total_pages,
+        start=start,
+        has_next=end < len(all_recommendations),
+        next_cursor=_recs_cursor(all_recommendations, end),
         per_page=per_page
     )
 
 
-@app.route('/recommendations_data')
+@route('/recommendations_data')
 def recommendations_data():
-    """Return a JSON page of recommendations for AJAX 'Show More' requests."""
+    """Return JSON recommendations for AJAX 'Show More' requests.
+
+    Params: cursor (from the previous response's next_cursor; ?page= still works),
+    per_page, pages (return this many pages at once; results holds all of them).
+    """
     if 'recs_token' not in session:
         return jsonify({'error': 'no recommendations in session'}), 400
 
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
+    per_page = max(1, min(API_MAX_K, request.args.get('per_page', RECS_PAGE_SIZE, type=int)))
+    pages = max(1, min(RECS_MAX_PAGES, request.args.get('pages', 1, type=int)))
 
     token = session.get('recs_token')
-    all_recommendations = RECS_STORE.get(token)
+    all_recommendations = recs_store.get(token)
+    metrics.cache_lookup('recs_store', all_recommendations is not None)
     if not all_recommendations:
         return jsonify({'error': 'no recommendations stored on server'}), 400
-    total_pages = (len(all_recommendations) + per_page - 1) // per_page
-
-    start = (page - 1) * per_page
-    end = start + per_page
+    try:
+        start = _recs_start(all_recommendations, per_page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    end = start + per_page * pages
     paginated = all_recommendations[start:end]
-    paginated_ids = [rec[0] for rec in paginated]
-
-    movies = Movie.query.filter(Movie.id.in_(paginated_ids)).all()
-    movies_dict = {m.id: m for m in movies}
 
+    rows = _recs_rows(token, [rec_id for rec_id, _ in paginated])
     results = []
     for rec_id, score in paginated:
-        if rec_id in movies_dict:
-            m = movies_dict[rec_id]
+        m = rows.get(rec_id)
+        if m is not None:
             results.append({
                 'id': m.id,
                 'title': m.title,
-                'poster_url': m.poster_url,
+                'poster_url': images.local_url(m.poster_url, 'w342'),
                 'score': score
             })
 
     return jsonify({
         'results': results,
-        'page': page,
-        'has_next': page < total_pages
+        'page': start // per_page + 1,
+        'per_page': per_page,
+        'pages': pages,
+        'has_next': end < len(all_recommendations),
+        'next_cursor': _recs_cursor(all_recommendations, end)
     })
 
-@app.route('/movie/<int:movie_id>')
+
+def _int_list(value, field):
+    """Accept a JSON list or a comma separated string of integer ids."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = [v for v in value.split(',') if v.strip()]
+    if not isinstance(value, list):
+        raise ValueError(f'{field} must be a list of integers')
+    try:
+        ids = [int(v) for v in value]
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f'{field} must be a list of integers')
+    if any(not -ID_LIMIT <= i < ID_LIMIT for i in ids):
+        raise ValueError(f'{field} must be 64-bit integers')
+    return ids
+
+
+def _page_params(params, defaults=None):
+    defaults = defaults or {}
+    try:
+        k = int(params.get('k', defaults.get('k', 10)))
+        offset = int(params.get('offset', defaults.get('offset', 0)))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError('k and offset must be integers')
+    if not 1 <= k <= API_MAX_K:
+        raise ValueError(f'k must be between 1 and {API_MAX_K}')
+    if not 0 <= offset < ID_LIMIT:
+        raise ValueError(f'offset must be between 0 and {ID_LIMIT - 1}')
+    return k, offset
+
+
+def _weighted_list(value, field):
+    """Like _int_list, but entries may also be [id, weight] pairs. Returns (ids, weights)."""
+    if not isinstance(value, list) or not any(isinstance(v, list) for v in value):
+        ids = _int_list(value, field)
+        return ids, [1.0] * len(ids)
+    ids = []
+    item_weights = []
+    for v in value:
+        try:
+            movie_id, weight = v if isinstance(v, list) else (v, 1.0)
+            ids.append(int(movie_id))
+            item_weights.append(float(weight))
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f'{field} entries must be ids or [id, weight] pairs')
+        if not -ID_LIMIT <= ids[-1] < ID_LIMIT:
+            raise ValueError(f'{field} must be 64-bit integers')
+        if not 0 <= item_weights[-1] < math.inf:
+            raise ValueError(f'{field} weights must be finite non-negative numbers')
+    return ids, item_weights
+
+
+def _resolve_seed_sets(specs):
+    """Turn [{'ids': [...], 'tmdb_ids': [...], 'mode': ...}, ...] into (ids, item_weights, mode) tuples.
+
+    Seeds are local movie ids (one query for all tmdb ids). mode is 'seeds'
+    (the classic up-to-API_MAX_SEEDS selection) or 'taste' (a taste profile of a
+    long or weighted history); without an explicit mode, more than
+    API_MAX_SEEDS seeds or any weight other than 1 selects 'taste'.
+    """
+    parsed = []
+    all_tmdb = set()
+    for spec in specs:
+        ids, id_weights = _weighted_list(spec.get('ids'), 'ids')
+        tmdb_ids, tmdb_weights = _weighted_list(spec.get('tmdb_ids'), 'tmdb_ids')
+        if not ids and not tmdb_ids:
+            raise ValueError('each request needs ids or tmdb_ids')
+        n = len(ids) + len(tmdb_ids)
+        mode = spec.get('mode') or (
+            'taste' if n > API_MAX_SEEDS or any(iw != 1 for iw in id_weights + tmdb_weights) else 'seeds')
+        if mode not in ('seeds', 'taste'):
+            raise ValueError("mode must be 'seeds' or 'taste'")
+        limit = API_MAX_SEEDS if mode == 'seeds' else API_MAX_HISTORY
+        if n > limit:
+            raise ValueError(f'at most {limit} seeds per request in {mode} mode')
+        parsed.append((ids, id_weights, tmdb_ids, tmdb_weights, mode))
+        all_tmdb.update(tmdb_ids)
+
+    tmdb_map = {}
+    if all_tmdb:
+        rows = db.session.query(Movie.tmdb_id, Movie.id).filter(Movie.tmdb_id.in_(all_tmdb)).all()
+        tmdb_map = {tmdb_id: movie_id for tmdb_id, movie_id in rows}
+    resolved = []
+    for ids, id_weights, tmdb_ids, tmdb_weights, mode in parsed:
+        found = [(tmdb_map[t], iw) for t, iw in zip(tmdb_ids, tmdb_weights) if t in tmdb_map]
+        resolved.append((ids + [movie_id for movie_id, _ in found],
+                         id_weights + [iw for _, iw in found], mode))
+    return resolved
+
+
+def _filter_params(params, defaults=None):
+    """Recommendation filters from request params: genres, year_from, year_to, min_rating.
+
+    Returns a dict for recommender.filter_bitmap (None when no filter is set);
+    raises ValueError on invalid values.
+    """
+    filters = dict(defaults or {})
+    genres = params.getlist('genres') if hasattr(params, 'getlist') else params.get('genres')
+    if isinstance(genres, list) and len(genres) == 1 and isinstance(genres[0], str):
+        genres = genres[0]
+    if isinstance(genres, str):
+        genres = [g.strip() for g in genres.split(',') if g.strip()]
+    if genres:
+        if not isinstance(genres, list) or not all(isinstance(g, str) for g in genres):
+            raise ValueError('genres must be a list of genre names')
+        filters['genres'] = genres
+    for key in ('year_from', 'year_to'):
+        value = params.get(key)
+        if value not in (None, ''):
+            try:
+                filters[key] = int(value)
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError(f'{key} must be an integer')
+    value = params.get('min_rating')
+    if value not in (None, ''):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError('min_rating must be a number')
+        if not 0 <= value <= 10:
+            raise ValueError('min_rating must be between 0 and 10')
+        filters['min_rating'] = value
+    return filters or None
+
+
+def _cooccur_weight(params):
+    """Points a full co-occurrence match adds to the content score (default COOCCUR_WEIGHT)."""
+    value = params.get('cooccur_weight')
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('cooccur_weight must be a number')
+    if not 0 <= value < math.inf:
+        raise ValueError('cooccur_weight must be a finite non-negative number')
+    return value
+
+
+def _score_seed_sets(resolved, weights, filters):
+    """One result list per _resolve_seed_sets entry; seed sets are batched, taste profiles share a cache."""
+    results = [None] * len(resolved)
+    batch = [n for n, (_, _, mode) in enumerate(resolved) if mode == 'seeds']
+    if batch:
+        scored = recommender.recommend_many([resolved[n][0] for n in batch], weights=weights,
+                                            filters=[filters[n] for n in batch])
+        for n, recommendations in zip(batch, scored):
+            results[n] = recommendations
+    cache = {}
+    for n, (seeds, item_weights, mode) in enumerate(resolved):
+        if mode == 'taste':
+            results[n] = recommender.recommend_taste(seeds, item_weights, weights=weights, cache=cache,
+                                                     filters=filters[n])
+    return results
+
+
+def _api_page(seeds, recommendations, k, offset, movies, profile, mode='seeds'):
+    page = recommendations[offset:offset + k]
+    return {
+        'seeds': seeds,
+        'mode': mode,
+        'profile': profile.version,
+        'results': [
+            {
+                'id': movie_id,
+                'title': movies[movie_id].title,
+                'poster_url': movies[movie_id].poster_url,
+                'year': movies[movie_id].year,
+                'score': score
+            }
+            for movie_id, score in page if movie_id in movies
+        ],
+        'offset': offset,
+        'k': k,
+        'total': len(recommendations),
+        'has_next': offset + k < len(recommendations)
+    }
+
+
+@route('/api/recommend', methods=['GET', 'POST'])
+def api_recommend():
+    """Stateless recommendations: seeds in, one scored page out.
+
+    Params (JSON body or query string): ids and/or tmdb_ids, k, offset, mode, cooccur_weight,
+    genres, year_from, year_to, min_rating, weights (JSON only).
+    ids / tmdb_ids may hold [id, weight] pairs (JSON only) to weight a long history.
+    """
+    params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    if not isinstance(params, dict):
+        return jsonify({'error': 'body must be a JSON object'}), 400
+    try:
+        k, offset = _page_params(params)
+        weights = recommender.resolve_weights(params.get('weights') if isinstance(params, dict) else None)
+        blend = _cooccur_weight(params)
+        filters = _filter_params(params)
+        seeds, item_weights, mode = _resolve_seed_sets([params])[0]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    with metrics.SCORING_LATENCY.time(timing='score', mode='api' if mode == 'seeds' else 'api_taste'):
+        if mode == 'taste':
+            recommendations = recommender.recommend_taste(seeds, item_weights, weights=weights, filters=filters)
+        else:
+            started = time.perf_counter()
+            recommendations = recommender.recommend(seeds, weights=weights, filters=filters)
+            # shadow engines score with the active profile, so override requests are not comparable
+            if weights is recommender.active_profile():
+                shadow.submit(seeds, recommendations, time.perf_counter() - started, filters)
+        recommendations = cooccur.blend(recommendations, seeds, blend, recommender.filter_predicate(filters))
+    movies = cards.get_many([movie_id for movie_id, _ in recommendations[offset:offset + k]])
+    return jsonify(_api_page(seeds, recommendations, k, offset, movies, weights, mode))
+
+
+@route('/api/recommend/batch', methods=['POST'])
+def api_recommend_batch():
+    """Score many seed sets in one call.
+
+    Body: {"requests": [{"ids": [...]}, ...], "k", "offset", "weights", "cooccur_weight"}.
+    Filters (genres, year_from, year_to, min_rating) may be set for the whole batch
+    and overridden per request.
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({'error': 'body must be a JSON object'}), 400
+    specs = body.get('requests')
+    if not isinstance(specs, list) or not specs:
+        return jsonify({'error': 'requests must be a non-empty list'}), 400
+    if len(specs) > API_MAX_BATCH:
+        return jsonify({'error': f'at most {API_MAX_BATCH} requests per batch'}), 400
+    if not all(isinstance(spec, dict) for spec in specs):
+        return jsonify({'error': 'each request must be an object'}), 400
+
+    try:
+        defaults = dict(zip(('k', 'offset'), _page_params(body)))
+        pages = [_page_params(spec, defaults) for spec in specs]
+        weights = recommender.resolve_weights(body.get('weights'))
+        blend = _cooccur_weight(body)
+        batch_filters = _filter_params(body)
+        filters = [_filter_params(spec, batch_filters) for spec in specs]
+        resolved = _resolve_seed_sets(specs)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    with metrics.SCORING_LATENCY.time(timing='score', mode='batch'):
+        all_recommendations = [
+            cooccur.blend(recommendations, seeds, blend, recommender.filter_predicate(set_filters))
+            for recommendations, (seeds, _, _), set_filters
+            in zip(_score_seed_sets(resolved, weights, filters), resolved, filters)
+        ]
+    page_ids = set()
+    for recommendations, (k, offset) in zip(all_recommendations, pages):
+        page_ids.update(movie_id for movie_id, _ in recommendations[offset:offset + k])
+    movies = cards.get_many(page_ids)
+
+    return jsonify({'results': [
+        _api_page(seeds, recommendations, k, offset, movies, weights, mode)
+        for (seeds, _, mode), recommendations, (k, offset) in zip(resolved, all_recommendations, pages)
+    ]})
+
+
+@route('/movie/<int:movie_id>')
 def movie_detail(movie_id):
     """Renders the detail page for a single movie."""
     movie = Movie.query.get_or_404(movie_id)
@@ -597,7 +1282,13 @@ def movie_detail(movie_id):
     return render_template('movie_detail.html', movie=fallback_movie)
 
 
-@app.route('/external_movie/<int:tmdb_id>')
+@tmdb_calls('movie_detail')
+def _movie_detail_tmdb_calls(movie_id):
+    tmdb_id = db.session.query(Movie.tmdb_id).filter(Movie.id == movie_id).scalar()
+    return [('movie_detail', tmdb_detail_url(tmdb_id), 10)] if tmdb_id else []
+
+
+@route('/external_movie/<int:tmdb_id>')
 def external_movie(tmdb_id):
     """Renders a movie detail fetched from TMDb API."""
     data = tmdb_movie_detail(tmdb_id)
@@ -606,47 +1297,253 @@ def external_movie(tmdb_id):
     return render_template('movie_detail.html', movie=data)
 
 
-@app.route('/upsert_tmdb', methods=['POST'])
+@tmdb_calls('external_movie')
+def _external_movie_tmdb_calls(tmdb_id):
+    return [('movie_detail', tmdb_detail_url(tmdb_id), 10)]
+
+
+def stored_tmdb_ids(tmdb_ids):
+    """{tmdb_id: db_id} for the given TMDb ids already in the Movie table (one IN query per 500 ids)."""
+    tmdb_ids = list(tmdb_ids)
+    found = {}
+    for i in range(0, len(tmdb_ids), 500):
+        rows = db.session.query(Movie.tmdb_id, Movie.id).filter(Movie.tmdb_id.in_(tmdb_ids[i:i + 500])) \
+            .order_by(Movie.id.desc())
+        # duplicates from concurrent inserts: the lowest id wins, as with filter_by().first()
+        found.update((tmdb_id, movie_id) for tmdb_id, movie_id in rows)
+    return found
+
+
+def _movie_row(tmdb_id, data):
+    """Movie column values for a tmdb_movie_detail() result."""
+    return dict(
+        title=data.get('title') or 'Unknown',
+        description=data.get('description') or '',
+        poster_url=data.get('poster_url') or 'https://via.placeholder.com/500x750.png?text=No+Image',
+        genre=data.get('genre'),
+        director=data.get('director'),
+        writer=None,
+        year=int(data.get('year')) if data.get('year') and data.get('year').isdigit() else None,
+        actors=data.get('actors'),
+        tmdb_id=tmdb_id,
+        vote_average=data.get('vote_average'),
+        vote_count=data.get('vote_count')
+    )
+
+
+def _fetch_detail(tmdb_id):
+    try:
+        return tmdb_movie_detail(tmdb_id)
+    except Exception as e:
+        print(f"TMDb detail error for {tmdb_id}: {e}")
+        return None
+
+
+def upsert_tmdb_movies(tmdb_ids):
+    """Make sure the given TMDb movies exist locally (needs an app context).
+
+    Existing rows are resolved with one query, missing movies are fetched from
+    TMDb concurrently (TMDB_UPSERT_WORKERS) and inserted with one executemany in
+    a single transaction.
+    Returns ``({tmdb_id: db_id}, [tmdb ids that could not be fetched])``.
+    """
+    tmdb_ids = list(dict.fromkeys(tmdb_ids))
+    found = stored_tmdb_ids(tmdb_ids)
+    missing = [tmdb_id for tmdb_id in tmdb_ids if tmdb_id not in found]
+    if not missing:
+        return found, []
+
+    # each fetch runs in a copy of this context, so responses prefetched by asgi.py are used
+    futures = [_upsert_pool.submit(contextvars.copy_context().run, _fetch_detail, tmdb_id) for tmdb_id in missing]
+    details = [future.result() for future in futures]
+
+    rows = [_movie_row(tmdb_id, data) for tmdb_id, data in zip(missing, details) if data]
+    failed = [tmdb_id for tmdb_id, data in zip(missing, details) if not data]
+    if rows:
+        # Core insert: the ORM would issue one INSERT per row to learn each id
+        db.session.execute(insert(Movie), rows)
+        new = stored_tmdb_ids([row['tmdb_id'] for row in rows])
+        db.session.commit()
+        # bump first, so the catalog rebuild records the version that includes these rows
+        httpcache.bump()
+        recommender.mark_dirty()
+        cards.invalidate(list(new.values()))
+        found.update(new)
+    return found, failed
+
+
+@route('/upsert_tmdb', methods=['POST'])
 def upsert_tmdb():
     """Given a tmdb_id, fetch movie from TMDb and insert or update DB record. Returns JSON {db_id}.
     """
-    tmdb_id = request.json.get('tmdb_id') if request.is_json else request.form.get('tmdb_id')
-    if not tmdb_id:
-        return jsonify({'error': 'tmdb_id is required'}), 400
+    try:
+        tmdb_id = _upsert_tmdb_id()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    found, _ = upsert_tmdb_movies([tmdb_id])
+    if tmdb_id not in found:
+        return jsonify({'error': 'tmdb fetch failed'}), 500
+    return jsonify({'db_id': found[tmdb_id]})
+
 
+def _upsert_tmdb_id():
+    """tmdb_id from an /upsert_tmdb JSON object or form; ValueError if it is missing or not a 64-bit id."""
+    data = request.get_json(silent=True) if request.is_json else request.form
+    if not isinstance(data, dict):
+        raise ValueError('body must be a JSON object')
+    if not data.get('tmdb_id'):
+        raise ValueError('tmdb_id is required')
     try:
-        tmdb_id = int(tmdb_id)
-    except Exception:
-        return jsonify({'error': 'invalid tmdb_id'}), 400
+        return _int_list([data['tmdb_id']], 'tmdb_id')[0]
+    except ValueError:
+        raise ValueError('invalid tmdb_id')
 
-    # Try find existing
-    movie = Movie.query.filter_by(tmdb_id=tmdb_id).first()
-    if movie:
-        return jsonify({'db_id': movie.id})
 
-    # fetch from TMDb
-    data = tmdb_movie_detail(tmdb_id)
-    if not data:
-        return jsonify({'error': 'tmdb fetch failed'}), 500
+def _upsert_tmdb_ids():
+    """tmdb_ids from an /upsert_tmdb/batch JSON object; ValueError on any other body."""
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        raise ValueError('body must be a JSON object')
+    return _int_list(body.get('tmdb_ids'), 'tmdb_ids')
+
+
+def _upsert_tmdb_calls_for(tmdb_ids):
+    """Detail fetches upsert_tmdb_movies will make: one per TMDb id not stored yet."""
+    stored = stored_tmdb_ids(tmdb_ids)
+    return [('movie_detail', tmdb_detail_url(tmdb_id), 10) for tmdb_id in dict.fromkeys(tmdb_ids)
+            if tmdb_id not in stored]
+
+
+@tmdb_calls('upsert_tmdb')
+def _upsert_tmdb_calls():
+    try:
+        return _upsert_tmdb_calls_for([_upsert_tmdb_id()])
+    except ValueError:
+        return []
+
+
+@route('/upsert_tmdb/batch', methods=['POST'])
+def upsert_tmdb_batch():
+    """Upsert many TMDb movies. Body: {"tmdb_ids": [...]}. Returns {"ids": {tmdb_id: db_id}, "failed": [...]}."""
+    try:
+        tmdb_ids = _upsert_tmdb_ids()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not tmdb_ids:
+        return jsonify({'error': 'tmdb_ids is required'}), 400
+    if len(tmdb_ids) > API_MAX_UPSERT:
+        return jsonify({'error': f'at most {API_MAX_UPSERT} tmdb_ids per batch'}), 400
+
+    found, failed = upsert_tmdb_movies(tmdb_ids)
+    return jsonify({'ids': {str(tmdb_id): db_id for tmdb_id, db_id in found.items()}, 'failed': failed})
+
+
+@tmdb_calls('upsert_tmdb_batch')
+def _upsert_tmdb_batch_calls():
+    try:
+        tmdb_ids = _upsert_tmdb_ids()
+    except ValueError:
+        return []
+    return _upsert_tmdb_calls_for(tmdb_ids) if len(tmdb_ids) <= API_MAX_UPSERT else []
 
-    # create new Movie row
+
+@route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of this worker's metrics."""
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+def secret_key(instance_path):
+    """SECRET_KEY from the environment, else a key persisted in ``instance/secret_key``.
+
+    Every worker must sign sessions with the same key. The file is created once
+    (first worker wins) and shared by the processes on a host; set SECRET_KEY
+    when running on several hosts.
+    """
+    key = os.environ.get('SECRET_KEY')
+    if key:
+        return key
+    path = os.path.join(instance_path, 'secret_key')
+    os.makedirs(instance_path, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):
+            with open(path, 'rb') as f:
+                key = f.read()
+            if key:
+                return key
+            time.sleep(0.01)  # another worker is still writing it
+        raise RuntimeError(f'{path} is empty')
+    key = os.urandom(32)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+def create_app(config=None):
+    """Build the web app: config, extensions, hooks and routes.
+
+    Module state (caches, the TMDb prefetch pool) is shared by every
+    app built in a process. Scripts that only need the database should use
+    ``database.app_context()`` instead.
+    """
+    app = Flask(__name__)
+    app.secret_key = secret_key(app.instance_path)
+    # Add a Server-Timing header (db, tmdb, score, render, total) to every response
+    app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+    database.configure(app)
+    if config:
+        app.config.update(config)
+
+    metrics.instrument_app(app)
+    # gzip/brotli above COMPRESS_MIN_SIZE bytes, orjson for jsonify when installed (see compression.py)
+    compression.init_app(app)
+    # /img/<size>/<file> poster proxy and the |poster template filter (see images.py)
+    images.init_app(app)
+    # PROFILE_SAMPLE_RATE / PROFILE_SLOW_MS enable request profiling (see profiling.py)
+    app.wsgi_app = profiling.ProfilingMiddleware.from_env(app.wsgi_app)
+    httpcache.init_app(app, CACHE_POLICIES)
+    # SHADOW_ENGINE: re-score a sample of recommendations with another engine (see shadow.py)
+    shadow.init_app(app)
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+
+    # Map the catalog feature snapshot (if one has been built) before serving traffic
+    snapshot.current()
+
+    # Add browse indexes missing from databases created before they were declared
     with app.app_context():
-        m = Movie(
-            title=data.get('title') or 'Unknown',
-            description=data.get('description') or '',
-            poster_url=data.get('poster_url') or 'https://via.placeholder.com/500x750.png?text=No+Image',
-            genre=data.get('genre'),
-            director=data.get('director'),
-            writer=None,
-            year=int(data.get('year')) if data.get('year') and data.get('year').isdigit() else None,
-            actors=data.get('actors'),
-            tmdb_id=tmdb_id,
-            vote_average=data.get('vote_average'),
-            vote_count=data.get('vote_count')
-        )
-        db.session.add(m)
-        db.session.commit()
-        return jsonify({'db_id': m.id})
+        try:
+            ensure_indexes()
+        except Exception as e:
+            print(f"Index check skipped: {e}")
+
+    # TMDB_REFRESH_INTERVAL: keep the home lists warm (see refresh_lists)
+    start_list_refresh(app)
+    # COOCCUR_UPDATE_INTERVAL: fold logged selections into the co-occurrence matrix (see cooccur.py)
+    cooccur.start_updates()
+    return app
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # `app` is built on first access (`from app import app`, `app:app` for WSGI servers),
+    # so importing this module for create_app does not construct a second one
+    global _app
+    if name == 'app':
+        if _app is None:
+            # threaded servers may race on the first access: only one builds it
+            with _app_lock:
+                if _app is None:
+                    _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,172 @@
+"""ASGI entry point that keeps TMDb round-trips off the worker threads.
+
+    uvicorn asgi:application --workers 2
+
+For the TMDb-bound routes (home, search, movies_api, external_movie,
+movie_detail, upsert_tmdb, upsert_tmdb/batch) the upstream URLs are worked out
+by each view's planner in app.py (app.TMDB_CALLS) and fetched concurrently on the event loop through one pooled
+httpx.AsyncClient, so a process can hold hundreds of in-flight TMDb requests.
+The responses are then handed to the unchanged Flask views through
+app.TMDB_PREFETCHED, and the views render exactly as they do under WSGI.
+Every other route goes straight to Flask.
+"""
+import asyncio
+import os
+import time
+
+import httpx
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_etags
+
+import app as web
+import httpcache
+import metrics
+
+TMDB_MAX_CONNECTIONS = int(os.environ.get('TMDB_MAX_CONNECTIONS', 100))
+
+
+def _replay(body):
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+    return receive
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def _header(scope, name):
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin1')
+    return ''
+
+
+def _match(scope):
+    """(endpoint, view_args) Flask routes this request to, or (None, {})."""
+    try:
+        return web.app.url_map.bind('localhost').match(scope['path'], method=scope['method'])
+    except HTTPException:
+        return None, {}
+
+
+def _revalidation(scope, endpoint):
+    """True if this is a conditional GET that httpcache will answer with 304 before the view runs."""
+    header = _header(scope, b'if-none-match')
+    if not header or scope['method'] != 'GET' or endpoint is None:
+        return False
+    query = scope.get('query_string', b'').decode('latin1')
+    # per-session endpoints are not TMDb-bound, so the key never needs the session here
+    key = httpcache.request_key(endpoint, f"{scope['path']}?{query}")
+    return httpcache.fresh(key, parse_etags(header)) is not None
+
+
+def _calls(planner, scope, body, view_args):
+    headers = [(key.decode('latin1'), value.decode('latin1')) for key, value in scope.get('headers', [])
+               if key != b'content-length']
+    try:
+        with web.app.test_request_context(scope['path'], method=scope['method'], headers=headers, data=body,
+                                          query_string=scope.get('query_string', b'').decode('latin1')):
+            return planner(**view_args)
+    except Exception as e:
+        # the view itself will fetch (or fail) as it does under WSGI
+        print(f"TMDb prefetch plan error: {e}")
+        return []
+
+
+async def plan(scope, body=b'', match=None):
+    """[(endpoint, url, timeout)] the Flask view for this request is going to fetch from TMDb.
+
+    Each TMDb-bound view's own planner (app.TMDB_CALLS) works this out in a
+    request context built from ``scope`` and ``body``, on a worker thread since
+    it may query the database.
+    """
+    if not web.TMDB_API_KEY:
+        return []
+    endpoint, view_args = match or _match(scope)
+    planner = web.TMDB_CALLS.get(endpoint)
+    if planner is None:
+        return []
+    return await asyncio.to_thread(_calls, planner, scope, body, view_args)
+
+
+class Application:
+    """ASGI app: prefetch TMDb for the request, then run the Flask view in the thread pool."""
+
+    def __init__(self, flask_app, max_connections=TMDB_MAX_CONNECTIONS):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.max_connections = max_connections
+        self.client = None
+
+    def _client(self):
+        if self.client is None:
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self.client = httpx.AsyncClient(limits=limits)
+        return self.client
+
+    async def fetch(self, endpoint, url, timeout):
+        """Same metrics as app.tmdb_get; returns the response or the exception raised."""
+        started = time.perf_counter()
+        try:
+            r = await self._client().get(url, timeout=timeout)
+        except Exception as e:
+            metrics.TMDB_ERRORS.inc(endpoint=endpoint)
+            return e
+        finally:
+            metrics.TMDB_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint)
+        if r.status_code != 200:
+            metrics.TMDB_ERRORS.inc(endpoint=endpoint)
+        return r
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._client()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.client is not None:
+                    await self.client.aclose()
+                    self.client = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f"unsupported ASGI scope {scope['type']}")
+
+        match = _match(scope)
+        body = b''
+        if scope['method'] == 'POST' and match[0] in web.TMDB_CALLS:
+            # the planner reads the body too, so it is buffered and replayed to Flask
+            body = await _read_body(receive)
+            receive = _replay(body)
+
+        upstream = [] if _revalidation(scope, match[0]) else await plan(scope, body, match)
+        prefetched = None
+        if upstream:
+            responses = await asyncio.gather(*(self.fetch(*call) for call in upstream))
+            prefetched = {url: r for (_, url, _), r in zip(upstream, responses)}
+
+        token = web.TMDB_PREFETCHED.set(prefetched)
+        try:
+            # a context per request gives each request its own WSGI thread; without it
+            # asgiref runs every WSGI call on one shared thread, serializing requests
+            async with ThreadSensitiveContext():
+                await self.wsgi(scope, receive, send)
+        finally:
+            web.TMDB_PREFETCHED.reset(token)
+
+
+application = Application(web.app)
@@ -0,0 +1,206 @@
+"""Local catalog browsing for /movies_api with keyset pagination.
+
+Pages are read from the Movie table in (sort key, id) order through the
+ix_movie_browse_* indexes. Instead of an offset, each page returns an opaque
+cursor holding the last (sort key, id) it served; the next page seeks past it,
+so deep pages cost the same as the first one.
+
+Cursors are bound to the sort_by/order they were made for; using one with
+another order is an error rather than a page of wrong rows.
+
+Once the local rows run out, browsing sorted by rating or year continues with
+TMDb discover (in app.movies_api), restricted to movies at or past the last
+local row so the order carries on. The cursor then names the next discover
+page and that bound, and movies already served from the local rows are skipped.
+"""
+import base64
+import json
+import os
+import time
+
+from sqlalchemy import tuple_
+
+from models import db, Movie
+
+# 'tmdb' always proxies TMDb discover, 'local' always reads the Movie table,
+# 'auto' reads the Movie table once it has been enriched with vote counts
+BROWSE_SOURCE = os.environ.get('BROWSE_SOURCE', 'auto').lower()
+BROWSE_MAX_PER_PAGE = 100
+# same floor as the TMDb discover query in app.get_top_tmdb_movies
+MIN_VOTE_COUNT = 50
+
+SORT_COLUMNS = {
+    'rating': Movie.vote_average,
+    'year': Movie.year,
+    'title': Movie.title,
+}
+# sorts TMDb discover can continue past a local row (it sorts by original title and cannot filter by title)
+TMDB_CONTINUED_SORTS = ('rating', 'year')
+
+_enriched = {'ts': 0.0, 'value': False}
+ENRICHED_CHECK_INTERVAL = 60
+
+
+def catalog_enriched():
+    """True if any movie has a vote count (re-checked at most once a minute; needs an app context)."""
+    now = time.time()
+    if now - _enriched['ts'] > ENRICHED_CHECK_INTERVAL:
+        row = db.session.query(Movie.id).filter(Movie.vote_count >= MIN_VOTE_COUNT).first()
+        _enriched.update(ts=now, value=row is not None)
+    return _enriched['value']
+
+
+def use_local():
+    if BROWSE_SOURCE == 'local':
+        return True
+    if BROWSE_SOURCE == 'tmdb':
+        return False
+    return catalog_enriched()
+
+
+def _encode(data):
+    raw = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError):
+        raise ValueError('invalid cursor')
+
+
+def sort_name(sort_by, order):
+    """The order a browse cursor is made for, e.g. 'rating.desc' (unknown values fall back like the query)."""
+    return f"{sort_by if sort_by in SORT_COLUMNS else 'rating'}.{'asc' if order == 'asc' else 'desc'}"
+
+
+def encode_cursor(value, movie_id, sort=None):
+    return _encode([value, movie_id] + ([sort] if sort else []))
+
+
+def decode_cursor(cursor, sort=None):
+    """(value, movie_id) of a cursor; ValueError if it is malformed or was made for another ``sort``."""
+    try:
+        value, movie_id, *made_for = _decode(cursor)
+        if not isinstance(movie_id, int) or not isinstance(value, (int, float, str)):
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ValueError('invalid cursor')
+    if made_for != ([sort] if sort else []):
+        raise ValueError('cursor was made for another sort_by/order')
+    return value, movie_id
+
+
+def tmdb_cursor(page, sort, bound=None):
+    """Cursor of TMDb discover ``page``, where browsing continues after the local rows.
+
+    ``bound`` is the sort value of the last local row (None when none was served).
+    """
+    return _encode({'tmdb_page': page, 'sort': sort, 'bound': bound})
+
+
+def tmdb_position(cursor, sort):
+    """(discover page, bound) a continuation cursor points at, or None for a local cursor.
+
+    Raises ValueError for a malformed continuation cursor or one made for another ``sort``.
+    """
+    try:
+        data = _decode(cursor)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    page, bound = data.get('tmdb_page'), data.get('bound')
+    if not isinstance(page, int) or page < 1 or not (bound is None or isinstance(bound, (int, float))):
+        raise ValueError('invalid cursor')
+    if data.get('sort') != sort:
+        raise ValueError('cursor was made for another sort_by/order')
+    return page, bound
+
+
+def _browsable(query, column, min_rating):
+    """Restrict ``query`` to the movies the local browse serves for this sort and filter."""
+    query = query.filter(column.isnot(None), Movie.vote_count >= MIN_VOTE_COUNT)
+    if min_rating > 0:
+        query = query.filter(Movie.vote_average >= min_rating)
+    return query
+
+
+def _min_rating(value):
+    return max(0.0, min(10.0, float(value or 0.0)))
+
+
+def local_count(sort_by='rating', min_rating=0.0):
+    """How many movies the local browse serves for this sort and filter."""
+    column = SORT_COLUMNS.get(sort_by, Movie.vote_average)
+    return _browsable(db.session.query(Movie.id), column, _min_rating(min_rating)).count()
+
+
+def served_tmdb_ids(tmdb_ids, sort_by='rating', min_rating=0.0):
+    """The ``tmdb_ids`` the local browse serves for this sort and filter (one IN query)."""
+    tmdb_ids = [tmdb_id for tmdb_id in tmdb_ids if tmdb_id is not None]
+    if not tmdb_ids:
+        return set()
+    column = SORT_COLUMNS.get(sort_by, Movie.vote_average)
+    query = _browsable(db.session.query(Movie.tmdb_id), column, _min_rating(min_rating))
+    return {tmdb_id for tmdb_id, in query.filter(Movie.tmdb_id.in_(tmdb_ids))}
+
+
+def local_page(per_page=20, sort_by='rating', order='desc', min_rating=0.0, cursor=None, page=1):
+    """One page of local movie cards (the fields /movies_api returns) plus the cursor of the next page.
+
+    Without a cursor, ``page`` (1-based) is served with an offset, for clients that only send ?page=.
+    ``last_value`` is the sort value of the last row served (None for an empty page).
+    """
+    column = SORT_COLUMNS.get(sort_by, Movie.vote_average)
+    descending = order != 'asc'
+    per_page = max(1, min(BROWSE_MAX_PER_PAGE, per_page))
+    sort = sort_name(sort_by, order)
+    min_rating = _min_rating(min_rating)
+
+    query = _browsable(db.session.query(
+        Movie.id, Movie.tmdb_id, Movie.title, Movie.poster_url, Movie.year, Movie.vote_average, Movie.vote_count
+    ), column, min_rating)
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        # row-value comparison, so the database seeks straight to (value, last_id) in the index
+        if descending:
+            query = query.filter(tuple_(column, Movie.id) < tuple_(value, last_id))
+        else:
+            query = query.filter(tuple_(column, Movie.id) > tuple_(value, last_id))
+    if descending:
+        query = query.order_by(column.desc(), Movie.id.desc())
+    else:
+        query = query.order_by(column.asc(), Movie.id.asc())
+
+    if not cursor and page > 1:
+        if (page - 1) * per_page >= 2 ** 63:
+            raise ValueError('page out of range')
+        query = query.offset((page - 1) * per_page)
+
+    rows = query.limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = None
+    if has_next:
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, column.key), last.id, sort)
+
+    return {
+        'results': [
+            {
+                'db_id': r.id,
+                'tmdb_id': r.tmdb_id,
+                'title': r.title,
+                'poster_url': r.poster_url,
+                'year': str(r.year) if r.year else '',
+                'vote_average': r.vote_average or 0,
+                'vote_count': r.vote_count or 0
+            }
+            for r in rows
+        ],
+        'has_next': has_next,
+        'next_cursor': next_cursor,
+        'last_value': getattr(rows[-1], column.key) if rows else None,
+    }
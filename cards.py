@@ -0,0 +1,90 @@
+"""In-memory movie cards: the few fields result lists render.
+
+Recommendation pages, the JSON API and search only show id, title, poster
+and year. Cards are loaded with a narrow projection the first time an id is
+asked for and afterwards served from a dict. The cache is per process: call
+``invalidate`` after writing to the Movie table. Writes made by other
+workers drop it through the shared data version (httpcache.bump), and writes
+that bypass the app are picked up within CARD_CACHE_TTL seconds. At most
+CARD_CACHE_MAX cards are kept; the oldest are evicted first.
+"""
+import os
+import threading
+import time
+from itertools import islice
+
+import httpcache
+import metrics
+from models import db, Movie
+
+CARD_CACHE_MAX = int(os.environ.get('CARD_CACHE_MAX', 200000))
+CARD_CACHE_TTL = float(os.environ.get('CARD_CACHE_TTL', 3600))
+
+_cards = {}  # id -> Card, oldest first
+_state = {'version': None, 'expires_at': 0.0}
+_lock = threading.Lock()
+
+
+class Card:
+    __slots__ = ('id', 'title', 'poster_url', 'year')
+
+    def __init__(self, id, title, poster_url, year):
+        self.id = id
+        self.title = title
+        self.poster_url = poster_url
+        self.year = year
+
+    def __repr__(self):
+        return f'<Card {self.id} {self.title}>'
+
+
+def _check_fresh():
+    """Start over when the shared data version changed or the cache outlived its TTL."""
+    version = httpcache.data_version()
+    now = time.time()
+    if version != _state['version'] or now >= _state['expires_at']:
+        with _lock:
+            _cards.clear()
+            _state['version'] = version
+            _state['expires_at'] = now + CARD_CACHE_TTL
+
+
+def get_many(movie_ids):
+    """{id: Card} for the ids that exist; only ids not cached yet are queried (needs an app context)."""
+    _check_fresh()
+    found = {}
+    missing = []
+    for movie_id in movie_ids:
+        card = _cards.get(movie_id)
+        if card is None:
+            missing.append(movie_id)
+        else:
+            found[movie_id] = card
+    metrics.CACHE_REQUESTS.inc(len(found), cache='cards', result='hit')
+    metrics.CACHE_REQUESTS.inc(len(missing), cache='cards', result='miss')
+    if missing:
+        rows = db.session.query(Movie.id, Movie.title, Movie.poster_url, Movie.year) \
+            .filter(Movie.id.in_(missing)).all()
+        loaded = {r.id: Card(r.id, r.title, r.poster_url, r.year) for r in rows}
+        with _lock:
+            _cards.update(loaded)
+            excess = len(_cards) - CARD_CACHE_MAX
+            if excess > 0:
+                for movie_id in list(islice(_cards, excess)):
+                    del _cards[movie_id]
+        found.update(loaded)
+    return found
+
+
+def invalidate(movie_ids=None):
+    """Drop the given cards, or all of them."""
+    with _lock:
+        if movie_ids is None:
+            _cards.clear()
+        else:
+            for movie_id in movie_ids:
+                _cards.pop(movie_id, None)
+
+
+def size():
+    return len(_cards)
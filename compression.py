@@ -0,0 +1,90 @@
+"""Response compression and a faster JSON provider.
+
+``init_app`` compresses text responses above COMPRESS_MIN_SIZE bytes with
+brotli (when the ``brotli`` package is installed) or gzip, picked from the
+client's Accept-Encoding. ``OrjsonProvider`` makes ``jsonify`` serialize
+with orjson when it is installed.
+"""
+import gzip
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify/json.dumps through orjson; same output keys and ordering as the default provider."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs or self.compact is False:
+            # indent / custom options: let the stdlib encoder handle them
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s) if not kwargs else super().loads(s, **kwargs)
+
+    def _encode(self, obj):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(obj)
+        return self._app.response_class(self._encode(obj) + b'\n', mimetype=self.mimetype)
+
+
+def _accepted(request):
+    accept = request.accept_encodings
+    if brotli is not None and accept['br']:
+        return 'br'
+    if accept['gzip']:
+        return 'gzip'
+    return None
+
+
+def init_app(app):
+    """Use orjson for JSON when available and compress responses on the way out."""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+
+    from flask import request
+
+    @app.after_request
+    def _compress(response):
+        if response.status_code != 200 or response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return response
+        if not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = _accepted(request)
+        data = response.get_data()
+        if encoding is None or len(data) < COMPRESS_MIN_SIZE:
+            return response
+        if encoding == 'br':
+            data = brotli.compress(data, quality=min(COMPRESS_LEVEL, 11))
+        else:
+            data = gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        # the body differs from the identity encoding, so the validator becomes weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,240 @@
+"""Item co-occurrence learned from the selections users submit.
+
+Every /recommend selection is appended as one JSON line to SELECTIONS_LOG
+(append-only, safe for concurrent workers). ``update()`` reads the log from
+where it last stopped and folds the new selections into a sparse item-item
+matrix in COOCCUR_DB: a pair count per (item, other) and a selection count per
+item. Each item keeps only its COOCCUR_KEEP strongest neighbours, so the
+matrix stays bounded however long the log grows, and the log is read in
+chunks of COOCCUR_CHUNK lines, so the job's memory is bounded too.
+
+``scores(seeds)`` reads each seed's top COOCCUR_TOP_N neighbours (one indexed
+query per seed) and weighs them by cosine similarity; ``blend()`` adds them to
+a content-based list as ``weight * similarity`` points (COOCCUR_WEIGHT, 0 =
+off). Workers run ``update()`` every COOCCUR_UPDATE_INTERVAL seconds, one at a
+time; ``python cooccur.py`` runs it once.
+"""
+import json
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from itertools import combinations
+
+import refresh
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SELECTIONS_LOG = os.environ.get('SELECTIONS_LOG', os.path.join(ROOT, 'instance', 'selections.log'))
+COOCCUR_DB = os.environ.get('COOCCUR_DB', os.path.join(ROOT, 'instance', 'cooccur.db'))
+COOCCUR_WEIGHT = float(os.environ.get('COOCCUR_WEIGHT', 0))
+# neighbours read per seed, and kept per item (the slack lets new pairs climb into the top N)
+COOCCUR_TOP_N = int(os.environ.get('COOCCUR_TOP_N', 50))
+COOCCUR_KEEP = int(os.environ.get('COOCCUR_KEEP', 2 * COOCCUR_TOP_N))
+COOCCUR_CHUNK = int(os.environ.get('COOCCUR_CHUNK', 10000))
+COOCCUR_UPDATE_INTERVAL = float(os.environ.get('COOCCUR_UPDATE_INTERVAL', 300))
+# at most N ids of a selection are paired (a 1000-title history would be ~500k pairs); longer
+# selections are sampled, seeded by the log line so a re-read pairs the same ids
+COOCCUR_MAX_SET = 20
+# SQLite INTEGER range; ids outside it are never logged or paired
+ID_LIMIT = 2 ** 63
+
+_log_lock = threading.Lock()
+_local = threading.local()
+_scheduler = None
+
+
+def _storable(movie_id):
+    return isinstance(movie_id, int) and not isinstance(movie_id, bool) and -ID_LIMIT <= movie_id < ID_LIMIT
+
+
+def log_selection(movie_ids):
+    """Append one selection to the log; never raises into the request."""
+    ids = sorted({int(i) for i in movie_ids if _storable(int(i))})
+    if len(ids) < 2:
+        return
+    line = json.dumps({'t': int(time.time()), 'ids': ids}, separators=(',', ':')) + '\n'
+    try:
+        os.makedirs(os.path.dirname(SELECTIONS_LOG) or '.', exist_ok=True)
+        with _log_lock:
+            # O_APPEND writes of one short line do not interleave between processes
+            fd = os.open(SELECTIONS_LOG, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+    except OSError as e:
+        print(f"Selection log error: {e}")
+
+
+def _conn():
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid() or _local.path != COOCCUR_DB:
+        # connections must not cross a fork
+        os.makedirs(os.path.dirname(COOCCUR_DB) or '.', exist_ok=True)
+        conn = sqlite3.connect(COOCCUR_DB, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS pairs (item INTEGER NOT NULL, other INTEGER NOT NULL, '
+                     'count INTEGER NOT NULL, PRIMARY KEY (item, other)) WITHOUT ROWID')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_pairs_top ON pairs (item, count DESC, other)')
+        conn.execute('CREATE TABLE IF NOT EXISTS items (item INTEGER PRIMARY KEY, count INTEGER NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        conn.commit()
+        _local.conn = conn
+        _local.pid = os.getpid()
+        _local.path = COOCCUR_DB
+    return conn
+
+
+def _read_chunks(f, size):
+    """Yield (selections, end offset) for up to ``size`` complete lines at a time."""
+    while True:
+        selections = []
+        for _ in range(size):
+            line = f.readline()
+            if not line:
+                break
+            if not line.endswith(b'\n'):
+                # a line still being written: pick it up next time
+                f.seek(-len(line), os.SEEK_CUR)
+                break
+            try:
+                ids = [i for i in json.loads(line)['ids'] if _storable(i)]
+            except (ValueError, KeyError, TypeError):
+                continue
+            if len(ids) > COOCCUR_MAX_SET:
+                ids = random.Random(line).sample(ids, COOCCUR_MAX_SET)
+            selections.append(ids)
+        if not selections:
+            return
+        yield selections, f.tell()
+
+
+def _apply(conn, selections, offset, inode):
+    items = defaultdict(int)
+    pairs = defaultdict(int)
+    for ids in selections:
+        for i in ids:
+            items[i] += 1
+        for a, b in combinations(ids, 2):
+            pairs[a, b] += 1
+            pairs[b, a] += 1
+    with conn:
+        conn.executemany('INSERT INTO items (item, count) VALUES (?, ?) '
+                         'ON CONFLICT (item) DO UPDATE SET count = count + excluded.count', items.items())
+        conn.executemany('INSERT INTO pairs (item, other, count) VALUES (?, ?, ?) '
+                         'ON CONFLICT (item, other) DO UPDATE SET count = count + excluded.count',
+                         ((a, b, n) for (a, b), n in pairs.items()))
+        # prune every touched item back to its strongest COOCCUR_KEEP neighbours
+        conn.executemany('DELETE FROM pairs WHERE item = ? AND other NOT IN '
+                         '(SELECT other FROM pairs WHERE item = ? ORDER BY count DESC, other LIMIT ?)',
+                         ((i, i, COOCCUR_KEEP) for i in items))
+        conn.executemany('INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)',
+                         (('offset', offset), ('inode', inode)))
+
+
+def update(wait=0):
+    """Fold selections logged since the last run into the matrix. Returns the number applied.
+
+    Only one process updates at a time; the others return 0 straight away.
+    """
+    with refresh.file_lock(COOCCUR_DB + '.lock', wait) as locked:
+        if not locked:
+            return 0
+        conn = _conn()
+        state = dict(conn.execute('SELECT key, value FROM state').fetchall())
+        try:
+            f = open(SELECTIONS_LOG, 'rb')
+        except FileNotFoundError:
+            return 0
+        applied = 0
+        with f:
+            st = os.fstat(f.fileno())
+            offset = state.get('offset', 0)
+            if st.st_ino != state.get('inode', st.st_ino) or st.st_size < offset:
+                # the log was rotated or truncated: start over on the new file
+                offset = 0
+            f.seek(offset)
+            for selections, end in _read_chunks(f, COOCCUR_CHUNK):
+                applied += _apply_chunk(conn, selections, end, st.st_ino)
+        return applied
+
+
+def _apply_chunk(conn, selections, offset, inode):
+    try:
+        _apply(conn, selections, offset, inode)
+        return len(selections)
+    except (OverflowError, TypeError, ValueError) as e:
+        # the chunk was rolled back: apply its selections one at a time and skip the bad ones,
+        # so one bad line cannot hold the offset back for good
+        print(f"Co-occurrence update: skipping bad selections ({e})")
+    applied = 0
+    for ids in selections:
+        try:
+            _apply(conn, [ids], offset, inode)
+            applied += 1
+        except (OverflowError, TypeError, ValueError):
+            pass
+    _apply(conn, [], offset, inode)
+    return applied
+
+
+def neighbors(movie_id, n=None):
+    """[(other, pair count, other's selection count)] for the ``n`` strongest neighbours of ``movie_id``."""
+    return _conn().execute(
+        'SELECT p.other, p.count, i.count FROM pairs p JOIN items i ON i.item = p.other '
+        'WHERE p.item = ? ORDER BY p.count DESC, p.other LIMIT ?', (movie_id, n or COOCCUR_TOP_N)).fetchall()
+
+
+def scores(movie_ids):
+    """{movie_id: similarity in [0, 1]} of the seeds' neighbours (cosine, averaged over the seeds)."""
+    seeds = set(movie_ids)
+    if not seeds:
+        return {}
+    try:
+        conn = _conn()
+        counts = dict(conn.execute(f"SELECT item, count FROM items WHERE item IN ({','.join('?' * len(seeds))})",
+                                   list(seeds)).fetchall())
+        total = defaultdict(float)
+        for seed, seed_count in counts.items():
+            for other, pair_count, other_count in neighbors(seed):
+                if other not in seeds:
+                    total[other] += pair_count / math.sqrt(seed_count * other_count)
+    except sqlite3.Error as e:
+        print(f"Co-occurrence lookup error: {e}")
+        return {}
+    return {movie_id: value / len(seeds) for movie_id, value in total.items()}
+
+
+def blend(recommendations, movie_ids, weight=None, keep=None):
+    """Add ``weight`` * co-occurrence similarity to a ``[(movie_id, score), ...]`` list and re-sort it.
+
+    Movies not already in the list are only added if ``keep(movie_id)`` allows them.
+    """
+    weight = COOCCUR_WEIGHT if weight is None else weight
+    if not weight:
+        return recommendations
+    similar = scores(movie_ids)
+    if not similar:
+        return recommendations
+    combined = dict(recommendations)
+    for movie_id, value in similar.items():
+        if movie_id in combined or keep is None or keep(movie_id):
+            combined[movie_id] = combined.get(movie_id, 0.0) + weight * value
+    return sorted(combined.items(), key=lambda x: (-x[1], x[0]))
+
+
+def start_updates():
+    """Run ``update()`` in the background every COOCCUR_UPDATE_INTERVAL seconds (0 disables)."""
+    global _scheduler
+    if COOCCUR_UPDATE_INTERVAL <= 0 or _scheduler is not None:
+        return
+    _scheduler = refresh.Scheduler(update, COOCCUR_UPDATE_INTERVAL, 0.1, 'cooccur-update').start()
+
+
+if __name__ == '__main__':
+    started = time.perf_counter()
+    print(f"Applied {update(wait=60)} selections in {time.perf_counter() - started:.2f}s")
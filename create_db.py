@@ -1,7 +1,8 @@
-from app import app, db
+from database import app_context
+from models import db
 
 if __name__ == '__main__':
-    with app.app_context():
+    with app_context():
         # Drop existing tables and recreate to pick up model changes (development only)
         db.drop_all()
         db.create_all()
@@ -0,0 +1,49 @@
+"""Database access without the web app.
+
+Scripts that only read or write the Movie table use ``app_context()`` from
+here instead of importing app.py, which builds the web app (routes, hooks,
+caches, TMDb client) and takes noticeably longer to start:
+
+    from database import app_context
+    from models import Movie
+
+    with app_context():
+        print(Movie.query.count())
+"""
+import os
+
+from dotenv import load_dotenv
+from flask import Flask
+
+from models import db
+
+# DATABASE_URL may come from .env, same as for the web app
+load_dotenv()
+
+_app = None
+
+
+def database_uri():
+    return os.environ.get('DATABASE_URL', 'sqlite:///movies.db')
+
+
+def configure(app):
+    """Point ``app`` at the movies database and bind ``db`` to it."""
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+
+def get_app():
+    """A bare Flask app with only the database configured (created on first use)."""
+    global _app
+    if _app is None:
+        # same root as app.py, so a relative sqlite URL resolves to the same instance/ file
+        app = Flask(__name__)
+        configure(app)
+        _app = app
+    return _app
+
+
+def app_context():
+    return get_app().app_context()
@@ -0,0 +1,72 @@
+"""Pre-rendered HTML fragments for the home page.
+
+Each section of the home page (movies grid and the three carousels) is
+rendered from ``templates/fragments/<name>.html`` once per data version and
+kept as markup, so a home request that finds its data unchanged only
+assembles strings. The version is whatever identifies the data the fragment
+was built from: for TMDb lists, when the list cache fetched the page.
+
+The page around the sections is a shell: the page template rendered once
+with a marker in place of each fragment and split on the markers, so a home
+request is ``''.join()`` of shell parts and fragment markup.
+"""
+import re
+import threading
+import time
+
+from flask import current_app, render_template
+from markupsafe import Markup
+
+import metrics
+
+_fragments = {}  # name -> (version, expires_at, html, extra)
+_shells = {}  # template -> [static, fragment name, static, ..., static]
+_lock = threading.Lock()
+_MARKER = re.compile(r'<!--fragment:(\w+)-->')
+
+
+def cached(name, version):
+    """(html, extra) rendered for ``version`` if still fresh, else None."""
+    entry = _fragments.get(name)
+    hit = entry is not None and version is not None and entry[0] == version and entry[1] > time.time()
+    metrics.cache_lookup('fragments', hit)
+    return (entry[2], entry[3]) if hit else None
+
+
+def render(name, version, ttl, movies, extra=None):
+    """Render ``fragments/<name>.html`` for ``movies``; keep it unless ``version`` is None (uncacheable)."""
+    html = Markup(render_template(f'fragments/{name}.html', movies=movies))
+    if version is not None:
+        with _lock:
+            _fragments[name] = (version, time.time() + ttl, html, extra)
+    return html, extra
+
+
+def invalidate(name=None):
+    with _lock:
+        if name is None:
+            _fragments.clear()
+        else:
+            _fragments.pop(name, None)
+
+
+def shell(template, names):
+    """Static parts of ``template`` around the fragments ``names``, rendered once per process.
+
+    The template must use only ``fragments.<name>`` for per-request content.
+    """
+    parts = _shells.get(template)
+    metrics.cache_lookup('page_shell', parts is not None)
+    if parts is None:
+        markers = {name: Markup(f'<!--fragment:{name}-->') for name in names}
+        parts = _MARKER.split(render_template(template, fragments=markers))
+        if not current_app.jinja_env.auto_reload:
+            _shells[template] = parts
+    return parts
+
+
+def assemble(template, sections):
+    """The page ``template`` with each fragment marker replaced by ``sections[name]``."""
+    parts = shell(template, sections)
+    # split() alternates static text (even positions) and fragment names (odd positions)
+    return ''.join(part if i % 2 == 0 else sections[part] for i, part in enumerate(parts))
@@ -0,0 +1,136 @@
+"""HTTP caching for read endpoints: content-hash ETags, 304s and Cache-Control.
+
+Each cached endpoint gets a ``Policy``. Responses get an ETag (sha1 of the
+body), a Last-Modified (when that body was first served), Cache-Control and
+Vary. The ETag is also remembered per request (path + query string, the
+session's recommendation token for per-session routes, and the local data
+version) for the policy's max-age, so a later request carrying a matching
+If-None-Match is answered with 304 before the view runs: no query, no TMDb
+call, no render. Call ``bump`` after writing to the Movie table.
+
+The data version lives in DATA_VERSION_FILE, so a write in one worker
+invalidates the validators of every worker on the host: ``bump`` appends a
+byte to the file and the version is its (mtime, size).
+"""
+import hashlib
+import os
+import threading
+import time
+
+from flask import request, session
+
+import metrics
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DATA_VERSION_FILE = os.environ.get('DATA_VERSION_FILE', os.path.join(ROOT, 'instance', 'data_version'))
+MAX_VALIDATORS = 20000
+# the version file is started over (new mtime, so still a new version) once it grows this large
+DATA_VERSION_MAX_SIZE = 4096
+
+_validators = {}  # key -> (etag, last_modified, expires_at)
+_lock = threading.Lock()
+
+
+class Policy:
+    __slots__ = ('cache_control', 'max_age', 'vary', 'per_session')
+
+    def __init__(self, cache_control, max_age, vary=(), per_session=False):
+        self.cache_control = cache_control
+        self.max_age = max_age
+        self.vary = tuple(vary)
+        self.per_session = per_session
+
+
+def bump():
+    """Invalidate remembered validators (in every worker) after local data changed."""
+    try:
+        os.makedirs(os.path.dirname(DATA_VERSION_FILE) or '.', exist_ok=True)
+        # O_APPEND: concurrent bumps from several processes each add their byte
+        fd = os.open(DATA_VERSION_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size + os.write(fd, b'.')
+        finally:
+            os.close(fd)
+        if size >= DATA_VERSION_MAX_SIZE:
+            tmp = f'{DATA_VERSION_FILE}.{os.getpid()}'
+            with open(tmp, 'wb') as f:
+                f.write(b'.')
+            os.replace(tmp, DATA_VERSION_FILE)
+    except OSError as e:
+        print(f"Data version bump error: {e}")
+
+
+def data_version():
+    """Version of the local data, shared by the workers on this host; changes on every ``bump``."""
+    try:
+        st = os.stat(DATA_VERSION_FILE)
+    except OSError:
+        return 0
+    return st.st_mtime_ns, st.st_size
+
+
+def request_key(endpoint, full_path, token=None):
+    return endpoint, full_path, token, data_version()
+
+
+def fresh(key, if_none_match):
+    """The remembered validator for ``key`` if it is unexpired and listed in ``if_none_match``."""
+    entry = _validators.get(key)
+    if entry is None or entry[2] < time.time() or not if_none_match.contains_weak(entry[0]):
+        return None
+    return entry
+
+
+def _remember(key, etag, max_age):
+    now = time.time()
+    entry = _validators.get(key)
+    last_modified = entry[1] if entry is not None and entry[0] == etag else now
+    with _lock:
+        if len(_validators) >= MAX_VALIDATORS:
+            # drop expired entries, then the oldest if that was not enough
+            for stale in [k for k, v in _validators.items() if v[2] < now]:
+                del _validators[stale]
+            while len(_validators) >= MAX_VALIDATORS:
+                _validators.pop(next(iter(_validators)))
+        _validators[key] = (etag, last_modified, now + max_age)
+    return last_modified
+
+
+def _apply(response, policy):
+    response.headers['Cache-Control'] = policy.cache_control
+    for header in policy.vary:
+        response.vary.add(header)
+
+
+def init_app(app, policies):
+    """Register the conditional-request hooks for ``policies`` ({endpoint: Policy})."""
+
+    def _key(policy):
+        token = session.get('recs_token') if policy.per_session else None
+        return request_key(request.endpoint, request.full_path, token)
+
+    @app.before_request
+    def _answer_conditional():
+        policy = policies.get(request.endpoint)
+        if policy is None or request.method != 'GET' or not request.if_none_match:
+            return None
+        entry = fresh(_key(policy), request.if_none_match)
+        metrics.cache_lookup('http_validators', entry is not None)
+        if entry is None:
+            return None
+        response = app.response_class(status=304)
+        response.set_etag(entry[0])
+        response.last_modified = entry[1]
+        _apply(response, policy)
+        return response
+
+    @app.after_request
+    def _cache_headers(response):
+        policy = policies.get(request.endpoint)
+        if policy is None or request.method != 'GET' or response.status_code != 200 or response.direct_passthrough:
+            return response
+        etag = hashlib.sha1(response.get_data()).hexdigest()
+        response.set_etag(etag)
+        response.last_modified = _remember(_key(policy), etag, policy.max_age)
+        _apply(response, policy)
+        return response.make_conditional(request)
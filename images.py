@@ -0,0 +1,180 @@
+"""Poster proxy: /img/<size>/<file> served from a local disk cache.
+
+TMDb images are fetched once per size and kept under IMAGE_CACHE_DIR
+(default ``instance/img_cache``). The least recently served files are evicted
+once the directory grows past IMAGE_CACHE_MAX_MB. Responses are immutable
+for a year. Missing or broken posters get a locally generated SVG placeholder
+(``placeholder.svg``, or ``placeholder-person.svg`` for cast photos).
+
+Templates go through the ``poster`` filter, which maps a stored TMDb or
+placeholder URL to the proxy, for example ``{{ movie.poster_url|poster('w342') }}``.
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import abort, send_file, url_for
+
+import metrics
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', os.path.join(ROOT, 'instance', 'img_cache'))
+IMAGE_CACHE_MAX_MB = float(os.environ.get('IMAGE_CACHE_MAX_MB', 512))
+TMDB_IMAGE_BASE = 'https://image.tmdb.org/t/p'
+IMAGE_SIZES = ('w92', 'w154', 'w185', 'w342', 'w500', 'w780', 'original')
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# served when TMDb has no image for a path; short-lived so a later fetch can succeed
+MISSING_CACHE_CONTROL = 'public, max-age=300'
+
+PLACEHOLDERS = {'placeholder.svg': 'No Image', 'placeholder-person.svg': 'No Photo'}
+TMDB_URL = re.compile(r'^https?://image\.tmdb\.org/t/p/([a-z0-9]+)/([^/?#]+)$')
+FILE_NAME = re.compile(r'^[A-Za-z0-9_-]+\.(jpg|jpeg|png|webp)$')
+# cached files are re-touched at most this often (seconds) to record recent use
+TOUCH_INTERVAL = 3600
+MIME_TYPES = {'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'png': 'image/png', 'webp': 'image/webp'}
+
+
+class DiskCache:
+    """Files under ``root`` with a total size limit, evicted least recently used first."""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.total = 0
+        self._index = None  # relpath -> size, least recently used first
+        self._lock = threading.Lock()
+
+    def _load(self):
+        entries = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, os.path.relpath(path, self.root), st.st_size))
+        entries.sort()
+        self._index = OrderedDict((rel, size) for _, rel, size in entries)
+        self.total = sum(self._index.values())
+
+    def get(self, rel):
+        """Path of a cached file (marked as recently used), or None."""
+        path = os.path.join(self.root, rel)
+        with self._lock:
+            if self._index is None:
+                self._load()
+            if rel not in self._index:
+                return None
+            if not os.path.exists(path):
+                # evicted by another worker sharing the directory
+                self.total -= self._index.pop(rel)
+                return None
+            self._index.move_to_end(rel)
+        try:
+            # mtime records recency for the next process that scans the directory
+            if time.time() - os.stat(path).st_mtime > TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, rel, data):
+        path = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._index is None:
+                self._load()
+            self.total += len(data) - self._index.pop(rel, 0)
+            self._index[rel] = len(data)
+            while self.total > self.max_bytes and len(self._index) > 1:
+                old, size = self._index.popitem(last=False)
+                self.total -= size
+                try:
+                    os.remove(os.path.join(self.root, old))
+                except OSError:
+                    pass
+        return path
+
+
+CACHE = DiskCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_MB * 1024 * 1024)
+
+
+def placeholder_svg(size, text):
+    width = int(size[1:]) if size != 'original' else 500
+    height = width * 3 // 2
+    font = max(10, width // 10)
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}"><rect width="100%" height="100%" fill="#cccccc"/>'
+            f'<text x="50%" y="50%" fill="#666666" font-family="sans-serif" font-size="{font}" '
+            f'text-anchor="middle" dominant-baseline="middle">{text}</text></svg>')
+
+
+def local_url(url, size=None, placeholder='placeholder.svg'):
+    """Proxy URL for a stored poster/profile URL. Other hosts are returned unchanged."""
+    match = TMDB_URL.match(url or '')
+    if match and FILE_NAME.match(match.group(2)):
+        return url_for('image', size=size or match.group(1), filename=match.group(2))
+    if not url or 'placeholder' in url or url.startswith(TMDB_IMAGE_BASE):
+        # empty, placeholder service, or a broken TMDb URL such as .../w500None
+        return url_for('image', size=size or 'w500', filename=placeholder)
+    return url
+
+
+def _fetch(size, filename):
+    import requests  # deferred: only a cache miss needs it
+
+    try:
+        with metrics.TMDB_LATENCY.time(endpoint='image'):
+            r = requests.get(f'{TMDB_IMAGE_BASE}/{size}/{filename}', timeout=10)
+    except Exception as e:
+        metrics.TMDB_ERRORS.inc(endpoint='image')
+        print(f"TMDb image error: {e}")
+        return None
+    if r.status_code != 200:
+        metrics.TMDB_ERRORS.inc(endpoint='image')
+        return None
+    return r.content
+
+
+def _placeholder_response(app, size, filename, cache_control):
+    response = app.response_class(placeholder_svg(size, PLACEHOLDERS[filename]), mimetype='image/svg+xml')
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def init_app(app):
+    """Register the /img route and the ``poster`` template filter."""
+
+    def image(size, filename):
+        if size not in IMAGE_SIZES:
+            abort(404)
+        if filename in PLACEHOLDERS:
+            return _placeholder_response(app, size, filename, CACHE_CONTROL)
+        match = FILE_NAME.match(filename)
+        if not match:
+            abort(404)
+
+        rel = os.path.join(size, filename)
+        path = CACHE.get(rel)
+        metrics.cache_lookup('images', path is not None)
+        if path is None:
+            data = _fetch(size, filename)
+            if data is None:
+                return _placeholder_response(app, size, 'placeholder.svg', MISSING_CACHE_CONTROL)
+            path = CACHE.put(rel, data)
+
+        # a TMDb image path never changes content, so the path itself is the validator
+        response = send_file(path, mimetype=MIME_TYPES[match.group(1)], conditional=True, etag=f'{size}-{filename}')
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        return response
+
+    app.add_url_rule('/img/<size>/<filename>', 'image', image)
+    app.add_template_filter(local_url, 'poster')
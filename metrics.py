@@ -0,0 +1,252 @@
+"""In-process metrics with Prometheus text exposition.
+
+Counters and histograms are kept per worker process; scrape each worker (or
+put them behind a multiprocess-aware collector) when running several.
+Durations that belong to the current request can also be accumulated into a
+``Server-Timing`` header, see ``add_server_timing``.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+# seconds; covers sub-millisecond cache hits up to slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+_lock = threading.Lock()
+
+
+def _label_str(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.labels), 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_label_str(self.labels, key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    @contextmanager
+    def time(self, timing=None, **labels):
+        """Observe the duration of the block; ``timing`` also adds it to the request's Server-Timing."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe(elapsed, **labels)
+            if timing:
+                add_server_timing(timing, elapsed)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, (counts, count, total) in sorted(self._values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _label_str(self.labels + ('le',), key + (repr(float(bound)),))
+                lines.append(f'{self.name}_bucket{labels} {bucket_count}')
+            lines.append(f'{self.name}_bucket{_label_str(self.labels + ("le",), key + ("+Inf",))} {count}')
+            lines.append(f'{self.name}_sum{_label_str(self.labels, key)} {total}')
+            lines.append(f'{self.name}_count{_label_str(self.labels, key)} {count}')
+        return lines
+
+
+class Gauge:
+    """A gauge whose value is read from ``fn`` at scrape time."""
+
+    def __init__(self, name, help, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        REGISTRY.append(self)
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge', f'{self.name} {value}']
+
+
+class CacheHitRatio:
+    """Hit ratio per cache, derived from ``cache_requests_total``."""
+
+    name = 'cache_hit_ratio'
+
+    def __init__(self, counter):
+        self.counter = counter
+        REGISTRY.append(self)
+
+    def render(self):
+        caches = sorted({key[0] for key in self.counter._values})
+        lines = [f'# HELP {self.name} Fraction of lookups that were hits, by cache.', f'# TYPE {self.name} gauge']
+        for cache in caches:
+            lines.append(f'{self.name}{_label_str(("cache",), (cache,))} {cache_hit_ratio(cache):.6f}')
+        return lines
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Shared metrics used across the app
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests by route, method and status.',
+                        ('route', 'method', 'status'))
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency by route.', ('route',))
+DB_LATENCY = Histogram('db_query_duration_seconds', 'Duration of SQL statements.')
+TMDB_LATENCY = Histogram('tmdb_request_duration_seconds', 'TMDb API call latency by endpoint.', ('endpoint',))
+TMDB_ERRORS = Counter('tmdb_errors_total', 'TMDb API calls that failed or returned non-200, by endpoint.',
+                      ('endpoint',))
+TMDB_LIST_REFRESHES = Counter('tmdb_list_refresh_total', 'Background TMDb list refreshes by result (ok/error).',
+                              ('result',))
+SCORING_LATENCY = Histogram('recommend_scoring_duration_seconds', 'Time spent scoring the catalog.', ('mode',))
+RENDER_LATENCY = Histogram('template_render_duration_seconds', 'Jinja template render time.', ('template',))
+SHADOW_COMPARISONS = Counter('shadow_comparisons_total',
+                             'Sampled requests re-scored by the shadow engine, by engine and result '
+                             '(ok/error/dropped).', ('engine', 'result'))
+SHADOW_LATENCY = Histogram('shadow_scoring_duration_seconds',
+                           'Scoring time of shadowed requests, by engine (primary or the shadow engine).',
+                           ('engine',))
+SHADOW_OVERLAP = Histogram('shadow_overlap_at_k', 'Top-K overlap between the primary and shadow engines.',
+                           ('engine',), buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.99, 1.0))
+SHADOW_RANK_CORRELATION = Histogram('shadow_rank_correlation',
+                                    "Kendall's tau over the top-K movies both engines returned.", ('engine',),
+                                    buckets=(-0.5, 0.0, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0))
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by cache and result (hit/miss).',
+                         ('cache', 'result'))
+CacheHitRatio(CACHE_REQUESTS)
+
+
+def cache_lookup(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def cache_hit_ratio(cache):
+    hits = CACHE_REQUESTS.value(cache=cache, result='hit')
+    total = hits + CACHE_REQUESTS.value(cache=cache, result='miss')
+    return hits / total if total else 0.0
+
+
+def add_server_timing(name, seconds):
+    """Accumulate a duration under ``name`` for the current request's Server-Timing header."""
+    if not has_request_context():
+        return
+    timings = g.setdefault('server_timing', {})
+    timings[name] = timings.get(name, 0.0) + seconds
+
+
+def instrument_sqlalchemy():
+    """Time every SQL statement executed by any engine."""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append((statement, time.perf_counter()))
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()[1]
+        DB_LATENCY.observe(elapsed)
+        add_server_timing('db', elapsed)
+
+    @event.listens_for(Engine, 'handle_error')
+    def _error(context):
+        # a failed statement never reaches after_cursor_execute: drop its start time
+        started = context.connection.info.get('query_started') if context.connection is not None else None
+        if started and started[-1][0] == context.statement:
+            started.pop()
+
+
+def instrument_app(app):
+    """Register request/template hooks on ``app``.
+
+    Set ``app.config['SERVER_TIMING']`` to add a Server-Timing header to responses.
+    """
+    from flask import before_render_template, request, template_rendered
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        HTTP_LATENCY.observe(elapsed, route=route)
+        if app.config.get('SERVER_TIMING'):
+            response.headers['Server-Timing'] = server_timing_header(total=elapsed)
+        return response
+
+    def _render_started(sender, template, context, **extra):
+        g.setdefault('render_started', []).append(time.perf_counter())
+
+    def _render_finished(sender, template, context, **extra):
+        stack = g.get('render_started')
+        if stack:
+            elapsed = time.perf_counter() - stack.pop()
+            RENDER_LATENCY.observe(elapsed, template=template.name or 'string')
+            add_server_timing('render', elapsed)
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
+
+
+def server_timing_header(total=None):
+    timings = dict(g.get('server_timing') or {})
+    if total is not None:
+        timings['total'] = total
+    return ', '.join(f'{name};dur={seconds * 1000:.2f}' for name, seconds in timings.items())
@@ -17,9 +17,26 @@ class Movie(db.Model):
     vote_average = db.Column(db.Float, nullable=True)
     vote_count = db.Column(db.Integer, nullable=True)
 
+    # Browse indexes for /movies_api: sort key, then id as the keyset tie-breaker,
+    # then the filter columns so the min_rating / vote_count filters stay in the index
+    __table_args__ = (
+        db.Index('ix_movie_browse_rating', 'vote_average', 'id', 'vote_count'),
+        db.Index('ix_movie_browse_year', 'year', 'id', 'vote_average', 'vote_count'),
+        db.Index('ix_movie_browse_title', 'title', 'id', 'vote_average', 'vote_count'),
+        db.Index('ix_movie_tmdb_id', 'tmdb_id'),
+    )
+
     def __repr__(self):
         return f'<Movie {self.title}>'
 
+
+def ensure_indexes():
+    """Create indexes declared on the models that an existing database is missing."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
 class Recommendation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     source_movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), nullable=False)
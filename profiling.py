@@ -0,0 +1,159 @@
+"""Opt-in profiling middleware for slow or sampled requests.
+
+Two capture modes, both configured from the environment:
+
+* PROFILE_SAMPLE_RATE (0..1): that fraction of requests runs under cProfile
+  and is written as a ``.pstats`` file.
+* PROFILE_SLOW_MS: every other request is watched by a background stack
+  sampler (every PROFILE_INTERVAL_MS); if it takes longer than the threshold
+  its samples are written as a collapsed-stack ``.collapsed`` file, ready for
+  flamegraph tools.
+
+Each profile gets a ``.json`` sidecar with the method, route, path, query
+string and duration. Files go to PROFILE_DIR (default ``instance/profiles``).
+Summarize them with ``python tools/profile_report.py``.
+"""
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(ROOT, 'instance', 'profiles'))
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+def collapse(frame):
+    """Collapsed-stack string (root first, ';' separated) for a frame."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Background thread that samples the stacks of registered request threads."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._watched = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+            self._thread.start()
+
+    def watch(self, thread_id):
+        samples = Counter()
+        with self._lock:
+            self._watched[thread_id] = samples
+            self._ensure_running()
+        return samples
+
+    def unwatch(self, thread_id):
+        with self._lock:
+            self._watched.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                watched = list(self._watched.items())
+            if not watched:
+                continue
+            frames = sys._current_frames()
+            for thread_id, samples in watched:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[collapse(frame)] += 1
+
+
+class ProfilingMiddleware:
+    """WSGI middleware writing profiles for sampled and slow requests."""
+
+    def __init__(self, wsgi_app, out_dir=PROFILE_DIR, sample_rate=0.0, slow_ms=0.0, interval_ms=5.0):
+        self.wsgi_app = wsgi_app
+        self.out_dir = out_dir
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.sampler = StackSampler(interval_ms / 1000.0) if slow_ms else None
+        os.makedirs(out_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, wsgi_app):
+        """Wrap ``wsgi_app`` if profiling is enabled in the environment, else return it unchanged."""
+        sample_rate = float(os.environ.get('PROFILE_SAMPLE_RATE', 0) or 0)
+        slow_ms = float(os.environ.get('PROFILE_SLOW_MS', 0) or 0)
+        if not sample_rate and not slow_ms:
+            return wsgi_app
+        return cls(wsgi_app, out_dir=PROFILE_DIR, sample_rate=sample_rate, slow_ms=slow_ms,
+                   interval_ms=float(os.environ.get('PROFILE_INTERVAL_MS', 5) or 5))
+
+    def __call__(self, environ, start_response):
+        if self.sample_rate and random.random() < self.sample_rate:
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            try:
+                return profiler.runcall(self.wsgi_app, environ, start_response)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self._write(environ, elapsed_ms, 'sampled', lambda path: profiler.dump_stats(path), '.pstats')
+
+        if self.sampler is None:
+            return self.wsgi_app(environ, start_response)
+
+        thread_id = threading.get_ident()
+        samples = self.sampler.watch(thread_id)
+        started = time.perf_counter()
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            self.sampler.unwatch(thread_id)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= self.slow_ms and samples:
+                self._write(environ, elapsed_ms, 'slow', lambda path: self._write_collapsed(path, samples),
+                            '.collapsed')
+
+    @staticmethod
+    def _write_collapsed(path, samples):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+    def _write(self, environ, elapsed_ms, reason, dump, suffix):
+        flask_request = environ.get('werkzeug.request')
+        rule = getattr(flask_request, 'url_rule', None)
+        route = rule.rule if rule is not None else environ.get('PATH_INFO', '')
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        base = os.path.join(self.out_dir, f'{time.strftime("%Y%m%d-%H%M%S")}-{slug}-{int(elapsed_ms)}ms-'
+                                          f'{uuid.uuid4().hex[:8]}')
+        meta = {
+            'reason': reason,
+            'method': environ.get('REQUEST_METHOD'),
+            'route': route,
+            'path': environ.get('PATH_INFO'),
+            'query': environ.get('QUERY_STRING', ''),
+            'view_args': getattr(flask_request, 'view_args', None),
+            'duration_ms': round(elapsed_ms, 2),
+            'profile': os.path.basename(base + suffix),
+            'timestamp': time.time(),
+        }
+        try:
+            dump(base + suffix)
+            with open(base + '.json', 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2, default=str)
+        except OSError as e:
+            print(f"Profile write error: {e}")
@@ -0,0 +1,777 @@
+"""Content-based scoring over the catalog snapshot.
+
+Scoring works on the interned feature arrays from ``snapshot`` instead of ORM
+rows: the seed selection is turned into sets of term ids, candidate rows are
+gathered from the postings lists (plus the year range), and only those rows
+are scored. Results are identical to scoring every row of the Movie table.
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+
+import httpcache
+import refresh
+import snapshot
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+WEIGHTS_PATH = os.environ.get('SCORING_WEIGHTS', os.path.join(ROOT, 'scoring_weights.json'))
+# how often (seconds) the weights file is re-stat'ed for hot reload
+WEIGHTS_CHECK_INTERVAL = float(os.environ.get('SCORING_WEIGHTS_CHECK_INTERVAL', 5))
+
+# Built-in profile, used when the weights file is missing or invalid
+DEFAULT_WEIGHTS = {
+    'genre': 40,
+    'director': 20,
+    'writer': 10,
+    'actors': 20,
+    'year': 10,
+    'actors_top_n': 3,
+    'year_window': 5,
+    # fraction of the actors weight for 0, 1, 2, 3+ shared top actors
+    'actor_overlap': [0, 0.4, 0.75, 1.0],
+}
+# genre tables are precomputed up to this many distinct seed genres
+_GENRE_TABLE_SIZE = 32
+# taste profiles keep at most this many genres / directors / writers / actors
+TASTE_MAX_TERMS = int(os.environ.get('TASTE_PROFILE_MAX_TERMS', 50))
+
+# seconds a request whose seeds are newer than the catalog waits for this process's rebuild
+CATALOG_REBUILD_WAIT = float(os.environ.get('CATALOG_REBUILD_WAIT', 2))
+
+# In-memory catalog built from the database when no snapshot file is published.
+# Writes to the Movie table never re-encode on the request path: they schedule a
+# rebuild on a background thread (one at a time; writes during a rebuild queue one
+# more), and requests keep scoring against the previous catalog until it is swapped in.
+_memory = {'snapshot': None, 'version': None, 'checked': 0.0}
+_memory_lock = threading.Lock()
+_rebuild = {'thread': None, 'again': False}
+_idle = threading.Event()
+_idle.set()
+
+
+def mark_dirty():
+    """Call after writing to the Movie table (in an app context) to rebuild the catalog in the background."""
+    _schedule_rebuild(current_app._get_current_object())
+
+
+def _schedule_rebuild(app):
+    with _memory_lock:
+        if _rebuild['thread'] is not None:
+            _rebuild['again'] = True
+            return
+        _idle.clear()
+        _rebuild['thread'] = threading.Thread(target=_run_rebuilds, args=(app,), name='catalog-rebuild', daemon=True)
+        _rebuild['thread'].start()
+
+
+def _run_rebuilds(app):
+    while True:
+        try:
+            _rebuild_catalog(app)
+        except Exception as e:
+            print(f"Catalog rebuild error: {e}")
+        with _memory_lock:
+            if not _rebuild['again']:
+                _rebuild['thread'] = None
+                _idle.set()
+                return
+            _rebuild['again'] = False
+
+
+def _rebuild_catalog(app):
+    if snapshot.current() is not None:
+        # publish for every worker; the DB is read under the lock so builds cannot land out of order
+        with refresh.file_lock(snapshot.SNAPSHOT_PATH + '.lock', wait=60), app.app_context():
+            snapshot.write(snapshot.encode(snapshot.rows_from_db()))
+        snapshot.current(recheck=True)
+        return
+    version = httpcache.data_version()
+    with app.app_context():
+        catalog = snapshot.Snapshot(snapshot.encode(snapshot.rows_from_db()))
+    with _memory_lock:
+        _memory['snapshot'] = catalog
+        _memory['version'] = version
+
+
+def _check_version():
+    # another worker wrote to the Movie table: rebuild this worker's copy in the background
+    now = time.monotonic()
+    if now - _memory['checked'] < snapshot.SNAPSHOT_CHECK_INTERVAL or _rebuild['thread'] is not None:
+        return
+    _memory['checked'] = now
+    if httpcache.data_version() != _memory['version']:
+        _schedule_rebuild(current_app._get_current_object())
+
+
+def _wait_for_rebuild():
+    """Wait up to CATALOG_REBUILD_WAIT seconds for a pending rebuild; False if there was none or it is still running."""
+    return not _idle.is_set() and _idle.wait(CATALOG_REBUILD_WAIT)
+
+
+def get_catalog():
+    """Return the catalog to score against (requires an app context for the DB fallback)."""
+    snap = snapshot.current()
+    if snap is not None:
+        return snap
+    with _memory_lock:
+        if _memory['snapshot'] is None:
+            _memory['version'] = httpcache.data_version()
+            _memory['checked'] = time.monotonic()
+            _memory['snapshot'] = snapshot.Snapshot(snapshot.encode(snapshot.rows_from_db()))
+            return _memory['snapshot']
+        catalog = _memory['snapshot']
+    _check_version()
+    return catalog
+
+
+def validate_weights(weights):
+    """Check a full weights mapping and return a normalized copy, raising ValueError on bad input."""
+    if not isinstance(weights, dict):
+        raise ValueError('weights must be an object')
+    unknown = set(weights) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise ValueError(f'unknown weight {sorted(unknown)[0]!r}')
+    missing = set(DEFAULT_WEIGHTS) - set(weights)
+    if missing:
+        raise ValueError(f'missing weight {sorted(missing)[0]!r}')
+
+    def number(key, value):
+        # json accepts Infinity and NaN, which int() and the score tables cannot
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value < math.inf:
+            raise ValueError(f'weight {key!r} must be a finite non-negative number')
+        return value
+
+    normalized = {}
+    for key in ('genre', 'director', 'writer', 'actors', 'year'):
+        normalized[key] = number(key, weights[key])
+    for key in ('actors_top_n', 'year_window'):
+        value = number(key, weights[key])
+        if int(value) != value or value < 1:
+            raise ValueError(f'{key!r} must be a positive integer')
+        normalized[key] = int(value)
+    overlap = weights['actor_overlap']
+    if not isinstance(overlap, list) or len(overlap) < 2 or overlap[0] != 0:
+        raise ValueError("'actor_overlap' must be a list starting with 0")
+    normalized['actor_overlap'] = [number('actor_overlap', f) for f in overlap]
+    return normalized
+
+
+class WeightsProfile:
+    """A validated weights mapping compiled into the lookup tables the scorer uses.
+
+    Compiling happens once per profile version, so scoring with any profile
+    does table lookups instead of recomputing fractions per candidate.
+    """
+    __slots__ = ('weights', 'version', 'genre', 'director', 'writer', 'actors', 'year',
+                 'actors_top_n', 'year_window', 'genre_table', 'actor_table')
+
+    def __init__(self, weights):
+        weights = validate_weights(weights)
+        self.weights = weights
+        self.version = hashlib.sha1(json.dumps(weights, sort_keys=True).encode()).hexdigest()[:12]
+        self.genre = weights['genre']
+        self.director = weights['director']
+        self.writer = weights['writer']
+        self.actors = weights['actors']
+        self.year = weights['year']
+        self.actors_top_n = weights['actors_top_n']
+        self.year_window = weights['year_window']
+        # genre_table[n][shared]: score for sharing `shared` of the seeds' `n` genres
+        self.genre_table = tuple(
+            tuple(self.genre * (shared / n) for shared in range(n + 1)) if n else (0.0,)
+            for n in range(_GENRE_TABLE_SIZE + 1)
+        )
+        # actor_table[count]: score for `count` shared top actors (last entry covers "or more")
+        self.actor_table = tuple(
+            self.actors if f == 1 else round(f * self.actors, 2) for f in weights['actor_overlap']
+        )
+
+    def genre_score(self, shared, n):
+        if n <= _GENRE_TABLE_SIZE:
+            return self.genre_table[n][shared]
+        return self.genre * (shared / n)
+
+    def actor_score(self, count):
+        return self.actor_table[min(count, len(self.actor_table) - 1)]
+
+
+def load_profile(path=WEIGHTS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return WeightsProfile(json.load(f))
+
+
+DEFAULT_PROFILE = WeightsProfile(DEFAULT_WEIGHTS)
+
+_active = {'profile': DEFAULT_PROFILE, 'stat': None, 'checked': 0.0}
+_active_lock = threading.Lock()
+_overrides = {}
+
+
+def active_profile(path=WEIGHTS_PATH):
+    """Return the current weights profile, reloading the config file when it changes.
+
+    A file that fails to parse or validate is reported and the previous profile
+    stays active.
+    """
+    now = time.monotonic()
+    if _active['checked'] and now - _active['checked'] < WEIGHTS_CHECK_INTERVAL:
+        return _active['profile']
+    with _active_lock:
+        if _active['checked'] and now - _active['checked'] < WEIGHTS_CHECK_INTERVAL:
+            return _active['profile']
+        try:
+            st = os.stat(path)
+            key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            key = None
+        if key != _active['stat']:
+            if key is None:
+                _active['profile'] = DEFAULT_PROFILE
+            else:
+                try:
+                    _active['profile'] = load_profile(path)
+                except (OSError, ValueError) as e:
+                    print(f"Scoring weights load error ({path}): {e}")
+            _active['stat'] = key
+        _active['checked'] = now
+        return _active['profile']
+
+
+def resolve_weights(overrides=None):
+    """Profile for a request: the active profile, or it with ``overrides`` applied.
+
+    Override profiles are compiled once and memoized per (base version, overrides).
+    Raises ValueError on invalid overrides.
+    """
+    base = active_profile()
+    if overrides is None:
+        return base
+    if not isinstance(overrides, dict):
+        raise ValueError('weights must be an object')
+    if not overrides:
+        return base
+    key = (base.version, json.dumps(overrides, sort_keys=True))
+    profile = _overrides.get(key)
+    if profile is None:
+        unknown = set(overrides) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f'unknown weight {sorted(unknown)[0]!r}')
+        profile = WeightsProfile({**base.weights, **overrides})
+        if len(_overrides) >= 256:
+            _overrides.clear()
+        _overrides[key] = profile
+    return profile
+
+
+def top_actors(catalog, row, n):
+    """First ``n`` named actors of a candidate row."""
+    names = []
+    for a in catalog.actors(row):
+        if a >= 0:
+            names.append(a)
+            if len(names) == n:
+                break
+    return set(names)
+
+
+def seed_profile(catalog, rows, weights=None):
+    """Union the seed rows' features into the sets the scorer compares against."""
+    top_n = (weights or active_profile()).actors_top_n
+    genres = set()
+    actors = set()
+    directors = set()
+    writers = set()
+    years = []
+    for row in rows:
+        genres.update(catalog.genres(row))
+        # seeds take the first N raw entries, blanks included, like the original form handler
+        actors.update(a for a in catalog.actors(row)[:top_n] if a >= 0)
+        if catalog.years[row]:
+            years.append(catalog.years[row])
+        if catalog.directors[row] >= 0:
+            directors.add(catalog.directors[row])
+        writers.update(catalog.writers(row))
+    return {
+        'genres': genres,
+        'actors': actors,
+        'directors': directors,
+        'writers': writers,
+        'mean_year': sum(years) / len(years) if years else None,
+    }
+
+
+FILTER_KEYS = ('genres', 'year_from', 'year_to', 'min_rating')
+_filters = {}
+
+
+def _genre_id(catalog, name):
+    gid = catalog.term_id('genre', name)
+    if gid is None:
+        lowered = name.strip().lower()
+        gid = next((g for g in range(catalog.vocab_size('genre')) if catalog.term('genre', g).lower() == lowered),
+                   None)
+    return gid
+
+
+def filter_bitmap(catalog, filters):
+    """Rows passing ``filters`` as an int bitmap (bit ``row`` set), or None when nothing is filtered.
+
+    filters: genres (any of these names, case-insensitive), year_from / year_to
+    (inclusive), min_rating (vote_average). Built from the snapshot's
+    precomputed bitmaps and memoized per catalog version.
+    """
+    if not filters or all(filters.get(key) in (None, [], '') for key in FILTER_KEYS):
+        return None
+    key = (catalog.version, json.dumps({k: filters.get(k) for k in FILTER_KEYS}, sort_keys=True))
+    bits = _filters.get(key)
+    if bits is not None:
+        return bits
+
+    bits = (1 << len(catalog)) - 1
+    if filters.get('genres'):
+        any_genre = 0
+        for name in filters['genres']:
+            any_genre |= catalog.genre_bitmap(_genre_id(catalog, name))
+        bits &= any_genre
+    if filters.get('year_from') is not None or filters.get('year_to') is not None:
+        bits &= catalog.year_bitmap(filters.get('year_from'), filters.get('year_to'))
+    if filters.get('min_rating') is not None:
+        bits &= catalog.rating_bitmap(filters['min_rating'])
+    if len(_filters) >= 256:
+        _filters.clear()
+    _filters[key] = bits
+    return bits
+
+
+def filter_predicate(filters, catalog=None):
+    """``movie_id -> bool`` for ``filters``, or None when nothing is filtered."""
+    if catalog is None:
+        catalog = get_catalog()
+    bits = filter_bitmap(catalog, filters)
+    if bits is None:
+        return None
+
+    def allows(movie_id):
+        row = catalog.row_of(movie_id)
+        return row is not None and bits >> row & 1 == 1
+    return allows
+
+
+def _allowed_rows(catalog, allowed):
+    """(rows to score directly or None, membership test) for a filter bitmap.
+
+    A filter keeping at most a quarter of the catalog is cheaper to score row by
+    row than to reach through the postings lists; a broader one is applied as a
+    mask over the postings candidates.
+    """
+    if allowed is None:
+        return None, None
+    if allowed.bit_count() <= len(catalog) // 4:
+        rows = set(snapshot.iter_rows(allowed))
+        return rows, rows.__contains__
+    mask = allowed.to_bytes((len(catalog) + 7) // 8, 'little')
+    return None, lambda row: mask[row >> 3] >> (row & 7) & 1
+
+
+def score_rows(catalog, profile, exclude=(), weights=None, cache=None, explain=False, allowed=None):
+    """Score every catalog row that can reach a positive score.
+
+    Returns a list of ``(row, score)`` sorted by score (desc) then row. When the
+    seeds share a single genre, candidates lacking it are appended with a score
+    of 0.0 to keep the ordering the original per-row loop produced.
+
+    ``cache`` is an optional dict shared between calls scoring the same catalog
+    (see ``recommend_many``); it memoizes postings unions and candidate top actors.
+
+    With ``explain`` each entry is ``(row, score, components)`` where components
+    is ``(genre, director, writer, actors, year)``, the terms summed into score.
+
+    ``allowed`` is an optional ``filter_bitmap``; rows outside it are never scored.
+    """
+    w = weights or active_profile()
+    top_n = w.actors_top_n
+    year_window = w.year_window
+    if cache is None:
+        cache = {}
+    exclude = set(exclude)
+    genres = profile['genres']
+    mean_year = profile['mean_year']
+
+    def postings(kind, term):
+        key = (kind, term)
+        rows = cache.get(key)
+        if rows is None:
+            rows = cache[key] = catalog.postings(kind, term)
+        return rows
+
+    def candidate_top_actors(row):
+        key = ('top', top_n, row)
+        names = cache.get(key)
+        if names is None:
+            names = cache[key] = top_actors(catalog, row, top_n)
+        return names
+
+    direct, passes = _allowed_rows(catalog, allowed)
+    if direct is not None:
+        # narrow filter: the same matches, computed from each allowed row's features
+        genre_hits = {}
+        for row in direct:
+            shared = len(genres.intersection(catalog.genres(row)))
+            if shared:
+                genre_hits[row] = shared
+        director_hits = {row for row in direct if catalog.directors[row] in profile['directors']}
+        writer_hits = {row for row in direct if not profile['writers'].isdisjoint(catalog.writers(row))}
+        actor_hits = {row: len(profile['actors'] & candidate_top_actors(row)) for row in direct} \
+            if profile['actors'] else {}
+        candidates = direct - exclude
+    else:
+        genre_hits = defaultdict(int)
+        for g in genres:
+            for row in postings('genre', g):
+                genre_hits[row] += 1
+        director_hits = set()
+        for d in profile['directors']:
+            director_hits.update(postings('director', d))
+        writer_hits = set()
+        for wr in profile['writers']:
+            writer_hits.update(postings('writer', wr))
+        # postings cover every billing position; only the candidate's top N count
+        actor_rows = set()
+        for a in profile['actors']:
+            actor_rows.update(postings('actor', a))
+        actor_hits = {row: len(profile['actors'] & candidate_top_actors(row)) for row in actor_rows}
+
+        candidates = set(genre_hits) | director_hits | writer_hits | set(actor_hits)
+        if mean_year:
+            candidates.update(catalog.rows_in_year_range(math.ceil(mean_year - year_window),
+                                                         math.floor(mean_year + year_window)))
+        candidates -= exclude
+        if passes is not None:
+            candidates = {row for row in candidates if passes(row)}
+
+    n_genres = len(genres)
+    required_genre = n_genres == 1
+    last_actor = len(w.actor_table) - 1
+    scored = []
+    for row in candidates:
+        genre_score = 0.0
+        if genres:
+            shared = genre_hits.get(row, 0)
+            if required_genre and not shared:
+                continue
+            genre_score = w.genre_score(shared, n_genres)
+
+        director_score = w.director if row in director_hits else 0.0
+        writer_score = w.writer if row in writer_hits else 0.0
+
+        # threshold mapping via the profile table, e.g. 0 -> 0, 1 -> 8, 2 -> 15, 3+ -> 20
+        actor_score = w.actor_table[min(actor_hits.get(row, 0), last_actor)]
+
+        year_score = 0.0
+        year = catalog.years[row]
+        if mean_year and year:
+            diff = abs(year - mean_year)
+            if diff <= year_window:
+                year_score = w.year * (1 - (diff / year_window))
+
+        # summed in the same order as the original per-row loop, so totals are bit-identical
+        score = genre_score + director_score + writer_score + actor_score + year_score
+        if score > 0:
+            if explain:
+                scored.append((row, score, (genre_score, director_score, writer_score, actor_score, year_score)))
+            else:
+                scored.append((row, score))
+
+    scored.sort(key=lambda x: (-x[1], x[0]))
+
+    if required_genre:
+        rest = (row for row in (sorted(direct) if direct is not None else range(len(catalog)))
+                if row not in genre_hits and row not in exclude and (passes is None or passes(row)))
+        if explain:
+            scored.extend((row, 0.0, (0.0, 0.0, 0.0, 0.0, 0.0)) for row in rest)
+        else:
+            scored.extend((row, 0.0) for row in rest)
+    return scored
+
+
+def _seed_rows(catalog, movie_ids, pinned):
+    rows = [catalog.row_of(i) for i in movie_ids]
+    if (not pinned and any(r is None and i > catalog.max_id for r, i in zip(rows, movie_ids))
+            and _wait_for_rebuild()):
+        # a seed newer than this catalog that a pending rebuild is adding: score against the new one
+        catalog = get_catalog()
+        rows = [catalog.row_of(i) for i in movie_ids]
+    # ids the catalog does not know (deleted, or never stored) give no rows; they never trigger a rebuild
+    return catalog, [r for r in rows if r is not None]
+
+
+def recommend(movie_ids, catalog=None, weights=None, filters=None):
+    """Score the catalog against the given seed movie ids.
+
+    Returns ``[(movie_id, score), ...]`` sorted best first, seeds excluded.
+    ``filters`` (see ``filter_bitmap``) restricts the candidates before scoring.
+    """
+    pinned = catalog is not None
+    if catalog is None:
+        catalog = get_catalog()
+    weights = weights or active_profile()
+    catalog, rows = _seed_rows(catalog, movie_ids, pinned)
+    profile = seed_profile(catalog, rows, weights)
+    allowed = filter_bitmap(catalog, filters)
+    return [(catalog.ids[row], score)
+            for row, score in score_rows(catalog, profile, rows, weights, allowed=allowed)]
+
+
+def recommend_many(seed_sets, catalog=None, weights=None, filters=None):
+    """Score several seed sets against one catalog in a single batch.
+
+    All seed sets share one catalog reference and one postings/top-actor cache,
+    so a term or candidate that appears in many sets is only resolved once.
+    Identical seed sets (with identical filters) are scored once. Each distinct
+    set is still scored by its own pass over its candidates; there is no
+    array-wide pass across sets. ``filters`` is None or one filters dict per
+    seed set. Returns one result list per seed set.
+    """
+    pinned = catalog is not None
+    if catalog is None:
+        catalog = get_catalog()
+    weights = weights or active_profile()
+    newest = max((i for ids in seed_sets for i in ids), default=0)
+    catalog, _ = _seed_rows(catalog, [newest] if newest else [], pinned)
+
+    cache = {}
+    done = {}
+    results = []
+    for ids, set_filters in zip(seed_sets, filters or [None] * len(seed_sets)):
+        allowed = filter_bitmap(catalog, set_filters)
+        key = (frozenset(ids), allowed)
+        if key not in done:
+            rows = [r for r in (catalog.row_of(i) for i in ids) if r is not None]
+            profile = seed_profile(catalog, rows, weights)
+            done[key] = [(catalog.ids[row], score)
+                         for row, score in score_rows(catalog, profile, rows, weights, cache, allowed=allowed)]
+        results.append(done[key])
+    return results
+
+
+def taste_profile(catalog, rows, item_weights=None, weights=None, max_terms=None):
+    """Aggregate a (long, optionally weighted) history into capped term weights.
+
+    Each term gets the share of the total history weight whose movies carry it;
+    only the ``max_terms`` strongest terms per kind are kept, so scoring cost
+    does not grow with the history length. Returns a dict of ``{term: share}``
+    maps (genres, directors, writers, actors) plus the weighted mean_year.
+    """
+    top_n = (weights or active_profile()).actors_top_n
+    max_terms = max_terms or TASTE_MAX_TERMS
+    if item_weights is None:
+        item_weights = [1.0] * len(rows)
+    sums = {'genres': defaultdict(float), 'directors': defaultdict(float),
+            'writers': defaultdict(float), 'actors': defaultdict(float)}
+    total = 0.0
+    year_sum = year_weight = 0.0
+    for row, iw in zip(rows, item_weights):
+        if iw <= 0:
+            continue
+        total += iw
+        for g in set(catalog.genres(row)):
+            sums['genres'][g] += iw
+        if catalog.directors[row] >= 0:
+            sums['directors'][catalog.directors[row]] += iw
+        for wr in set(catalog.writers(row)):
+            sums['writers'][wr] += iw
+        for a in {a for a in catalog.actors(row)[:top_n] if a >= 0}:
+            sums['actors'][a] += iw
+        if catalog.years[row]:
+            year_sum += catalog.years[row] * iw
+            year_weight += iw
+
+    profile = {'mean_year': year_sum / year_weight if year_weight else None}
+    for kind, terms in sums.items():
+        strongest = sorted(terms.items(), key=lambda t: (-t[1], t[0]))[:max_terms]
+        profile[kind] = {term: value / total for term, value in strongest}
+    return profile
+
+
+def _actor_curve(w, overlap):
+    """actor_table interpolated at a fractional overlap (integer overlaps match actor_score)."""
+    last = len(w.actor_table) - 1
+    if overlap >= last:
+        return w.actor_table[last]
+    lo = int(overlap)
+    return w.actor_table[lo] + (w.actor_table[lo + 1] - w.actor_table[lo]) * (overlap - lo)
+
+
+def score_taste(catalog, profile, exclude=(), weights=None, cache=None, allowed=None):
+    """Score candidate rows against a ``taste_profile``; returns ``[(row, score), ...]`` best first.
+
+    Same components as ``score_rows``, with matches weighted by term share:
+    genres score the matched share of the profile's genre mass, a director or
+    writer scores relative to the profile's strongest one, and shared top
+    actors add up (relative to the strongest actor) on the actor_overlap curve.
+    With a small unweighted history every term has the same share, so the
+    components reduce to the ``score_rows`` rules (bar its single-genre cut).
+    ``allowed`` is an optional ``filter_bitmap``, as for ``score_rows``.
+    """
+    w = weights or active_profile()
+    top_n = w.actors_top_n
+    year_window = w.year_window
+    if cache is None:
+        cache = {}
+    exclude = set(exclude)
+    mean_year = profile['mean_year']
+
+    def postings(kind, term):
+        key = (kind, term)
+        rows = cache.get(key)
+        if rows is None:
+            rows = cache[key] = catalog.postings(kind, term)
+        return rows
+
+    def candidate_top_actors(row):
+        key = ('top', top_n, row)
+        names = cache.get(key)
+        if names is None:
+            names = cache[key] = top_actors(catalog, row, top_n)
+        return names
+
+    def relative(terms):
+        strongest = max(terms.values(), default=0)
+        return {term: share / strongest for term, share in terms.items()} if strongest else {}
+
+    genre_total = sum(profile['genres'].values())
+    directors = relative(profile['directors'])
+    writers = relative(profile['writers'])
+    actors = relative(profile['actors'])
+    direct, passes = _allowed_rows(catalog, allowed)
+    if direct is not None:
+        # narrow filter: the same matches, computed from each allowed row's features
+        genre_mass = {}
+        director_hits = {}
+        writer_hits = {}
+        actor_hits = {}
+        # shares are added in profile order, as the postings path does, so totals are bit-identical
+        for row in direct:
+            row_genres = set(catalog.genres(row))
+            mass = sum(share for g, share in profile['genres'].items() if g in row_genres)
+            if mass:
+                genre_mass[row] = mass
+            if catalog.directors[row] in directors:
+                director_hits[row] = directors[catalog.directors[row]]
+            share = max((writers.get(wr, 0.0) for wr in catalog.writers(row)), default=0.0)
+            if share:
+                writer_hits[row] = share
+            top = candidate_top_actors(row)
+            overlap = sum(share for a, share in actors.items() if a in top)
+            if overlap:
+                actor_hits[row] = overlap
+        candidates = direct - exclude
+    else:
+        genre_mass = defaultdict(float)
+        for g, share in profile['genres'].items():
+            for row in postings('genre', g):
+                genre_mass[row] += share
+        director_hits = {}
+        for d, share in directors.items():
+            for row in postings('director', d):
+                director_hits[row] = share
+        writer_hits = {}
+        for wr, share in writers.items():
+            for row in postings('writer', wr):
+                if share > writer_hits.get(row, 0):
+                    writer_hits[row] = share
+        actor_hits = defaultdict(float)
+        for a, share in actors.items():
+            for row in postings('actor', a):
+                if a in candidate_top_actors(row):
+                    actor_hits[row] += share
+
+        candidates = set(genre_mass) | set(director_hits) | set(writer_hits) | set(actor_hits)
+        if mean_year:
+            candidates.update(catalog.rows_in_year_range(math.ceil(mean_year - year_window),
+                                                         math.floor(mean_year + year_window)))
+        candidates -= exclude
+        if passes is not None:
+            candidates = {row for row in candidates if passes(row)}
+
+    scored = []
+    for row in candidates:
+        score = w.genre * genre_mass[row] / genre_total if row in genre_mass else 0.0
+        score += w.director * director_hits.get(row, 0.0)
+        score += w.writer * writer_hits.get(row, 0.0)
+        if row in actor_hits:
+            score += _actor_curve(w, actor_hits[row])
+        year = catalog.years[row]
+        if mean_year and year:
+            diff = abs(year - mean_year)
+            if diff <= year_window:
+                score += w.year * (1 - (diff / year_window))
+        if score > 0:
+            scored.append((row, score))
+    scored.sort(key=lambda x: (-x[1], x[0]))
+    return scored
+
+
+def recommend_taste(movie_ids, item_weights=None, catalog=None, weights=None, cache=None, filters=None):
+    """Score the catalog against a user's history (hundreds of ids, optionally weighted).
+
+    Returns ``[(movie_id, score), ...]`` sorted best first, history excluded.
+    ``item_weights`` runs parallel to ``movie_ids`` (default 1 each); ``filters``
+    as for ``recommend``.
+    """
+    pinned = catalog is not None
+    if catalog is None:
+        catalog = get_catalog()
+    weights = weights or active_profile()
+    if item_weights is None:
+        item_weights = [1.0] * len(movie_ids)
+    if len(item_weights) != len(movie_ids):
+        raise ValueError('item_weights must match movie_ids')
+    catalog, _ = _seed_rows(catalog, [max(movie_ids, default=0)], pinned)
+    history = [(catalog.row_of(i), iw) for i, iw in zip(movie_ids, item_weights)]
+    history = [(row, iw) for row, iw in history if row is not None]
+    rows = [row for row, _ in history]
+    profile = taste_profile(catalog, rows, [iw for _, iw in history], weights)
+    allowed = filter_bitmap(catalog, filters)
+    return [(catalog.ids[row], score)
+            for row, score in score_taste(catalog, profile, rows, weights, cache, allowed)]
+
+
+COMPONENTS = ('genre', 'director', 'writer', 'actors', 'year')
+
+
+def explain(movie_ids, catalog=None, weights=None, k=None):
+    """Per-component breakdown of ``recommend`` for every candidate (or the top ``k``).
+
+    Uses the same scoring pass as ``recommend``, so rows come back in the same
+    order with the same totals. Each row is a dict with movie_id, rank, score,
+    one entry per COMPONENTS name, and the raw matches behind them
+    (shared_genres, shared_actors, director_match, writer_match, candidate_year).
+    """
+    pinned = catalog is not None
+    if catalog is None:
+        catalog = get_catalog()
+    weights = weights or active_profile()
+    catalog, rows = _seed_rows(catalog, movie_ids, pinned)
+    profile = seed_profile(catalog, rows, weights)
+    scored = score_rows(catalog, profile, rows, weights, explain=True)
+    if k is not None:
+        scored = scored[:k]
+    top_n = weights.actors_top_n
+    result = []
+    for rank, (row, score, components) in enumerate(scored, 1):
+        entry = {'movie_id': catalog.ids[row], 'rank': rank, 'score': score}
+        entry.update(zip(COMPONENTS, components))
+        entry['shared_genres'] = len(profile['genres'].intersection(catalog.genres(row)))
+        entry['shared_actors'] = len(profile['actors'] & top_actors(catalog, row, top_n))
+        entry['director_match'] = catalog.directors[row] in profile['directors']
+        entry['writer_match'] = bool(profile['writers'].intersection(catalog.writers(row)))
+        entry['candidate_year'] = catalog.years[row] or None
+        result.append(entry)
+    return result
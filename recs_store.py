@@ -0,0 +1,198 @@
+"""Recommendation lists shared by every worker, keyed by the session token.
+
+/recommend stores the scored list and /recommendations and
+/recommendations_data read it back, possibly in another worker process or on
+another host. RECS_STORE_URL picks the backend:
+
+    sqlite:///instance/recs_store.db   (default) one file shared by the workers on a host
+    redis://host:6379/0                 shared across hosts; needs the ``redis`` package,
+                                        falls back to the default SQLite file without it
+    memory://                           this process only (single-worker development)
+
+Lists are stored as zlib-compressed id/score arrays (64-bit ids, 16 bytes per
+entry before compression) and expire after RECS_STORE_TTL seconds. Each worker keeps
+the lists it has decoded in a small LRU so paging does not re-read the store.
+"""
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_URL = 'sqlite:///' + os.path.join(ROOT, 'instance', 'recs_store.db')
+RECS_STORE_URL = os.environ.get('RECS_STORE_URL', DEFAULT_URL)
+RECS_STORE_TTL = int(os.environ.get('RECS_STORE_TTL', 24 * 60 * 60))
+# decoded lists kept per worker
+LOCAL_CACHE_MAX = int(os.environ.get('RECS_LOCAL_CACHE_MAX', 256))
+
+_COUNT = struct.Struct('<I')
+
+
+def encode(recommendations):
+    """[(movie_id, score), ...] -> compact bytes."""
+    ids = array('q', (movie_id for movie_id, _ in recommendations))
+    scores = array('d', (score for _, score in recommendations))
+    return zlib.compress(_COUNT.pack(len(ids)) + ids.tobytes() + scores.tobytes(), 1)
+
+
+def decode(data):
+    raw = zlib.decompress(data)
+    (n,) = _COUNT.unpack_from(raw)
+    # lists stored before ids were widened hold 32-bit ids: tell them apart by their length
+    ids = array('q' if n and len(raw) - _COUNT.size == 16 * n else 'i')
+    ids.frombytes(raw[_COUNT.size:_COUNT.size + ids.itemsize * n])
+    scores = array('d')
+    scores.frombytes(raw[_COUNT.size + ids.itemsize * n:])
+    return list(zip(ids, scores))
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._data = {}
+
+    def put(self, token, data, ttl):
+        now = time.time()
+        if len(self._data) > 10000:
+            for stale in [k for k, (_, expires) in self._data.items() if expires < now]:
+                del self._data[stale]
+        self._data[token] = (data, now + ttl)
+
+    def get(self, token):
+        entry = self._data.get(token)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+
+class SQLiteBackend:
+    """One table in a SQLite file (WAL mode), safe for concurrent worker processes."""
+
+    # expired rows are deleted on roughly one put in this many
+    PURGE_EVERY = 200
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._local = threading.local()
+        self._puts = 0
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS recs (token TEXT PRIMARY KEY, data BLOB NOT NULL, '
+                     'expires REAL NOT NULL)')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # connections must not cross a fork
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def put(self, token, data, ttl):
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO recs (token, data, expires) VALUES (?, ?, ?)',
+                         (token, data, now + ttl))
+            self._puts += 1
+            if self._puts % self.PURGE_EVERY == 0:
+                conn.execute('DELETE FROM recs WHERE expires < ?', (now,))
+
+    def get(self, token):
+        row = self._conn().execute('SELECT data FROM recs WHERE token = ? AND expires >= ?',
+                                   (token, time.time())).fetchone()
+        return row[0] if row else None
+
+
+class RedisBackend:
+    def __init__(self, url):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+
+    def put(self, token, data, ttl):
+        self._client.setex(f'recs:{token}', ttl, data)
+
+    def get(self, token):
+        return self._client.get(f'recs:{token}')
+
+
+def backend_for(url):
+    if url.startswith('memory:'):
+        return MemoryBackend()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            return RedisBackend(url)
+        except ImportError:
+            print("RECS_STORE_URL is a Redis URL but the redis package is not installed; "
+                  "using the local SQLite store")
+            url = DEFAULT_URL
+    if url.startswith('sqlite:///'):
+        path = url[len('sqlite:///'):]
+        return SQLiteBackend(path if os.path.isabs(path) else os.path.join(ROOT, path))
+    raise ValueError(f'unsupported RECS_STORE_URL {url!r}')
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_local = OrderedDict()  # token -> decoded list, most recently used last
+_local_lock = threading.Lock()
+
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = backend_for(RECS_STORE_URL)
+    return _backend
+
+
+def _remember(token, recommendations):
+    with _local_lock:
+        _local[token] = recommendations
+        _local.move_to_end(token)
+        while len(_local) > LOCAL_CACHE_MAX:
+            _local.popitem(last=False)
+
+
+def put(token, recommendations):
+    """Store a scored list under ``token``; readable by every worker using the same store."""
+    recommendations = [(int(movie_id), float(score)) for movie_id, score in recommendations]
+    try:
+        _get_backend().put(token, encode(recommendations), RECS_STORE_TTL)
+    except Exception as e:
+        # still served by this worker from its local cache
+        print(f"Recommendation store error: {e}")
+    _remember(token, recommendations)
+
+
+def get(token):
+    """The list stored under ``token``, or None if it is unknown or expired."""
+    if not token:
+        return None
+    recommendations = _local.get(token)
+    if recommendations is not None:
+        return recommendations
+    try:
+        data = _get_backend().get(token)
+    except Exception as e:
+        print(f"Recommendation store error: {e}")
+        return None
+    if data is None:
+        return None
+    recommendations = decode(data)
+    _remember(token, recommendations)
+    return recommendations
+
+
+def size():
+    """Decoded lists held by this worker."""
+    return len(_local)
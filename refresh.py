@@ -0,0 +1,103 @@
+"""Building blocks for refreshing cached data in the background.
+
+``SharedStore`` keeps one JSON file per key so every worker on a host sees
+the last good copy; ``file_lock`` makes a refresh single-flight across those
+workers; ``Scheduler`` runs a callable on a daemon thread every ``interval``
+seconds, give or take ``jitter`` (a fraction), so workers started together
+do not all wake at once.
+"""
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, every worker refreshes
+    fcntl = None
+
+
+class SharedStore:
+    """``key -> (fetched_at, data)`` persisted as JSON files under ``root``."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        # keys are URLs carrying the API key, so they are hashed rather than used as names
+        return os.path.join(self.root, hashlib.sha1(key.encode()).hexdigest() + '.json')
+
+    def load(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                entry = json.load(f)
+            return entry['fetched_at'], entry['data']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, key, fetched_at, data):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'fetched_at': fetched_at, 'data': data}, f)
+        os.replace(tmp, self._path(key))
+
+
+@contextmanager
+def file_lock(path, wait=0):
+    """Hold an exclusive lock on ``path``; yields False if it could not be taken within ``wait`` seconds."""
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    yield False
+                    return
+                time.sleep(0.1)
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class Scheduler:
+    """Call ``fn`` every ``interval`` seconds (+/- ``jitter`` * interval) on a daemon thread."""
+
+    def __init__(self, fn, interval, jitter=0.1, name='scheduler'):
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = None
+
+    def next_delay(self):
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _run(self):
+        while not self._stop.wait(self.next_delay()):
+            try:
+                self.fn()
+            except Exception as e:
+                print(f"{self.name} error: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
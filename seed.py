@@ -1,9 +1,10 @@
-import pandas as pd
 import json
-from app import app
+from database import app_context
 from models import db, Movie
 
 def seed_database():
+    import pandas as pd  # only needed for seeding, and slow to import
+
     print("Reading CSV files...")
     try:
         movies_df = pd.read_csv('tmdb_5000_movies.csv')
@@ -23,7 +24,7 @@ def seed_database():
     # print("DEBUG: Column names are:", movies_df.columns)
 
     print("Processing data and adding to database... This may take a few minutes.")
-    with app.app_context():
+    with app_context():
         # حذف فیلم‌های قبلی برای جلوگیری از تکرار
         Movie.query.delete()
         db.session.commit()
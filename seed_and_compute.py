@@ -1,12 +1,9 @@
 import os
-from flask import Flask
+from database import get_app
 from models import db, Movie
 
 # --- Configuration ---
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///movies.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+app = get_app()
 
 # --- Dummy Movie Data ---
 DUMMY_MOVIES = [
@@ -0,0 +1,169 @@
+"""Shadow-mode comparison of an alternate scoring engine on live traffic.
+
+A SHADOW_SAMPLE_RATE fraction of /recommend and /api/recommend calls is
+re-scored by SHADOW_ENGINE on a background thread after the response has been
+computed; the request only pays for a random draw and a queue put. When the
+queue (SHADOW_QUEUE_MAX) is full, samples are dropped rather than waited on.
+
+For each sample the primary and shadow latencies, overlap@SHADOW_K and
+Kendall's tau over the movies both top-K lists share are recorded as metrics
+(shadow_* on /metrics) and appended to SHADOW_LOG as one JSON line, which
+``python tools/shadow_report.py`` aggregates across workers.
+
+SHADOW_ENGINE is a name from ENGINES or a ``module:function`` path taking
+``(movie_ids, filters=None)`` and returning ``[(movie_id, score), ...]``.
+"""
+import importlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+import metrics
+import recommender
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SHADOW_ENGINE = os.environ.get('SHADOW_ENGINE', '')
+SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', 0))
+SHADOW_K = int(os.environ.get('SHADOW_K', 10))
+SHADOW_QUEUE_MAX = int(os.environ.get('SHADOW_QUEUE_MAX', 100))
+SHADOW_LOG = os.environ.get('SHADOW_LOG', os.path.join(ROOT, 'instance', 'shadow.jsonl'))
+
+ENGINES = {
+    'recommend': lambda movie_ids, filters=None: recommender.recommend(movie_ids, filters=filters),
+    'taste': lambda movie_ids, filters=None: recommender.recommend_taste(movie_ids, filters=filters),
+}
+
+_queue = queue.Queue(maxsize=SHADOW_QUEUE_MAX)
+_worker = None
+_worker_lock = threading.Lock()
+_app = None
+_engine = None
+
+
+def resolve_engine(name):
+    if name in ENGINES:
+        return ENGINES[name]
+    module, _, attr = name.partition(':')
+    if not attr:
+        raise ValueError(f'unknown shadow engine {name!r}')
+    return getattr(importlib.import_module(module), attr)
+
+
+def overlap_at_k(primary, shadow, k):
+    """Share of the primary top-k that the shadow top-k also contains."""
+    top = [movie_id for movie_id, _ in primary[:k]]
+    if not top:
+        return 1.0 if not shadow[:k] else 0.0
+    return len(set(top) & {movie_id for movie_id, _ in shadow[:k]}) / len(top)
+
+
+def kendall_tau(primary, shadow, k):
+    """Kendall's tau of the movies in both top-k lists (None when fewer than two are shared)."""
+    rank = {movie_id: n for n, (movie_id, _) in enumerate(shadow[:k])}
+    shared = [rank[movie_id] for movie_id, _ in primary[:k] if movie_id in rank]
+    n = len(shared)
+    if n < 2:
+        return None
+    concordant = discordant = 0
+    for i in range(n):
+        for j in range(i + 1, n):
+            if shared[i] < shared[j]:
+                concordant += 1
+            else:
+                discordant += 1
+    return (concordant - discordant) / (n * (n - 1) / 2)
+
+
+def _compare(movie_ids, filters, primary, primary_seconds):
+    started = time.perf_counter()
+    try:
+        with _app.app_context():
+            result = _engine(movie_ids, filters=filters)
+    except Exception as e:
+        metrics.SHADOW_COMPARISONS.inc(engine=SHADOW_ENGINE, result='error')
+        print(f"Shadow engine {SHADOW_ENGINE} error: {e}")
+        return None
+    shadow_seconds = time.perf_counter() - started
+
+    overlap = overlap_at_k(primary, result, SHADOW_K)
+    tau = kendall_tau(primary, result, SHADOW_K)
+    metrics.SHADOW_COMPARISONS.inc(engine=SHADOW_ENGINE, result='ok')
+    metrics.SHADOW_LATENCY.observe(primary_seconds, engine='primary')
+    metrics.SHADOW_LATENCY.observe(shadow_seconds, engine=SHADOW_ENGINE)
+    metrics.SHADOW_OVERLAP.observe(overlap, engine=SHADOW_ENGINE)
+    if tau is not None:
+        metrics.SHADOW_RANK_CORRELATION.observe(tau, engine=SHADOW_ENGINE)
+    return {
+        't': int(time.time()),
+        'engine': SHADOW_ENGINE,
+        'seeds': list(movie_ids),
+        'filters': filters,
+        'k': SHADOW_K,
+        'primary_ms': round(primary_seconds * 1000, 3),
+        'shadow_ms': round(shadow_seconds * 1000, 3),
+        'overlap': overlap,
+        'tau': tau,
+        'primary_top': [movie_id for movie_id, _ in primary[:SHADOW_K]],
+        'shadow_top': [movie_id for movie_id, _ in result[:SHADOW_K]],
+    }
+
+
+def _write(record):
+    if not SHADOW_LOG:
+        return
+    try:
+        os.makedirs(os.path.dirname(SHADOW_LOG) or '.', exist_ok=True)
+        with open(SHADOW_LOG, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+    except OSError as e:
+        print(f"Shadow log error: {e}")
+
+
+def _run():
+    while True:
+        item = _queue.get()
+        try:
+            record = _compare(*item)
+            if record:
+                _write(record)
+        finally:
+            _queue.task_done()
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        with _worker_lock:
+            if _worker is None or not _worker.is_alive():
+                _worker = threading.Thread(target=_run, name='shadow-compare', daemon=True)
+                _worker.start()
+
+
+def submit(movie_ids, primary, primary_seconds, filters=None):
+    """Maybe queue a comparison of ``primary`` (the served list) against the shadow engine."""
+    if _engine is None or random.random() >= SHADOW_SAMPLE_RATE:
+        return False
+    try:
+        # only the top K is compared, so the rest of the list is not kept alive
+        _queue.put_nowait((list(movie_ids), filters, primary[:SHADOW_K], primary_seconds))
+    except queue.Full:
+        metrics.SHADOW_COMPARISONS.inc(engine=SHADOW_ENGINE, result='dropped')
+        return False
+    _ensure_worker()
+    return True
+
+
+def init_app(app):
+    """Enable shadowing for ``app`` when SHADOW_ENGINE and SHADOW_SAMPLE_RATE are set."""
+    global _app, _engine
+    if not SHADOW_ENGINE or SHADOW_SAMPLE_RATE <= 0:
+        return
+    try:
+        _engine = resolve_engine(SHADOW_ENGINE)
+    except (ImportError, AttributeError, ValueError) as e:
+        print(f"Shadow engine {SHADOW_ENGINE!r} not available: {e}")
+        return
+    _app = app
@@ -0,0 +1,455 @@
+"""Versioned, memory-mapped catalog feature snapshot.
+
+The snapshot is a single binary file holding everything the recommender needs
+to score the catalog: movie id/year/vote arrays, interned genre and person
+vocabularies, per-movie feature lists, inverted postings lists and filter
+bitmaps (per genre, per year bucket, per rating bucket). Workers
+``mmap`` it read-only, so all processes on a host share the same pages through
+the OS page cache and opening it costs the same regardless of catalog size.
+
+Build a new snapshot with ``python snapshot.py``. The file is written to a
+temporary path and atomically renamed over the old one; running workers notice
+the new inode on their next ``current()`` call and swap to it without a restart.
+"""
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_PATH = os.environ.get('CATALOG_SNAPSHOT', os.path.join(ROOT, 'instance', 'catalog.snap'))
+# how often (seconds) a worker re-stats the snapshot file to pick up a new build
+SNAPSHOT_CHECK_INTERVAL = float(os.environ.get('CATALOG_SNAPSHOT_CHECK_INTERVAL', 5))
+
+MAGIC = b'MRCSNAP\x00'
+FORMAT_VERSION = 2
+# version 1 files lack the filter bitmaps; they are built in memory on first use
+READABLE_FORMATS = (1, 2)
+# magic, format version, section count, byte order flag, catalog version, built_at (unix seconds)
+HEADER = struct.Struct('<8sHHI16sd')
+# name, array typecode, offset, item count
+SECTION = struct.Struct('<24sc7xQQ')
+_BYTE_ORDER = 1 if sys.byteorder == 'little' else 2
+
+# person/genre lists are stored CSR style: <kind>_ptr has n+1 offsets into <kind>_idx
+FEATURE_KINDS = ('genre', 'actor', 'writer')
+POSTING_KINDS = ('genre', 'actor', 'writer', 'director')
+VOCABS = ('genre', 'person')
+# filter bitmaps: one per decade of release years, one per half point of vote_average
+YEAR_BUCKET = 10
+RATING_BUCKETS = 21
+
+
+def _split(value, keep_empty=False):
+    if not value:
+        return []
+    parts = [p.strip() for p in value.split(',')]
+    return parts if keep_empty else [p for p in parts if p]
+
+
+def rows_from_db():
+    """Narrow projection of the Movie columns the snapshot needs (requires an app context)."""
+    from models import db, Movie
+    return db.session.query(
+        Movie.id, Movie.genre, Movie.director, Movie.writer, Movie.actors,
+        Movie.year, Movie.vote_average, Movie.vote_count
+    ).order_by(Movie.id).all()
+
+
+def _bitmap(n_rows, rows):
+    bits = bytearray((n_rows + 7) // 8)
+    for row in rows:
+        bits[row >> 3] |= 1 << (row & 7)
+    return bits
+
+
+def rating_bucket(vote_average):
+    return min(max(int(vote_average * 2), 0), RATING_BUCKETS - 1)
+
+
+def bitmap_sections(n_rows, genre_postings, years, vote_average):
+    """Filter bitmap sections: little-endian row bitmaps of (n_rows + 7) // 8 bytes, concatenated.
+
+    ``genre_postings`` is the list of row lists per genre id. Year bucket i
+    covers ``year_buckets[i] .. year_buckets[i] + YEAR_BUCKET - 1``; rating
+    bucket k covers vote averages in ``[k / 2, (k + 1) / 2)`` (the last one 10).
+    """
+    genre_bitmaps = bytearray()
+    for rows in genre_postings:
+        genre_bitmaps.extend(_bitmap(n_rows, rows))
+
+    by_decade = {}
+    for row in range(n_rows):
+        if years[row]:
+            by_decade.setdefault(years[row] // YEAR_BUCKET * YEAR_BUCKET, []).append(row)
+    year_buckets = array('i', sorted(by_decade))
+    year_bitmaps = bytearray()
+    for start in year_buckets:
+        year_bitmaps.extend(_bitmap(n_rows, by_decade[start]))
+
+    by_rating = [[] for _ in range(RATING_BUCKETS)]
+    for row in range(n_rows):
+        by_rating[rating_bucket(vote_average[row])].append(row)
+    rating_bitmaps = bytearray()
+    for rows in by_rating:
+        rating_bitmaps.extend(_bitmap(n_rows, rows))
+    return {'genre_bitmaps': genre_bitmaps, 'year_buckets': year_buckets, 'year_bitmaps': year_bitmaps,
+            'rating_bitmaps': rating_bitmaps}
+
+
+def encode(rows, built_at=None):
+    """Encode catalog rows into the snapshot binary format and return the bytes."""
+    rows = sorted(rows, key=lambda r: r[0])
+    vocab = {name: {} for name in VOCABS}
+
+    def intern(name, term):
+        table = vocab[name]
+        tid = table.get(term)
+        if tid is None:
+            tid = table[term] = len(table)
+        return tid
+
+    # ids are 64-bit like the API's; readers take each section's typecode from the table, so older files still load
+    ids, years, vote_avg, vote_cnt, directors = array('q'), array('i'), array('f'), array('i'), array('i')
+    lists = {kind: ([0], []) for kind in FEATURE_KINDS}
+
+    for movie_id, genre, director, writer, actors, year, vote_average, vote_count in rows:
+        ids.append(movie_id)
+        try:
+            years.append(int(year) if year else 0)
+        except (TypeError, ValueError):
+            years.append(0)
+        vote_avg.append(float(vote_average or 0.0))
+        vote_cnt.append(int(vote_count or 0))
+        directors.append(intern('person', director.strip()) if director else -1)
+
+        genre_ids = []
+        for g in _split(genre):
+            gid = intern('genre', g)
+            if gid not in genre_ids:
+                genre_ids.append(gid)
+        # actors keep their original positions (-1 for blank entries) because the
+        # seed side of the scorer takes the first N raw entries, not the first N names
+        actor_ids = [intern('person', a) if a else -1 for a in _split(actors, keep_empty=True)]
+        writer_ids = [intern('person', w) for w in _split(writer)]
+
+        for kind, values in (('genre', genre_ids), ('actor', actor_ids), ('writer', writer_ids)):
+            ptr, idx = lists[kind]
+            idx.extend(values)
+            ptr.append(len(idx))
+
+    sections = {
+        'ids': ids, 'years': years, 'vote_average': vote_avg, 'vote_count': vote_cnt,
+        'director': directors,
+    }
+    for kind, (ptr, idx) in lists.items():
+        sections[f'{kind}_ptr'] = array('i', ptr)
+        sections[f'{kind}_idx'] = array('i', idx)
+
+    # inverted postings: term id -> sorted row numbers
+    n_terms = {'genre': len(vocab['genre']), 'actor': len(vocab['person']),
+               'writer': len(vocab['person']), 'director': len(vocab['person'])}
+    for kind in POSTING_KINDS:
+        buckets = [[] for _ in range(n_terms[kind])]
+        if kind == 'director':
+            for row, tid in enumerate(directors):
+                if tid >= 0:
+                    buckets[tid].append(row)
+        else:
+            ptr, idx = lists[kind]
+            for row in range(len(ids)):
+                seen = set()
+                for tid in idx[ptr[row]:ptr[row + 1]]:
+                    if tid >= 0 and tid not in seen:
+                        seen.add(tid)
+                        buckets[tid].append(row)
+        post_ptr, post_idx = array('i', [0]), array('i')
+        for bucket in buckets:
+            post_idx.extend(bucket)
+            post_ptr.append(len(post_idx))
+        sections[f'{kind}_post_ptr'] = post_ptr
+        sections[f'{kind}_post_idx'] = post_idx
+
+    genre_ptr, genre_idx = sections['genre_post_ptr'], sections['genre_post_idx']
+    sections.update(bitmap_sections(len(ids), [genre_idx[genre_ptr[g]:genre_ptr[g + 1]]
+                                               for g in range(len(genre_ptr) - 1)], years, vote_avg))
+
+    # rows with a known year, ordered by year, for range lookups
+    year_order = array('i', sorted((r for r in range(len(ids)) if years[r]), key=lambda r: years[r]))
+    sections['year_order'] = year_order
+    sections['year_sorted'] = array('i', (years[r] for r in year_order))
+
+    for name in VOCABS:
+        terms = sorted(vocab[name], key=vocab[name].get)
+        blob, ptr = bytearray(), array('i', [0])
+        for term in terms:
+            blob.extend(term.encode('utf-8'))
+            ptr.append(len(blob))
+        sections[f'{name}_vocab'] = blob
+        sections[f'{name}_vocab_ptr'] = ptr
+
+    payloads = []
+    for name, data in sections.items():
+        if isinstance(data, array):
+            payloads.append((name, data.typecode, len(data), data.tobytes()))
+        else:
+            payloads.append((name, 'B', len(data), bytes(data)))
+
+    digest = hashlib.sha1()
+    for name, typecode, count, raw in payloads:
+        digest.update(name.encode())
+        digest.update(raw)
+    catalog_version = digest.hexdigest()[:16].encode()
+
+    offset = HEADER.size + SECTION.size * len(payloads)
+    table, body = [], bytearray()
+    for name, typecode, count, raw in payloads:
+        pad = (-(offset + len(body))) % 8
+        body.extend(b'\x00' * pad)
+        table.append(SECTION.pack(name.encode(), typecode.encode(), offset + len(body), count))
+        body.extend(raw)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(payloads), _BYTE_ORDER, catalog_version,
+                         built_at if built_at is not None else time.time())
+    return header + b''.join(table) + bytes(body)
+
+
+class Snapshot:
+    """Read-only view over an encoded snapshot held in ``bytes`` or an ``mmap``.
+
+    Every array is a ``memoryview`` into the underlying buffer, so nothing is
+    copied when the snapshot is opened. String -> id lookups and the integer
+    filter bitmaps are built lazily on first use.
+    """
+
+    def __init__(self, buf, path=None):
+        self._buf = buf
+        self.path = path
+        view = memoryview(buf)
+        magic, fmt, n_sections, byte_order, version, built_at = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError('not a catalog snapshot')
+        if fmt not in READABLE_FORMATS:
+            raise ValueError(f'unsupported snapshot format {fmt} (expected {FORMAT_VERSION})')
+        if byte_order != _BYTE_ORDER:
+            raise ValueError('snapshot was built on a machine with a different byte order')
+        self.version = version.decode()
+        self.built_at = built_at
+
+        self._sections = {}
+        for i in range(n_sections):
+            name, typecode, offset, count = SECTION.unpack_from(view, HEADER.size + i * SECTION.size)
+            typecode = typecode.decode()
+            size = count * array(typecode).itemsize
+            section = view[offset:offset + size]
+            self._sections[name.rstrip(b'\x00').decode()] = section if typecode == 'B' else section.cast(typecode)
+
+        s = self._sections
+        self.ids = s['ids']
+        self.years = s['years']
+        self.vote_average = s['vote_average']
+        self.vote_count = s['vote_count']
+        self.directors = s['director']
+        self.year_order = s['year_order']
+        self.year_sorted = s['year_sorted']
+        self._term_ids = {}
+        self._bitmaps = {}
+        self._bitmap_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def max_id(self):
+        return self.ids[-1] if len(self.ids) else 0
+
+    def row_of(self, movie_id):
+        """Row number for a movie id, or None. Ids are stored sorted, so this is a bisect."""
+        row = bisect.bisect_left(self.ids, movie_id)
+        if row < len(self.ids) and self.ids[row] == movie_id:
+            return row
+        return None
+
+    def _slice(self, kind, row):
+        ptr = self._sections[f'{kind}_ptr']
+        return self._sections[f'{kind}_idx'][ptr[row]:ptr[row + 1]]
+
+    def genres(self, row):
+        return self._slice('genre', row)
+
+    def actors(self, row):
+        """Actor ids in billing order; -1 marks a blank entry in the source row."""
+        return self._slice('actor', row)
+
+    def writers(self, row):
+        return self._slice('writer', row)
+
+    def postings(self, kind, term_id):
+        """Sorted row numbers whose ``kind`` (genre/actor/writer/director) contains ``term_id``."""
+        ptr = self._sections[f'{kind}_post_ptr']
+        if term_id < 0 or term_id + 1 >= len(ptr):
+            return ()
+        return self._sections[f'{kind}_post_idx'][ptr[term_id]:ptr[term_id + 1]]
+
+    def rows_in_year_range(self, lo, hi):
+        """Rows whose year lies in ``[lo, hi]`` (inclusive, unknown years excluded)."""
+        start = bisect.bisect_left(self.year_sorted, lo)
+        end = bisect.bisect_right(self.year_sorted, hi)
+        return self.year_order[start:end]
+
+    def _bitmap_section(self, name):
+        if 'genre_bitmaps' not in self._sections:
+            with self._bitmap_lock:
+                if 'genre_bitmaps' not in self._sections:
+                    # format 1 file: build the bitmaps once for this process
+                    n_genres = self.vocab_size('genre')
+                    self._sections.update(bitmap_sections(
+                        len(self), [self.postings('genre', g) for g in range(n_genres)],
+                        self.years, self.vote_average))
+        return self._sections[name]
+
+    def _bitmap_int(self, name, i):
+        key = (name, i)
+        bits = self._bitmaps.get(key)
+        if bits is None:
+            size = (len(self) + 7) // 8
+            bits = self._bitmaps[key] = int.from_bytes(self._bitmap_section(name)[i * size:(i + 1) * size],
+                                                       'little')
+        return bits
+
+    def genre_bitmap(self, genre_id):
+        """Rows having the genre, as an int with bit ``row`` set."""
+        if genre_id is None or not 0 <= genre_id < self.vocab_size('genre'):
+            return 0
+        return self._bitmap_int('genre_bitmaps', genre_id)
+
+    def year_bitmap(self, lo=None, hi=None):
+        """Rows whose year lies in ``[lo, hi]`` (either end open when None; unknown years excluded)."""
+        buckets = self._bitmap_section('year_buckets')
+        bits = 0
+        for i, start in enumerate(buckets):
+            end = start + YEAR_BUCKET - 1
+            if (hi is not None and start > hi) or (lo is not None and end < lo):
+                continue
+            if (lo is None or start >= lo) and (hi is None or end <= hi):
+                bits |= self._bitmap_int('year_bitmaps', i)
+            else:
+                # edge decade: only the years inside the range
+                rows = self.rows_in_year_range(max(start, lo or start), min(end, hi or end))
+                bits |= int.from_bytes(_bitmap(len(self), rows), 'little')
+        return bits
+
+    def rating_bitmap(self, min_rating):
+        """Rows with vote_average >= ``min_rating``."""
+        first = rating_bucket(min_rating)
+        bits = 0
+        for k in range(first + 1, RATING_BUCKETS):
+            bits |= self._bitmap_int('rating_bitmaps', k)
+        edge = self._bitmap_int('rating_bitmaps', first)
+        if first / 2 < min_rating:
+            # partial bucket: check the rows in it one by one, at the float32
+            # precision vote_average is stored in, so a 9.2 row passes min_rating 9.2
+            threshold = array('f', [min_rating])[0]
+            rows = [row for row in iter_rows(edge) if self.vote_average[row] >= threshold]
+            edge = int.from_bytes(_bitmap(len(self), rows), 'little')
+        return bits | edge
+
+    def vocab_size(self, vocab):
+        return len(self._sections[f'{vocab}_vocab_ptr']) - 1
+
+    def term(self, vocab, term_id):
+        ptr = self._sections[f'{vocab}_vocab_ptr']
+        return bytes(self._sections[f'{vocab}_vocab'][ptr[term_id]:ptr[term_id + 1]]).decode('utf-8')
+
+    def term_id(self, vocab, term):
+        table = self._term_ids.get(vocab)
+        if table is None:
+            table = self._term_ids[vocab] = {self.term(vocab, i): i for i in range(self.vocab_size(vocab))}
+        return table.get(term)
+
+
+def iter_rows(bits):
+    """Row numbers set in an int bitmap, ascending."""
+    digits = bin(bits)[:1:-1]
+    row = digits.find('1')
+    while row >= 0:
+        yield row
+        row = digits.find('1', row + 1)
+
+
+def load(path=SNAPSHOT_PATH):
+    """Open and mmap a snapshot file."""
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return Snapshot(mm, path=path)
+
+
+def write(data, path=SNAPSHOT_PATH):
+    """Atomically publish encoded snapshot bytes at ``path``."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+_current = {'snapshot': None, 'stat': None, 'checked': 0.0}
+_current_lock = threading.Lock()
+
+
+def current(path=SNAPSHOT_PATH, recheck=False):
+    """Return the live snapshot for ``path`` (or None if there is no file).
+
+    The file is re-stat'ed at most every SNAPSHOT_CHECK_INTERVAL seconds (or now,
+    with ``recheck``). When a new build has been renamed into place, the new file
+    is mapped and swapped in; readers still holding the old Snapshot keep using
+    its pages until they drop it.
+    """
+    now = time.monotonic()
+    if not recheck and _current['checked'] and now - _current['checked'] < SNAPSHOT_CHECK_INTERVAL:
+        return _current['snapshot']
+    with _current_lock:
+        if not recheck and _current['checked'] and now - _current['checked'] < SNAPSHOT_CHECK_INTERVAL:
+            return _current['snapshot']
+        try:
+            st = os.stat(path)
+            key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            key = None
+        if key != _current['stat']:
+            snap = None
+            if key is not None:
+                try:
+                    snap = load(path)
+                except (OSError, ValueError) as e:
+                    print(f"Catalog snapshot load error: {e}")
+                    snap = _current['snapshot']
+            _current['snapshot'] = snap
+            _current['stat'] = key
+        _current['checked'] = now
+        return _current['snapshot']
+
+
+def build(path=SNAPSHOT_PATH):
+    """Build a snapshot from the database and publish it at ``path``."""
+    data = encode(rows_from_db())
+    write(data, path)
+    return Snapshot(data, path=path)
+
+
+if __name__ == '__main__':
+    from database import app_context
+
+    out = sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_PATH
+    with app_context():
+        started = time.perf_counter()
+        snap = build(out)
+    print(f"Wrote snapshot {snap.version} with {len(snap)} movies to {out} "
+          f"in {time.perf_counter() - started:.2f}s")
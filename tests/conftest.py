@@ -0,0 +1,66 @@
+"""Fixtures: the app over a small synthetic catalog in a scratch directory.
+
+Paths and intervals are read from the environment at import time, so they
+are pointed at the scratch directory before any app module is imported.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+SCRATCH = tempfile.mkdtemp(prefix='movies-tests-')
+CATALOG_SIZE = 400
+
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(SCRATCH, 'movies.db')}",
+    'RECS_STORE_URL': f"sqlite:///{os.path.join(SCRATCH, 'recs_store.db')}",
+    # no snapshot file: the catalog is built from the database
+    'CATALOG_SNAPSHOT': os.path.join(SCRATCH, 'catalog.snap'),
+    'DATA_VERSION_FILE': os.path.join(SCRATCH, 'data_version'),
+    'SELECTIONS_LOG': os.path.join(SCRATCH, 'selections.log'),
+    'COOCCUR_DB': os.path.join(SCRATCH, 'cooccur.db'),
+    'SHADOW_LOG': os.path.join(SCRATCH, 'shadow.jsonl'),
+    'TMDB_SHARED_DIR': os.path.join(SCRATCH, 'tmdb_shared'),
+    'IMAGE_CACHE_DIR': os.path.join(SCRATCH, 'img_cache'),
+    'PROFILE_DIR': os.path.join(SCRATCH, 'profiles'),
+    'SECRET_KEY': 'tests',
+    'TMDB_API_KEY': '',
+    'TMDB_REFRESH_INTERVAL': '0',
+    'COOCCUR_UPDATE_INTERVAL': '0',
+    'BROWSE_SOURCE': 'local',
+})
+
+from tools.benchmark import synthetic_movies  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    from database import app_context
+    from models import db, Movie
+
+    with app_context():
+        db.create_all()
+        db.session.add_all(Movie(**row) for row in synthetic_movies(CATALOG_SIZE))
+        db.session.commit()
+    app = create_app({'TESTING': True})
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def movies(app):
+    """Every Movie row, in id order."""
+    from models import Movie
+
+    return Movie.query.order_by(Movie.id).all()
@@ -0,0 +1,195 @@
+import json
+
+import pytest
+
+import app as web
+import browse
+import httpcache
+from models import db, Movie
+
+
+def _walk(client, **params):
+    """Follow /movies_api cursors to the end; returns the db ids in the order served."""
+    seen = []
+    query = dict(params, per_page=25)
+    while True:
+        data = client.get('/movies_api', query_string=query).get_json()
+        seen.extend(movie['db_id'] for movie in data['results'])
+        if not data['has_next']:
+            return seen
+        query['cursor'] = data['next_cursor']
+
+
+@pytest.mark.parametrize('order', ['desc', 'asc'])
+def test_movies_api_keyset_pages(client, movies, order):
+    browsable = [m for m in movies if m.vote_average is not None and m.vote_count >= browse.MIN_VOTE_COUNT]
+    expected = [m.id for m in sorted(browsable, key=lambda m: (m.vote_average, m.id), reverse=order == 'desc')]
+    assert _walk(client, sort_by='rating', order=order) == expected
+
+
+def test_movies_api_min_rating(client, movies):
+    served = _walk(client, sort_by='year', min_rating=7)
+    by_id = {m.id: m for m in movies}
+    assert served and all(by_id[i].vote_average >= 7 for i in served)
+    assert len(served) == len(set(served))
+
+
+def test_movies_api_bad_cursor(client):
+    assert client.get('/movies_api?cursor=not-a-cursor').status_code == 400
+
+
+def test_movies_api_cursor_is_bound_to_its_sort(client):
+    cursor = client.get('/movies_api?per_page=5&sort_by=rating&order=desc').get_json()['next_cursor']
+    assert client.get('/movies_api', query_string={'per_page': 5, 'cursor': cursor}).status_code == 200
+    for sort_by, order in (('rating', 'asc'), ('year', 'desc')):
+        response = client.get('/movies_api', query_string={'per_page': 5, 'sort_by': sort_by, 'order': order,
+                                                           'cursor': cursor})
+        assert response.status_code == 400
+        assert 'another sort' in response.get_json()['error']
+
+
+def test_movies_api_page_without_cursor(client):
+    served = _walk(client, sort_by='year')
+    page = client.get('/movies_api?per_page=25&sort_by=year&page=3').get_json()
+    assert [movie['db_id'] for movie in page['results']] == served[50:75]
+
+
+@pytest.fixture
+def discover(monkeypatch):
+    """Fake TMDb discover: two pages of movies not in the catalog, rated 5.0 and 4.0."""
+    calls = []
+
+    def get_top(page=1, per_page=20, sort_by='rating', order='desc', min_rating=0.0, bound=None):
+        calls.append({'page': page, 'sort_by': sort_by, 'order': order, 'bound': bound})
+        return {'results': [{'tmdb_id': 9100000 + page * 100 + i, 'title': f'TMDb {page}.{i}',
+                             'vote_average': 6.0 - page} for i in range(per_page)],
+                'total_pages': 2, 'page': page}
+
+    monkeypatch.setattr(web, 'TMDB_API_KEY', 'test')
+    monkeypatch.setattr(web, 'get_top_tmdb_movies', get_top)
+    monkeypatch.setattr(web, 'prefetch_discover_pages', lambda *args, **kwargs: None)
+    return calls
+
+
+def test_movies_api_continues_with_tmdb_past_the_last_local_row(client, movies, discover):
+    query = {'per_page': 25, 'sort_by': 'rating', 'min_rating': 5}
+    while True:
+        data = client.get('/movies_api', query_string=query).get_json()
+        if not discover:
+            query['cursor'] = data['next_cursor']
+            continue
+        break
+    by_id = {m.id: m for m in movies}
+    local = [r for r in data['results'] if r.get('db_id')]
+    assert discover == [{'page': 1, 'sort_by': 'rating', 'order': 'desc', 'bound': by_id[local[-1]['db_id']].vote_average}]
+    assert data['has_next'] and data['next_cursor']
+
+    query['cursor'] = data['next_cursor']
+    data = client.get('/movies_api', query_string=query).get_json()
+    assert discover[-1] == dict(discover[0], page=2)
+    assert data['results'] and not data['has_next']
+    assert client.get('/movies_api', query_string=dict(query, order='asc')).status_code == 400
+
+
+def test_movies_api_title_browse_stops_at_the_local_rows(client, discover):
+    served = _walk(client, sort_by='title')
+    assert served and discover == []
+
+
+def test_tmdb_discover_url_bound():
+    assert 'vote_average.lte=6.5' in web.tmdb_discover_url(bound=6.5)
+    assert 'vote_average.gte=7.0' in web.tmdb_discover_url(order='asc', min_rating=7, bound=6.5)
+    assert 'primary_release_date.lte=1999-12-31' in web.tmdb_discover_url(sort_by='year', bound=1999)
+    assert 'primary_release_date.gte=1999-01-01' in web.tmdb_discover_url(sort_by='year', order='asc', bound=1999)
+    assert 'lte' not in web.tmdb_discover_url()
+
+
+def test_etag_revalidation(client):
+    first = client.get('/movies_api?per_page=5')
+    etag = first.headers['ETag']
+    again = client.get('/movies_api?per_page=5', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert client.get('/movies_api?per_page=6', headers={'If-None-Match': etag}).status_code == 200
+
+    # a write to the Movie table (and the bump after it) invalidates the remembered validators
+    movie = db.session.get(Movie, first.get_json()['results'][0]['db_id'])
+    title = movie.title
+    movie.title = title + ' (renamed)'
+    db.session.commit()
+    httpcache.bump()
+    try:
+        changed = client.get('/movies_api?per_page=5', headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.get_json()['results'][0]['title'] == movie.title
+    finally:
+        movie.title = title
+        db.session.commit()
+        httpcache.bump()
+
+
+def test_api_recommend(client):
+    data = client.post('/api/recommend', json={'ids': [1, 2], 'k': 5}).get_json()
+    assert data['mode'] == 'seeds'
+    assert len(data['results']) == 5
+    assert {r['id'] for r in data['results']}.isdisjoint({1, 2})
+    assert client.get('/api/recommend?ids=1,2&k=5').get_json()['results'] == data['results']
+
+
+@pytest.mark.parametrize('body', [
+    {'ids': [1], 'k': 0},
+    {'ids': [1], 'k': 101},
+    {'ids': [1], 'offset': -1},
+    {'ids': [1], 'offset': 10 ** 30},
+    {'ids': []},
+    {'ids': list(range(1, 22)), 'mode': 'seeds'},
+    {'ids': list(range(1, 1002))},
+    {'ids': [2 ** 63]},
+    {'ids': [[1, -1]]},
+    {'ids': ['x']},
+    {'ids': [1], 'mode': 'other'},
+    {'ids': [1], 'weights': {'genre': -1}},
+    {'ids': [1], 'weights': {'unknown': 1}},
+])
+def test_api_recommend_rejects(client, body):
+    # json.dumps: the app's JSON provider refuses to encode integers beyond 64 bits
+    response = client.post('/api/recommend', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('raw', [
+    '{"ids": [1], "weights": {"genre": Infinity}}',
+    '{"ids": [[1, 1e999]]}',
+    '{"ids": [1], "k": 1e999}',
+])
+def test_api_recommend_rejects_non_finite(client, raw):
+    response = client.post('/api/recommend', data=raw, content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_api_recommend_max_k_and_history(client):
+    data = client.post('/api/recommend', json={'ids': [1], 'k': 100}).get_json()
+    assert len(data['results']) == 100
+    ids = [m.id for m in Movie.query.order_by(Movie.id).limit(1000)]
+    data = client.post('/api/recommend', json={'ids': ids, 'k': 10}).get_json()
+    assert data['mode'] == 'taste'
+
+
+@pytest.mark.parametrize('url', ['/api/recommend', '/api/recommend/batch'])
+def test_api_recommend_rejects_non_object_body(client, url):
+    response = client.post(url, json=[1, 2])
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'body must be a JSON object'
+
+
+def test_api_recommend_batch_offset_limit(client):
+    for body in ({'requests': [{'ids': [1]}], 'offset': 10 ** 30}, {'requests': [{'ids': [1], 'offset': 10 ** 30}]}):
+        response = client.post('/api/recommend/batch', data=json.dumps(body), content_type='application/json')
+        assert response.status_code == 400
+
+
+def test_api_recommend_batch_limit(client):
+    response = client.post('/api/recommend/batch', data=json.dumps({'requests': [{'ids': [1]}] * 501}),
+                           content_type='application/json')
+    assert response.status_code == 400
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import cooccur
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    monkeypatch.setattr(cooccur, 'SELECTIONS_LOG', str(tmp_path / 'selections.log'))
+    monkeypatch.setattr(cooccur, 'COOCCUR_DB', str(tmp_path / 'cooccur.db'))
+    return tmp_path / 'selections.log'
+
+
+def _write(log, *selections):
+    with open(log, 'a') as f:
+        for ids in selections:
+            f.write(json.dumps({'t': 0, 'ids': ids}) + '\n')
+
+
+def _state():
+    return dict(cooccur._conn().execute('SELECT key, value FROM state').fetchall())
+
+
+def test_log_selection_drops_out_of_range_ids(log):
+    cooccur.log_selection([1, 2, 10 ** 30])
+    cooccur.log_selection([3, 10 ** 30])
+    assert [json.loads(line)['ids'] for line in log.read_text().splitlines()] == [[1, 2]]
+
+
+def test_update_skips_bad_lines_and_moves_on(log):
+    _write(log, [1, 2], [1, 10 ** 30, 3], ['x', 4, 5])
+    with open(log, 'a') as f:
+        f.write('not json\n')
+    _write(log, [1, 2])
+
+    assert cooccur.update() == 4
+    assert _state()['offset'] == log.stat().st_size
+    assert dict((other, n) for other, n, _ in cooccur.neighbors(1)) == {2: 2, 3: 1}
+    assert cooccur.update() == 0
+
+
+def test_update_skips_selections_sqlite_rejects(log, monkeypatch):
+    # selections that get past the reader but fail to bind are skipped one by one
+    monkeypatch.setattr(cooccur, '_storable', lambda movie_id: True)
+    _write(log, [1, 2], [1, 10 ** 30], [2, 3])
+
+    assert cooccur.update() == 2
+    assert _state()['offset'] == log.stat().st_size
+    assert {other for other, _, _ in cooccur.neighbors(2)} == {1, 3}
+    assert cooccur.update() == 0
+
+
+def test_long_selections_are_sampled_not_truncated(log):
+    _write(log, list(range(1, 201)))
+    cooccur.update()
+    paired = {item for (item,) in cooccur._conn().execute('SELECT item FROM items')}
+    assert len(paired) == cooccur.COOCCUR_MAX_SET
+    assert max(paired) > cooccur.COOCCUR_MAX_SET
+
+
+def test_scores_and_blend(log):
+    _write(log, [1, 2], [1, 2], [1, 3])
+    cooccur.update()
+    similar = cooccur.scores([1])
+    assert similar[2] > similar[3] > 0
+    assert cooccur.blend([(3, 1.0)], [1], weight=1, keep=lambda movie_id: True) == [
+        (3, 1.0 + similar[3]), (2, similar[2])]
+    assert cooccur.blend([(3, 1.0)], [1], weight=1, keep=lambda movie_id: False) == [(3, 1.0 + similar[3])]
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+import recommender
+import snapshot
+from tools.benchmark import GENRES, seed_sets
+
+from conftest import CATALOG_SIZE
+
+
+def _passes(movie, filters):
+    """The filters applied to one Movie row, the plain way."""
+    if filters.get('genres'):
+        genres = {g.strip().lower() for g in (movie.genre or '').split(',')}
+        if not genres & {g.lower() for g in filters['genres']}:
+            return False
+    if filters.get('year_from') is not None and not (movie.year and movie.year >= filters['year_from']):
+        return False
+    if filters.get('year_to') is not None and not (movie.year and movie.year <= filters['year_to']):
+        return False
+    if filters.get('min_rating') is not None and (movie.vote_average or 0) < filters['min_rating']:
+        return False
+    return True
+
+
+def _random_filters(rnd):
+    filters = {}
+    if rnd.random() < 0.6:
+        filters['genres'] = rnd.sample(GENRES, rnd.randint(1, 3))
+    if rnd.random() < 0.5:
+        filters['year_from'] = rnd.randint(1945, 2020)
+    if rnd.random() < 0.5:
+        filters['year_to'] = rnd.randint(filters.get('year_from', 1950), 2030)
+    if rnd.random() < 0.5:
+        filters['min_rating'] = round(rnd.uniform(0, 9.5), 1)
+    return filters
+
+
+def test_filter_bitmap_matches_per_row_filter(app, movies):
+    catalog = recommender.get_catalog()
+    rnd = random.Random(5)
+    for _ in range(200):
+        filters = _random_filters(rnd)
+        bits = recommender.filter_bitmap(catalog, filters)
+        expected = {m.id for m in movies if _passes(m, filters)}
+        if bits is None:
+            assert not filters
+            continue
+        assert {catalog.ids[row] for row in snapshot.iter_rows(bits)} == expected, filters
+
+
+def test_filter_bitmap_edges(app, movies):
+    catalog = recommender.get_catalog()
+    assert recommender.filter_bitmap(catalog, None) is None
+    assert recommender.filter_bitmap(catalog, {'genres': [], 'year_from': None}) is None
+    assert recommender.filter_bitmap(catalog, {'genres': ['No Such Genre']}) == 0
+    lower = recommender.filter_bitmap(catalog, {'genres': ['drama']})
+    assert lower and lower == recommender.filter_bitmap(catalog, {'genres': ['Drama']})
+
+
+@pytest.mark.parametrize('filters', [
+    {'genres': ['Drama', 'Comedy']},
+    {'year_from': 1990, 'year_to': 1999},
+    {'min_rating': 7.5},
+    {'genres': ['Horror'], 'year_from': 2000, 'min_rating': 5},
+])
+def test_filtered_recommendations_are_the_unfiltered_ones_that_pass(app, movies, filters):
+    by_id = {m.id: m for m in movies}
+    for ids in seed_sets(CATALOG_SIZE, 20, seed=11):
+        expected = [(movie_id, score) for movie_id, score in recommender.recommend(ids)
+                    if _passes(by_id[movie_id], filters)]
+        assert recommender.recommend(ids, filters=filters) == expected
+        allows = recommender.filter_predicate(filters)
+        assert all(allows(movie_id) for movie_id, _ in expected)
@@ -0,0 +1,25 @@
+import recommender
+from tools import baseline_scorer
+from tools.benchmark import seed_sets
+
+from conftest import CATALOG_SIZE
+
+
+def test_recommend_matches_baseline_loop(movies):
+    by_id = {m.id: m for m in movies}
+    for ids in seed_sets(CATALOG_SIZE, 100):
+        expected = baseline_scorer.recommend([by_id[i] for i in ids], movies)
+        assert recommender.recommend(ids) == expected, ids
+
+
+def test_recommend_many_matches_recommend(app):
+    sets = seed_sets(CATALOG_SIZE, 20, seed=3)
+    assert recommender.recommend_many(sets) == [recommender.recommend(ids) for ids in sets]
+
+
+def test_unknown_seed_ids_give_no_rows_and_no_rebuild(app):
+    catalog = recommender.get_catalog()
+    assert recommender.recommend([1, 10 ** 9]) == recommender.recommend([1])
+    assert recommender.recommend([10 ** 9]) == recommender.recommend([])
+    assert recommender.get_catalog() is catalog
+    assert recommender._rebuild['thread'] is None
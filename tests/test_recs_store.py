@@ -0,0 +1,67 @@
+import struct
+import zlib
+from array import array
+from collections import OrderedDict
+
+import pytest
+
+import app as web
+import recs_store
+
+RECS = [(3, 55.5), (2 ** 40, 20.0), (1, 0.0)]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    backend = recs_store.SQLiteBackend(str(tmp_path / 'recs_store.db'))
+    monkeypatch.setattr(recs_store, '_backend', backend)
+    monkeypatch.setattr(recs_store, '_local', OrderedDict())
+    return backend
+
+
+def test_encode_round_trip():
+    assert recs_store.decode(recs_store.encode(RECS)) == RECS
+    assert recs_store.decode(recs_store.encode([])) == []
+
+
+def test_decode_lists_stored_with_32_bit_ids():
+    raw = struct.pack('<I', 2) + array('i', [5, 3]).tobytes() + array('d', [1.5, 0.5]).tobytes()
+    assert recs_store.decode(zlib.compress(raw)) == [(5, 1.5), (3, 0.5)]
+
+
+def test_put_then_get_from_another_worker(store, monkeypatch):
+    recs_store.put('token', RECS)
+    assert recs_store.get('token') == RECS
+
+    # another worker: its own connection and an empty local cache
+    monkeypatch.setattr(recs_store, '_backend', recs_store.SQLiteBackend(store.path))
+    monkeypatch.setattr(recs_store, '_local', OrderedDict())
+    assert recs_store.get('token') == RECS
+    assert recs_store.size() == 1
+    assert recs_store.get('other') is None
+    assert recs_store.get(None) is None
+
+
+def test_expired_lists_are_not_served(store):
+    store.put('old', recs_store.encode(RECS), -1)
+    assert store.get('old') is None
+    memory = recs_store.MemoryBackend()
+    memory.put('old', b'x', -1)
+    assert memory.get('old') is None
+
+
+def test_local_cache_is_bounded(store, monkeypatch):
+    monkeypatch.setattr(recs_store, 'LOCAL_CACHE_MAX', 2)
+    for token in ('a', 'b', 'c'):
+        recs_store.put(token, RECS)
+    assert list(recs_store._local) == ['b', 'c']
+    assert recs_store.get('a') == RECS
+
+
+def test_secret_key_is_shared_through_the_instance_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv('SECRET_KEY')
+    key = web.secret_key(str(tmp_path))
+    assert len(key) == 32
+    assert web.secret_key(str(tmp_path)) == key
+    monkeypatch.setenv('SECRET_KEY', 'from-env')
+    assert web.secret_key(str(tmp_path)) == 'from-env'
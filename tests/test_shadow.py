@@ -0,0 +1,120 @@
+import json
+import queue
+
+import pytest
+
+import metrics
+import recommender
+import shadow
+from tools import shadow_report
+
+
+def _ranked(*ids):
+    return [(movie_id, 100.0 - n) for n, movie_id in enumerate(ids)]
+
+
+def test_overlap_at_k():
+    assert shadow.overlap_at_k(_ranked(1, 2, 3, 4), _ranked(4, 3, 2, 1), 4) == 1.0
+    assert shadow.overlap_at_k(_ranked(1, 2, 3, 4), _ranked(1, 9, 8, 2), 4) == 0.5
+    # only the top k of either list counts
+    assert shadow.overlap_at_k(_ranked(1, 2, 3), _ranked(3, 4, 1), 2) == 0.0
+    assert shadow.overlap_at_k([], [], 10) == 1.0
+    assert shadow.overlap_at_k([], _ranked(1), 10) == 0.0
+    assert shadow.overlap_at_k(_ranked(1), [], 10) == 0.0
+
+
+def test_kendall_tau():
+    assert shadow.kendall_tau(_ranked(1, 2, 3, 4), _ranked(1, 2, 3, 4), 4) == 1.0
+    assert shadow.kendall_tau(_ranked(1, 2, 3, 4), _ranked(4, 3, 2, 1), 4) == -1.0
+    # one swapped pair out of six
+    assert shadow.kendall_tau(_ranked(1, 2, 3, 4), _ranked(2, 1, 3, 4), 4) == pytest.approx(4 / 6)
+    # only the shared movies are ranked: 1 and 3, in the same order
+    assert shadow.kendall_tau(_ranked(1, 2, 3), _ranked(1, 9, 3), 3) == 1.0
+    assert shadow.kendall_tau(_ranked(1, 2), _ranked(1, 9), 2) is None
+    assert shadow.kendall_tau([], [], 10) is None
+
+
+@pytest.fixture
+def engine(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(shadow, '_app', app)
+    monkeypatch.setattr(shadow, 'SHADOW_ENGINE', 'test')
+    monkeypatch.setattr(shadow, 'SHADOW_K', 3)
+    monkeypatch.setattr(shadow, 'SHADOW_LOG', str(tmp_path / 'shadow.jsonl'))
+
+    def use(fn):
+        monkeypatch.setattr(shadow, '_engine', fn)
+    return use
+
+
+def test_compare_records_the_comparison(engine):
+    engine(lambda movie_ids, filters=None: _ranked(2, 1, 7, 3))
+    ok = metrics.SHADOW_COMPARISONS.value(engine='test', result='ok')
+    record = shadow._compare([10, 11], {'genres': ['Drama']}, _ranked(1, 2, 3, 4), 0.002)
+
+    assert metrics.SHADOW_COMPARISONS.value(engine='test', result='ok') == ok + 1
+    assert record['engine'] == 'test' and record['k'] == 3
+    assert record['seeds'] == [10, 11] and record['filters'] == {'genres': ['Drama']}
+    assert record['primary_top'] == [1, 2, 3] and record['shadow_top'] == [2, 1, 7]
+    assert record['overlap'] == pytest.approx(2 / 3)
+    assert record['tau'] == -1.0
+    assert record['primary_ms'] == 2.0 and record['shadow_ms'] >= 0
+
+
+def test_compare_counts_engine_errors(engine):
+    def broken(movie_ids, filters=None):
+        raise RuntimeError('boom')
+    engine(broken)
+    errors = metrics.SHADOW_COMPARISONS.value(engine='test', result='error')
+    assert shadow._compare([1], None, _ranked(1, 2), 0.001) is None
+    assert metrics.SHADOW_COMPARISONS.value(engine='test', result='error') == errors + 1
+
+
+def test_submit_samples_and_drops_when_full(engine, monkeypatch):
+    assert not shadow.submit([1], _ranked(1, 2), 0.001)  # no engine
+    engine(shadow.ENGINES['recommend'])
+    monkeypatch.setattr(shadow, 'SHADOW_SAMPLE_RATE', 0)
+    assert not shadow.submit([1], _ranked(1, 2), 0.001)
+
+    monkeypatch.setattr(shadow, 'SHADOW_SAMPLE_RATE', 1)
+    full = queue.Queue(maxsize=1)
+    full.put_nowait(None)
+    monkeypatch.setattr(shadow, '_queue', full)
+    dropped = metrics.SHADOW_COMPARISONS.value(engine='test', result='dropped')
+    assert not shadow.submit([1], _ranked(1, 2), 0.001)
+    assert metrics.SHADOW_COMPARISONS.value(engine='test', result='dropped') == dropped + 1
+
+
+def test_submitted_samples_reach_the_log_and_report(engine, monkeypatch, tmp_path):
+    engine(shadow.ENGINES['recommend'])
+    monkeypatch.setattr(shadow, 'SHADOW_SAMPLE_RATE', 1)
+    for seeds in ([1, 2, 3], [4, 5], [6]):
+        primary = recommender.recommend(seeds)
+        assert shadow.submit(seeds, primary, 0.001)
+    shadow._queue.join()
+
+    records = shadow_report.load(tmp_path / 'shadow.jsonl')
+    assert [r['seeds'] for r in records] == [[1, 2, 3], [4, 5], [6]]
+    # the same engine on both sides agrees exactly
+    assert all(r['overlap'] == 1.0 and r['tau'] in (1.0, None) for r in records)
+    assert shadow_report.load(tmp_path / 'shadow.jsonl', engine='other') == []
+
+    summary = shadow_report.summarize(records)
+    assert summary['samples'] == 3
+    assert summary['overlap'] == {'mean': 1.0, 'p5': 1.0, 'min': 1.0, 'identical': 1.0}
+    assert summary['primary_ms']['p50'] == 1.0
+
+
+def test_report_summary_numbers():
+    records = [{'overlap': o, 'tau': t, 'primary_ms': p, 'shadow_ms': s}
+               for o, t, p, s in [(1.0, 1.0, 1, 2), (0.5, None, 2, 4), (0.8, 0.5, 3, 6), (1.0, 0.0, 4, 8)]]
+    summary = shadow_report.summarize(records)
+    assert summary['overlap'] == {'mean': 0.825, 'p5': 0.5, 'min': 0.5, 'identical': 0.5}
+    assert summary['tau_mean'] == 0.5
+    assert summary['shadow_ms'] == {'p50': 6, 'p95': 8, 'p99': 8}
+    assert shadow_report.percentile([], 50) is None
+
+
+def test_log_lines_are_json(engine, tmp_path):
+    shadow._write({'engine': 'test', 'overlap': 1.0})
+    assert [json.loads(line) for line in (tmp_path / 'shadow.jsonl').read_text().splitlines()] == \
+        [{'engine': 'test', 'overlap': 1.0}]
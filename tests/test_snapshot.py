@@ -0,0 +1,28 @@
+import recommender
+import snapshot
+
+BIG = 2 ** 40
+
+
+def _rows():
+    return [
+        (1, 'Drama, Crime', 'Person 1', 'Person 2', 'Person 3, Person 4', 1999, 7.5, 100),
+        (2 ** 31 + 5, 'Drama', 'Person 1', None, 'Person 3', 2001, 6.0, 80),
+        (BIG, 'Crime', None, 'Person 2', 'Person 4, Person 3', 1998, 8.0, 120),
+    ]
+
+
+def test_ids_beyond_32_bits_round_trip(tmp_path):
+    path = tmp_path / 'catalog.snap'
+    snapshot.write(snapshot.encode(_rows()), str(path))
+    snap = snapshot.load(str(path))
+    assert list(snap.ids) == [1, 2 ** 31 + 5, BIG]
+    assert snap.row_of(BIG) == 2
+    assert snap.max_id == BIG
+    assert {movie_id for movie_id, _ in recommender.recommend([1], catalog=snap)} == {BIG, 2 ** 31 + 5}
+
+
+def test_snapshot_matches_database(app, movies):
+    snap = snapshot.Snapshot(snapshot.encode(snapshot.rows_from_db()))
+    assert list(snap.ids) == [m.id for m in movies]
+    assert [snap.years[snap.row_of(m.id)] for m in movies] == [m.year or 0 for m in movies]
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import event
+
+import app as web
+import httpcache
+import recommender
+from models import db, Movie
+
+NEW_IDS = [9000001, 9000002, 9000003]
+
+
+@pytest.fixture
+def tmdb(app, monkeypatch):
+    """Fake TMDb details: every id in NEW_IDS but the last one is found."""
+    fetched = []
+
+    def fetch(tmdb_id):
+        fetched.append(tmdb_id)
+        if tmdb_id == NEW_IDS[-1]:
+            return None
+        return {'title': f'Fetched {tmdb_id}', 'genre': 'Drama', 'year': '2001', 'vote_average': 7.0}
+
+    monkeypatch.setattr(web, '_fetch_detail', fetch)
+    yield fetched
+    Movie.query.filter(Movie.tmdb_id.in_(NEW_IDS)).delete()
+    db.session.commit()
+    httpcache.bump()
+    recommender.mark_dirty()
+    recommender._idle.wait(10)
+
+
+def test_batch_upsert_inserts_missing_movies_in_one_statement(client, tmdb):
+    existing = Movie.query.order_by(Movie.id).first()
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        response = client.post('/upsert_tmdb/batch', json={'tmdb_ids': [existing.tmdb_id] + NEW_IDS + NEW_IDS[:1]})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['failed'] == [NEW_IDS[-1]]
+    assert sorted(tmdb) == NEW_IDS
+    stored = dict(db.session.query(Movie.tmdb_id, Movie.id).filter(Movie.tmdb_id.in_(NEW_IDS)))
+    assert data['ids'] == {str(existing.tmdb_id): existing.id, **{str(t): i for t, i in stored.items()}}
+    assert sorted(stored) == NEW_IDS[:2]
+    assert sum(statement.startswith('INSERT') for statement in statements) == 1
+
+    # already stored: resolved without a fetch
+    del tmdb[:]
+    assert client.post('/upsert_tmdb', json={'tmdb_id': NEW_IDS[0]}).get_json() == {'db_id': stored[NEW_IDS[0]]}
+    assert tmdb == []
+
+
+def test_upsert_rejects_bad_bodies(client):
+    for url, body in (('/upsert_tmdb', [1]), ('/upsert_tmdb/batch', [1])):
+        response = client.post(url, json=body)
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'body must be a JSON object'
+    for tmdb_id in ('abc', '99999999999999999999999'):
+        assert client.post('/upsert_tmdb', data={'tmdb_id': tmdb_id}).status_code == 400
+    assert client.post('/upsert_tmdb', json={}).status_code == 400
+    response = client.post('/upsert_tmdb/batch', data={'tmdb_ids': '1'})
+    assert response.status_code == 400
+    response = client.post('/upsert_tmdb/batch', json={'tmdb_ids': '1,99999999999999999999999'})
+    assert response.get_json()['error'] == 'tmdb_ids must be 64-bit integers'
@@ -0,0 +1,81 @@
+import metrics
+import recommender
+import recs_store
+
+
+def _stored(client):
+    with client.session_transaction() as session:
+        return recs_store.get(session['recs_token'])
+
+
+def test_recommend_form_seeds(client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(recommender, 'recommend_taste', lambda *a, **kw: calls.append(a) or [])
+    response = client.post('/recommend', data={'movies': ['1', '2', '3']})
+    assert response.status_code == 302
+    assert not calls
+    assert _stored(client) == recommender.recommend([1, 2, 3])
+
+
+def test_recommend_form_history_is_scored_as_taste(client, monkeypatch):
+    calls = []
+    taste = recommender.recommend_taste
+
+    def recording(movie_ids, *args, **kwargs):
+        calls.append(movie_ids)
+        return taste(movie_ids, *args, **kwargs)
+
+    monkeypatch.setattr(recommender, 'recommend_taste', recording)
+    response = client.post('/recommend', data={'movies': ['1', '2', '3', '4', '5']})
+    assert response.status_code == 302
+    assert calls == [[1, 2, 3, 4, 5]]
+    assert _stored(client) == taste([1, 2, 3, 4, 5])
+
+
+def test_recommend_form_limits(client):
+    assert client.post('/recommend', data={}).status_code == 400
+    assert client.post('/recommend', data={'movies': [str(i) for i in range(1, 1002)]}).status_code == 400
+    response = client.post('/recommend', data={'movies': ['1', '99999999999999999999999']})
+    assert response.status_code == 400
+    assert b'64-bit' in response.data
+
+
+def test_recommendations_data_cursor_pages(client):
+    client.post('/recommend', data={'movies': ['1', '2']})
+    stored = _stored(client)
+    served, query = [], {'per_page': 7}
+    while True:
+        data = client.get('/recommendations_data', query_string=query).get_json()
+        served.extend((r['id'], r['score']) for r in data['results'])
+        if not data['has_next']:
+            assert data['next_cursor'] is None
+            break
+        query['cursor'] = data['next_cursor']
+    assert served == stored
+
+    # several pages at once, and the legacy ?page=
+    data = client.get('/recommendations_data?per_page=7&pages=3').get_json()
+    assert [r['id'] for r in data['results']] == [movie_id for movie_id, _ in stored[:21]]
+    data = client.get('/recommendations_data?per_page=7&page=2').get_json()
+    assert [r['id'] for r in data['results']] == [movie_id for movie_id, _ in stored[7:14]]
+
+
+def test_recommendations_data_rejects_cursor_of_another_list(client):
+    client.post('/recommend', data={'movies': ['1', '2']})
+    cursor = client.get('/recommendations_data?per_page=5').get_json()['next_cursor']
+    client.post('/recommend', data={'movies': ['3']})
+    response = client.get('/recommendations_data', query_string={'per_page': 5, 'cursor': cursor})
+    assert response.status_code == 400
+    assert client.get('/recommendations_data?cursor=junk').status_code == 400
+
+
+def test_recommendations_page_reuses_hydrated_rows(client):
+    client.post('/recommend', data={'movies': ['4', '5']})
+    client.get('/recommendations_data?per_page=5')
+    hits = metrics.CACHE_REQUESTS.value(cache='recs_rows', result='hit')
+    client.get('/recommendations_data?per_page=5')
+    assert metrics.CACHE_REQUESTS.value(cache='recs_rows', result='hit') == hits + 1
+
+
+def test_recommendations_data_without_session(app):
+    assert app.test_client().get('/recommendations_data').status_code == 400
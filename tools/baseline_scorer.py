@@ -0,0 +1,109 @@
+"""The scoring loop of the original /recommend view, kept as the ranking reference.
+
+``tools/benchmark.py --update-golden`` records the golden set with it and the
+tests compare ``recommender`` against it. Do not optimize this module: it is
+meant to stay a plain copy of the per-row loop the recommender replaced.
+"""
+from collections import defaultdict
+
+WEIGHT_GENRE = 40
+WEIGHT_DIRECTOR = 20
+WEIGHT_WRITER = 10
+WEIGHT_ACTORS = 20
+WEIGHT_YEAR = 10
+ACTORS_TOP_N = 3
+YEAR_WINDOW = 5
+
+
+def recommend(selected_movies, all_movies):
+    """Score ``all_movies`` (in id order) against ``selected_movies``.
+
+    Both are objects with the Movie columns. Returns ``[(movie_id, score), ...]``
+    sorted best first, seeds excluded, like the original view stored it.
+    """
+    selected_ids = {sm.id for sm in selected_movies}
+
+    # build helper sets from selected movies
+    union_selected_genres = set()
+    union_selected_top_actors = set()
+    selected_years = []
+    selected_directors = set()
+    selected_writers = set()
+    for sm in selected_movies:
+        if sm.genre:
+            union_selected_genres.update([g.strip() for g in sm.genre.split(',') if g.strip()])
+        if sm.actors:
+            union_selected_top_actors.update([a.strip() for a in sm.actors.split(',')][:ACTORS_TOP_N])
+        if getattr(sm, 'year', None):
+            try:
+                selected_years.append(int(sm.year))
+            except Exception:
+                pass
+        if sm.director:
+            selected_directors.add(sm.director.strip())
+        if getattr(sm, 'writer', None):
+            selected_writers.update([w.strip() for w in sm.writer.split(',') if w.strip()])
+
+    mean_selected_year = None
+    if selected_years:
+        mean_selected_year = sum(selected_years) / len(selected_years)
+
+    recommendations = defaultdict(float)
+    for movie in all_movies:
+        if movie.id in selected_ids:
+            continue
+        score = 0.0
+
+        # candidate genres and actors
+        movie_genres = set([g.strip() for g in (movie.genre or '').split(',') if g.strip()])
+        movie_actors = [a.strip() for a in (movie.actors or '').split(',') if a.strip()]
+        movie_top_actors = set(movie_actors[:ACTORS_TOP_N])
+
+        # Genre score: proportion of union_selected_genres that candidate covers
+        if union_selected_genres:
+            shared_genres = union_selected_genres.intersection(movie_genres)
+            # If user selections all share a single genre, require candidate to have it
+            if len(union_selected_genres) == 1:
+                only_genre = next(iter(union_selected_genres))
+                if only_genre not in movie_genres:
+                    # candidate doesn't have the required genre -> skip (score remains 0)
+                    recommendations[movie.id] = 0.0
+                    continue
+            genre_fraction = len(shared_genres) / len(union_selected_genres)
+            score += WEIGHT_GENRE * genre_fraction
+
+        # Director / Writer score: split weights so each can contribute
+        director_match = movie.director and movie.director.strip() in selected_directors
+        writer_match = getattr(movie, 'writer', None) and any(
+            w.strip() in selected_writers for w in (movie.writer or '').split(','))
+        if director_match:
+            score += WEIGHT_DIRECTOR
+        if writer_match:
+            score += WEIGHT_WRITER
+
+        # Actors: threshold-based scoring for shared top N actors
+        shared_actor_count = (len(union_selected_top_actors.intersection(movie_top_actors))
+                              if union_selected_top_actors and movie_top_actors else 0)
+        # threshold mapping: 0 -> 0, 1 -> 8, 2 -> 15, 3 -> 20 (approximate proportions of WEIGHT_ACTORS)
+        actor_score = 0.0
+        if shared_actor_count >= 3:
+            actor_score = WEIGHT_ACTORS
+        elif shared_actor_count == 2:
+            actor_score = round(0.75 * WEIGHT_ACTORS, 2)  # 15
+        elif shared_actor_count == 1:
+            actor_score = round(0.4 * WEIGHT_ACTORS, 2)   # 8
+        score += actor_score
+
+        # Year proximity: linear scaling within YEAR_WINDOW
+        if mean_selected_year and getattr(movie, 'year', None):
+            try:
+                diff = abs(int(movie.year) - mean_selected_year)
+                if diff <= YEAR_WINDOW:
+                    score += WEIGHT_YEAR * (1 - (diff / YEAR_WINDOW))
+            except Exception:
+                pass
+
+        if score > 0:
+            recommendations[movie.id] = score
+
+    return sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
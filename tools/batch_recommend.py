@@ -0,0 +1,194 @@
+"""Score many seed sets offline with a pool of worker processes.
+
+Reads seed sets from a JSONL or CSV file and writes one JSON line of
+recommendations per seed set, in input order:
+
+    python tools/batch_recommend.py seeds.jsonl --out recs.jsonl
+    python tools/batch_recommend.py seeds.csv --out recs.jsonl --workers 8 --k 20
+
+Input formats:
+
+    seeds.jsonl   {"id": "user-1", "seeds": [19995, 285]}   (or a bare list per line)
+    seeds.csv     id,seeds
+                  user-1,19995;285;The Matrix
+
+Seeds are movie ids (numbers or digit strings) or exact titles
+(case-insensitive); titles are only loaded from the database if the input
+uses any. The input is streamed once. The catalog snapshot
+(``instance/catalog.snap``, see snapshot.py) is opened once in the parent and
+inherited by the forked workers, so every process scores from the same
+mmap'ed pages. Without a published snapshot the catalog is built from the
+database once and written to a temporary file for the workers. Progress and
+throughput go to stderr.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from itertools import islice
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import recommender
+import snapshot
+
+# set in the parent before the pool starts; forked workers inherit them
+_catalog = None
+_weights = None
+
+
+def parse_seed(seed):
+    """An int id for numbers and digit strings ("603"), otherwise the stripped title."""
+    if isinstance(seed, str):
+        seed = seed.strip()
+        return int(seed) if seed.isdigit() else seed
+    return seed
+
+
+def read_seed_sets(path):
+    """Yield ``(key, [seed, ...])`` from a JSONL or CSV file; seeds are ints (ids) or strings (titles)."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            for n, row in enumerate(csv.DictReader(f), 1):
+                seeds = [s for s in (row.get('seeds') or '').split(';') if s.strip()]
+                yield row.get('id') or n, [parse_seed(s) for s in seeds]
+            return
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if not isinstance(item, list):
+                n, item = item.get('id', n), item.get('seeds') or []
+            yield n, [parse_seed(s) for s in item]
+
+
+def load_titles():
+    """Lower-cased title -> id for every movie (first id wins on duplicates)."""
+    from database import app_context
+    from models import db, Movie
+
+    with app_context():
+        titles = {}
+        for movie_id, title in db.session.query(Movie.id, Movie.title).order_by(Movie.id):
+            titles.setdefault((title or '').lower(), movie_id)
+    return titles
+
+
+def open_catalog(path):
+    """The published snapshot, or one built from the database into a temporary file (returned second)."""
+    if os.path.exists(path):
+        return snapshot.load(path), None
+    from database import app_context
+
+    with app_context():
+        data = snapshot.encode(snapshot.rows_from_db())
+    fd, tmp = tempfile.mkstemp(suffix='.snap')
+    os.close(fd)
+    snapshot.write(data, tmp)
+    return snapshot.load(tmp), tmp
+
+
+def _init_worker(path):
+    global _catalog, _weights
+    if _catalog is None:
+        # spawn start method: nothing was inherited, map the same file
+        _catalog = snapshot.load(path)
+        _weights = recommender.active_profile()
+
+
+def _score_chunk(args):
+    chunk, k = args
+    results = recommender.recommend_many([ids for _, ids, _ in chunk], catalog=_catalog, weights=_weights)
+    lines = []
+    for (key, ids, unresolved), recs in zip(chunk, results):
+        lines.append(json.dumps({
+            'id': key,
+            'seeds': ids,
+            'unresolved': unresolved,
+            'recommendations': [{'movie_id': movie_id, 'score': round(score, 4)} for movie_id, score in recs[:k]],
+        }, ensure_ascii=False))
+    return lines
+
+
+def chunks(seed_sets, size, titles=load_titles):
+    """Resolve titles to ids and group seed sets into ``size``-long work units.
+
+    ``titles`` is called for the title index the first time a seed is not an id.
+    """
+    it = iter(seed_sets)
+    index = None
+    while True:
+        chunk = []
+        for key, seeds in islice(it, size):
+            ids = []
+            unresolved = []
+            for s in seeds:
+                if isinstance(s, int):
+                    ids.append(s)
+                    continue
+                if index is None:
+                    index = titles()
+                if str(s).lower() in index:
+                    ids.append(index[str(s).lower()])
+                else:
+                    unresolved.append(s)
+            chunk.append((key, ids, unresolved))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(path, out, workers, k, chunk_size, snapshot_path, progress_every=5.0):
+    global _catalog, _weights
+    started = time.perf_counter()
+    _catalog, tmp = open_catalog(snapshot_path)
+    _weights = recommender.active_profile()
+    print(f"Catalog {_catalog.version}: {len(_catalog)} movies, profile {_weights.version}, "
+          f"loaded in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    work = ((chunk, k) for chunk in chunks(read_seed_sets(path), chunk_size))
+    done = 0
+    started = last = time.perf_counter()
+    try:
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(tmp or snapshot_path,)) as pool:
+            for lines in pool.imap(_score_chunk, work):
+                for line in lines:
+                    out.write(line + '\n')
+                done += len(lines)
+                now = time.perf_counter()
+                if now - last >= progress_every:
+                    last = now
+                    print(f"{done} seed sets, {done / (now - started):.0f}/s", file=sys.stderr)
+    finally:
+        if tmp:
+            os.remove(tmp)
+    elapsed = time.perf_counter() - started
+    print(f"Done: {done} seed sets in {elapsed:.1f}s ({done / elapsed if elapsed else 0:.0f}/s, "
+          f"{workers} workers)", file=sys.stderr)
+    return done
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='seed sets (.jsonl or .csv)')
+    parser.add_argument('--out', help='output JSONL file (default: stdout)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--k', type=int, default=10, help='recommendations per seed set')
+    parser.add_argument('--chunk-size', type=int, default=200, help='seed sets per work unit')
+    parser.add_argument('--snapshot', default=snapshot.SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as out:
+            run(args.input, out, args.workers, args.k, args.chunk_size, args.snapshot)
+    else:
+        run(args.input, sys.stdout, args.workers, args.k, args.chunk_size, args.snapshot)
@@ -0,0 +1,238 @@
+"""Benchmark and ranking-regression harness for the recommender.
+
+Generates synthetic catalogs, seeds a throwaway SQLite database per size and
+drives the app through the Flask test client (no TMDb calls). Each size runs
+in its own subprocess so peak RSS is measured per catalog.
+
+    python tools/benchmark.py                        # 5k, 50k and 500k movies
+    python tools/benchmark.py --sizes 5000 --requests 100 --out bench.json
+    python tools/benchmark.py --sizes 5000 --check-golden     # ranking regression only
+    python tools/benchmark.py --sizes 5000 --update-golden    # re-record the golden set (baseline scorer)
+
+The golden set (tools/bench_golden.json) holds the top-10 ids the original
+scoring loop (tools/baseline_scorer.py) returns for fixed seed sets on the 5k
+synthetic catalog. --check-golden reports the recommender's overlap@10 against
+it and exits non-zero if any seed set drops below --min-overlap.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+GOLDEN_PATH = ROOT / 'tools' / 'bench_golden.json'
+GOLDEN_SIZE = 5000
+GOLDEN_SEED_SETS = 200
+DEFAULT_SIZES = [5000, 50000, 500000]
+
+GENRES = ['Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Family',
+          'Fantasy', 'History', 'Horror', 'Music', 'Mystery', 'Romance', 'Science Fiction',
+          'TV Movie', 'Thriller', 'War', 'Western']
+WORDS = ['Dark', 'Night', 'Star', 'Lost', 'City', 'Love', 'War', 'Last', 'King', 'Dream', 'Blood',
+         'Storm', 'Ghost', 'Road', 'River', 'Iron', 'Silent', 'Golden', 'Secret', 'Wild']
+
+
+def synthetic_movies(n, seed=42):
+    """Deterministic synthetic catalog rows shaped like the seeded TMDb 5000 data."""
+    rnd = random.Random(seed)
+    people = [f'Person {i}' for i in range(max(100, n // 2))]
+    directors = people[:max(20, n // 15)]
+    writers = people[:max(40, n // 6)]
+    rows = []
+    for i in range(1, n + 1):
+        cast = rnd.sample(people, rnd.randint(0, 3))
+        rows.append({
+            'id': i,
+            'title': f"{' '.join(rnd.sample(WORDS, rnd.randint(1, 3)))} {i}",
+            'description': 'Synthetic overview. ' * rnd.randint(2, 12),
+            'poster_url': f'https://image.tmdb.org/t/p/w500/synthetic{i}.jpg',
+            'tmdb_id': 1000000 + i,
+            'genre': ', '.join(rnd.sample(GENRES, rnd.randint(1, 4))),
+            'director': rnd.choice(directors) if rnd.random() < 0.95 else None,
+            'writer': ', '.join(rnd.sample(writers, rnd.randint(0, 2))) or None,
+            'year': rnd.randint(1950, 2024) if rnd.random() < 0.97 else None,
+            'actors': ', '.join(cast) or None,
+            'vote_average': round(rnd.uniform(1, 9.5), 1),
+            'vote_count': rnd.randint(0, 20000),
+        })
+    return rows
+
+
+def seed_sets(n_movies, count, seed=7):
+    rnd = random.Random(seed)
+    return [rnd.sample(range(1, n_movies + 1), rnd.randint(1, 3)) for _ in range(count)]
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        'count': len(ordered),
+        'p50_ms': round(pct(50) * 1000, 3),
+        'p95_ms': round(pct(95) * 1000, 3),
+        'p99_ms': round(pct(99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'rps': round(len(ordered) / sum(ordered), 1) if sum(ordered) else None,
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def run_worker(size, n_requests, golden_mode):
+    """Runs inside the subprocess: DATABASE_URL/CATALOG_SNAPSHOT already point at scratch files."""
+    from app import create_app
+    from models import db, Movie
+    import recommender
+    import snapshot
+
+    app = create_app()
+    report = {'size': size}
+    rows = synthetic_movies(size)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        chunk = 5000
+        started = time.perf_counter()
+        for i in range(0, len(rows), chunk):
+            db.session.add_all(Movie(**r) for r in rows[i:i + chunk])
+            db.session.commit()
+        elapsed = time.perf_counter() - started
+        report['seeding'] = {'rows': size, 'seconds': round(elapsed, 3), 'rows_per_s': round(size / elapsed, 1)}
+
+        elapsed, snap = timed(lambda: snapshot.build(snapshot.SNAPSHOT_PATH))
+        report['snapshot_build_s'] = round(elapsed, 3)
+        elapsed, _ = timed(lambda: snapshot.load(snapshot.SNAPSHOT_PATH))
+        report['snapshot_open_ms'] = round(elapsed * 1000, 3)
+
+        if golden_mode == 'record':
+            import baseline_scorer
+
+            movies = Movie.query.order_by(Movie.id).all()
+            by_id = {m.id: m for m in movies}
+            return report, {
+                'size': size,
+                'profile': 'baseline',
+                'top10': [[movie_id for movie_id, _ in
+                           baseline_scorer.recommend([by_id[i] for i in ids], movies)[:10]]
+                          for ids in seed_sets(size, GOLDEN_SEED_SETS)],
+            }
+        if golden_mode:
+            return report, {
+                'size': size,
+                'profile': recommender.active_profile().version,
+                'top10': [[movie_id for movie_id, _ in recommender.recommend(ids)[:10]]
+                          for ids in seed_sets(size, GOLDEN_SEED_SETS)],
+            }
+
+    client = app.test_client()
+    rnd = random.Random(11)
+    samples = {'/recommend': [], '/recommendations_data': [], '/search': []}
+    for ids in seed_sets(size, n_requests):
+        elapsed, resp = timed(lambda: client.post('/recommend', data={'movies': [str(i) for i in ids]}))
+        assert resp.status_code == 302, resp.status_code
+        samples['/recommend'].append(elapsed)
+        for page in (1, 2, 3):
+            elapsed, resp = timed(lambda: client.get(f'/recommendations_data?page={page}'))
+            samples['/recommendations_data'].append(elapsed)
+        elapsed, resp = timed(lambda: client.get(f'/search?q={rnd.choice(WORDS)}'))
+        samples['/search'].append(elapsed)
+
+    report['latency'] = {route: percentiles(values) for route, values in samples.items()}
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report, None
+
+
+def spawn(size, n_requests, golden_mode):
+    with tempfile.TemporaryDirectory(prefix='bench-') as tmp:
+        env = dict(os.environ)
+        env.update({
+            'DATABASE_URL': f"sqlite:///{os.path.join(tmp, 'movies.db')}",
+            'CATALOG_SNAPSHOT': os.path.join(tmp, 'catalog.snap'),
+            'TMDB_API_KEY': '',
+        })
+        cmd = [sys.executable, __file__, '--worker', '--sizes', str(size), '--requests', str(n_requests)]
+        if golden_mode:
+            cmd += ['--golden-worker', golden_mode]
+        out = subprocess.run(cmd, env=env, cwd=str(ROOT), check=True, capture_output=True, text=True)
+        return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def overlap_at_10(golden, current):
+    scores = []
+    for expected, got in zip(golden, current):
+        if not expected and not got:
+            scores.append(1.0)
+        else:
+            scores.append(len(set(expected) & set(got)) / max(len(expected), len(got)))
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--requests', type=int, default=200, help='recommend requests per catalog size')
+    parser.add_argument('--out', help='write the JSON report here')
+    parser.add_argument('--check-golden', action='store_true', help='only run the ranking regression')
+    parser.add_argument('--update-golden', action='store_true',
+                        help='re-record tools/bench_golden.json with the baseline scorer')
+    parser.add_argument('--min-overlap', type=float, default=1.0)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--golden-worker', choices=('check', 'record'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        report, golden = run_worker(args.sizes[0], args.requests, args.golden_worker)
+        print(json.dumps({'report': report, 'golden': golden}))
+        return 0
+
+    if args.check_golden or args.update_golden:
+        result = spawn(GOLDEN_SIZE, 0, 'record' if args.update_golden else 'check')['golden']
+        if args.update_golden:
+            GOLDEN_PATH.write_text(json.dumps(result) + '\n')
+            print(f"Recorded {len(result['top10'])} golden top-10 lists to {GOLDEN_PATH}")
+            return 0
+        golden = json.loads(GOLDEN_PATH.read_text())
+        scores = overlap_at_10(golden['top10'], result['top10'])
+        worst = min(scores)
+        print(f"overlap@10 vs golden (profile {golden['profile']} -> {result['profile']}): "
+              f"mean={sum(scores) / len(scores):.4f} min={worst:.4f} over {len(scores)} seed sets")
+        return 0 if worst >= args.min_overlap else 1
+
+    reports = []
+    for size in args.sizes:
+        print(f"Benchmarking {size} movies...", file=sys.stderr)
+        report = spawn(size, args.requests, False)['report']
+        reports.append(report)
+        print(json.dumps(report, indent=2))
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(reports, indent=2) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,10 +4,10 @@ ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 from dotenv import load_dotenv
 load_dotenv(ROOT / '.env')
-from app import app
+from database import app_context
 from models import db, Movie
 
-with app.app_context():
+with app_context():
     total = Movie.query.count()
     posters = Movie.query.filter(Movie.poster_url.isnot(None)).filter(~Movie.poster_url.like('%No+Image%')).count()
     tmdb_ids = Movie.query.filter(Movie.tmdb_id.isnot(None)).count()
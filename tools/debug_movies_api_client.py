@@ -5,10 +5,10 @@ sys.path.insert(0, str(ROOT))
 from dotenv import load_dotenv
 load_dotenv(ROOT / '.env')
 
-from app import app
+from app import create_app
 import json
 
-with app.test_client() as c:
+with create_app().test_client() as c:
     resp = c.get('/movies_api?page=1&per_page=20')
     print('status', resp.status_code)
     try:
@@ -4,11 +4,11 @@ ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 from dotenv import load_dotenv
 load_dotenv(ROOT / '.env')
-from app import app
+from app import create_app
 
 queries = ["Inception", "The", "Matrix", "Avatar", "NonExistingTitleXYZ"]
 
-with app.test_client() as c:
+with create_app().test_client() as c:
     for q in queries:
         resp = c.get(f'/search?q={q}')
         print(f'Query: {q} status={resp.status_code}')
@@ -0,0 +1,110 @@
+"""Aggregate request profiles written by profiling.ProfilingMiddleware.
+
+    python tools/profile_report.py                      # all profiles in instance/profiles
+    python tools/profile_report.py --route /recommend --top 30
+    python tools/profile_report.py --dir /tmp/profiles --sort tottime
+
+cProfile captures (.pstats) are merged and printed as the top-N functions.
+Sampled stacks (.collapsed) are merged and reported as the top-N frames by
+self samples (leaf frame) and by inclusive samples.
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import pstats
+import sys
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from profiling import PROFILE_DIR
+
+
+def load_profiles(directory, route=None):
+    """Yield (meta, profile_path) for each sidecar in ``directory`` matching ``route``."""
+    for meta_path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if route and meta.get('route') != route:
+            continue
+        profile_path = os.path.join(directory, meta.get('profile', ''))
+        if os.path.exists(profile_path):
+            yield meta, profile_path
+
+
+def report_pstats(paths, top, sort):
+    stats = None
+    for path in paths:
+        if stats is None:
+            stats = pstats.Stats(path, stream=io.StringIO())
+        else:
+            stats.add(path)
+    if stats is None:
+        return
+    out = io.StringIO()
+    stats.stream = out
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+    print(f'== cProfile: {len(paths)} profiles, top {top} by {sort}')
+    print(out.getvalue())
+
+
+def report_collapsed(paths, top):
+    self_samples = Counter()
+    inclusive = Counter()
+    total = 0
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if not stack:
+                    continue
+                count = int(count)
+                frames = stack.split(';')
+                total += count
+                self_samples[frames[-1]] += count
+                for frame in set(frames):
+                    inclusive[frame] += count
+    if not total:
+        return
+    print(f'== stack samples: {len(paths)} profiles, {total} samples')
+    print(f'{"self %":>7} {"incl %":>7}  frame')
+    for frame, count in self_samples.most_common(top):
+        print(f'{100 * count / total:7.1f} {100 * inclusive[frame] / total:7.1f}  {frame}')
+    print()
+    print(f'top {top} by inclusive samples:')
+    for frame, count in inclusive.most_common(top):
+        print(f'{100 * count / total:7.1f}  {frame}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default=PROFILE_DIR)
+    parser.add_argument('--route', help='only include profiles for this route, e.g. /movie/<int:movie_id>')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--sort', default='cumulative', help='pstats sort key (cumulative, tottime, ncalls...)')
+    args = parser.parse_args()
+
+    profiles = list(load_profiles(args.dir, args.route))
+    if not profiles:
+        print(f'No profiles found in {args.dir}')
+        return
+
+    by_route = Counter(meta['route'] for meta, _ in profiles)
+    slowest = max(profiles, key=lambda p: p[0].get('duration_ms', 0))[0]
+    print(f'{len(profiles)} profiles: ' + ', '.join(f'{route} x{n}' for route, n in by_route.most_common()))
+    print(f"slowest: {slowest['method']} {slowest['path']}?{slowest['query']} {slowest['duration_ms']}ms")
+    print()
+
+    report_pstats([p for _, p in profiles if p.endswith('.pstats')], args.top, args.sort)
+    report_collapsed([p for _, p in profiles if p.endswith('.collapsed')], args.top)
+
+
+if __name__ == '__main__':
+    main()
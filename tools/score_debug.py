@@ -1,124 +1,105 @@
+"""Explain recommendation scores component by component.
+
+    python tools/score_debug.py "Spider-Man 3" "The Avengers"                 # top 50 as a table
+    python tools/score_debug.py "Spider-Man 3" "The Avengers" --top 0 --csv > all.csv
+    python tools/score_debug.py "Spider-Man 3" "The Avengers" --sort actors
+    python tools/score_debug.py "Spider-Man 3" "The Avengers" --candidate "Iron Man"
+
+The explain mode scores every candidate in one pass with the production
+scorer (``recommender.explain``) and prints the genre, director, writer,
+actors and year terms of each total. ``--candidate`` prints the row of one
+candidate from that same pass.
+"""
+import argparse
+import csv
 import os, sys
 # make sure project root is on sys.path
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
-from app import app
-from models import Movie
-from collections import defaultdict
-
-# Copy of scoring config from app.py
-WEIGHT_GENRE = 40
-WEIGHT_DIRECTOR = 20
-WEIGHT_WRITER = 10
-WEIGHT_ACTORS = 20
-WEIGHT_YEAR = 10
-ACTORS_TOP_N = 3
-YEAR_WINDOW = 5
-
-
-def compute_score_for_candidate(selected_titles, candidate_title):
-    with app.app_context():
-        selected_movies = Movie.query.filter(Movie.title.in_(selected_titles)).all()
-        candidate = Movie.query.filter(Movie.title==candidate_title).first()
-        if not candidate:
-            print('Candidate not found')
-            return
-
-        # build helper sets from selected movies
-        union_selected_genres = set()
-        union_selected_top_actors = set()
-        selected_years = []
-        selected_directors = set()
-        selected_writers = set()
-        for sm in selected_movies:
-            if sm.genre:
-                union_selected_genres.update([g.strip() for g in sm.genre.split(',') if g.strip()])
-            if sm.actors:
-                union_selected_top_actors.update([a.strip() for a in sm.actors.split(',')][:ACTORS_TOP_N])
-            if getattr(sm, 'year', None):
-                try:
-                    selected_years.append(int(sm.year))
-                except Exception:
-                    pass
-            if sm.director:
-                selected_directors.add(sm.director.strip())
-            if getattr(sm, 'writer', None):
-                selected_writers.update([w.strip() for w in sm.writer.split(',') if w.strip()])
-
-        mean_selected_year = None
-        if selected_years:
-            mean_selected_year = sum(selected_years) / len(selected_years)
-
-        # candidate features
-        movie_genres = set([g.strip() for g in (candidate.genre or '').split(',') if g.strip()])
-        movie_actors = [a.strip() for a in (candidate.actors or '').split(',') if a.strip()]
-        movie_top_actors = set(movie_actors[:ACTORS_TOP_N])
-
-        breakdown = {}
-        score = 0.0
-
-        # Genre
-        if union_selected_genres:
-            shared_genres = union_selected_genres.intersection(movie_genres)
-            if len(union_selected_genres) == 1:
-                only_genre = next(iter(union_selected_genres))
-                if only_genre not in movie_genres:
-                    breakdown['genre'] = {'required_genre': only_genre, 'has_required': False, 'score': 0.0}
-                    print('Candidate lacks required single genre -> total score 0')
-                    print(breakdown)
-                    return
-            genre_fraction = len(shared_genres) / len(union_selected_genres)
-            gscore = WEIGHT_GENRE * genre_fraction
-            breakdown['genre'] = {'shared': list(shared_genres), 'fraction': genre_fraction, 'score': gscore}
-            score += gscore
-        else:
-            breakdown['genre'] = {'shared': [], 'fraction': 0.0, 'score': 0.0}
-
-        # Director / Writer: split weights
-        director_match = candidate.director and candidate.director.strip() in selected_directors
-        writer_match = getattr(candidate, 'writer', None) and any(w.strip() in selected_writers for w in (candidate.writer or '').split(','))
-        dw_score = 0.0
-        if director_match:
-            dw_score += WEIGHT_DIRECTOR
-        if writer_match:
-            dw_score += WEIGHT_WRITER
-        breakdown['director_writer'] = {'director_match': director_match, 'writer_match': writer_match, 'score': dw_score}
-        score += dw_score
-
-        # Actors: threshold-based scoring
-        shared_actor_count = len(union_selected_top_actors.intersection(movie_top_actors)) if union_selected_top_actors else 0
-        actor_score = 0.0
-        if shared_actor_count >= 3:
-            actor_score = WEIGHT_ACTORS
-        elif shared_actor_count == 2:
-            actor_score = round(0.75 * WEIGHT_ACTORS, 2)
-        elif shared_actor_count == 1:
-            actor_score = round(0.4 * WEIGHT_ACTORS, 2)
-        breakdown['actors'] = {'shared_top_actors': list(union_selected_top_actors.intersection(movie_top_actors)), 'shared_count': shared_actor_count, 'score': actor_score}
-        score += actor_score
-
-        # Year
-        yscore = 0.0
-        if mean_selected_year and getattr(candidate, 'year', None):
-            try:
-                diff = abs(int(candidate.year) - mean_selected_year)
-                if diff <= YEAR_WINDOW:
-                    yscore = WEIGHT_YEAR * (1 - (diff / YEAR_WINDOW))
-            except Exception:
-                yscore = 0.0
-        breakdown['year'] = {'candidate_year': candidate.year, 'mean_selected_year': mean_selected_year, 'score': yscore}
-        score += yscore
-
-        breakdown['total_score'] = score
-        breakdown['candidate_title'] = candidate.title
-        breakdown['candidate_id'] = candidate.id
-        print(breakdown)
+from database import app_context
+from models import db, Movie
+import recommender
+
+
+COLUMNS = ('rank', 'movie_id', 'title', 'score') + recommender.COMPONENTS + (
+    'shared_genres', 'shared_actors', 'director_match', 'writer_match', 'candidate_year')
+
+
+def explain_selection(selected_titles, top=50, sort='score'):
+    """Breakdown rows for the candidates of ``selected_titles`` (all of them when ``top`` is 0)."""
+    with app_context():
+        seeds = [m.id for m in Movie.query.filter(Movie.title.in_(selected_titles)).all()]
+        if not seeds:
+            print('No seed movies found')
+            return []
+        # re-sorting needs every candidate; the score order is the scorer's own
+        rows = recommender.explain(seeds, k=top or None if sort == 'score' else None)
+        if sort != 'score':
+            rows.sort(key=lambda r: (-(r[sort] or 0), r['rank']))
+            rows = rows[:top or None]
+        titles = dict(db.session.query(Movie.id, Movie.title).filter(Movie.id.in_([r['movie_id'] for r in rows])))
+    for r in rows:
+        r['title'] = titles.get(r['movie_id'], '')
+    return rows
+
+
+def explain_candidate(selected_titles, candidate_title):
+    """The breakdown row of one candidate, from the same scoring pass (None if it scores 0)."""
+    with app_context():
+        candidate = Movie.query.filter(Movie.title == candidate_title).first()
+    if not candidate:
+        print('Candidate not found')
+        return None
+    rows = explain_selection(selected_titles, top=0)
+    row = next((r for r in rows if r['movie_id'] == candidate.id), None)
+    if rows and row is None:
+        print(f'{candidate.title} ({candidate.id}) is not a candidate: it is a seed or scores 0')
+    return row
+
+
+def print_table(rows, out=sys.stdout):
+    scores = ('score',) + recommender.COMPONENTS
+
+    def cell(column, value):
+        if column in scores:
+            return f'{value:.2f}'
+        if isinstance(value, bool):
+            return 'y' if value else ''
+        return '' if value is None else str(value)
+
+    table = [[cell(c, r[c]) for c in COLUMNS] for r in rows]
+    widths = [max([len(c)] + [len(line[i]) for line in table]) for i, c in enumerate(COLUMNS)]
+    widths[2] = min(widths[2], 40)
+    out.write('  '.join(c.ljust(w) for c, w in zip(COLUMNS, widths)).rstrip() + '\n')
+    for line in table:
+        out.write('  '.join(v[:w].ljust(w) for v, w in zip(line, widths)).rstrip() + '\n')
+
+
+def write_csv(rows, out=sys.stdout):
+    writer = csv.DictWriter(out, fieldnames=COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows)
 
 
 if __name__ == '__main__':
-    # Example: check Spider-Man 3 and The Avengers vs Iron Man
-    selected = ['Spider-Man 3', 'The Avengers']
-    candidate = 'Iron Man'
-    compute_score_for_candidate(selected, candidate)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('seeds', nargs='*', default=['Spider-Man 3', 'The Avengers'], help='seed movie titles')
+    parser.add_argument('--candidate', help='explain a single candidate title instead')
+    parser.add_argument('--top', type=int, default=50, help='rows to show, 0 for every candidate')
+    parser.add_argument('--sort', default='score', choices=[c for c in COLUMNS if c != 'title'],
+                        help='column to sort by, largest first')
+    parser.add_argument('--csv', action='store_true', help='write CSV instead of a table')
+    args = parser.parse_args()
+
+    if args.candidate:
+        row = explain_candidate(args.seeds, args.candidate)
+        rows = [row] if row else []
+    else:
+        rows = explain_selection(args.seeds, args.top, args.sort)
+    if rows:
+        if args.csv:
+            write_csv(rows)
+        else:
+            print_table(rows)
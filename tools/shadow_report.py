@@ -0,0 +1,96 @@
+"""Summarize shadow-mode comparisons written by shadow.py.
+
+    python tools/shadow_report.py                         # instance/shadow.jsonl
+    python tools/shadow_report.py --engine taste --worst 10
+    python tools/shadow_report.py --min-overlap 0.95      # exit 1 if mean overlap@K is lower
+
+Reports, per shadow engine: samples, latency percentiles of the primary and
+shadow engines side by side, mean / p5 / min overlap@K, the share of samples
+with identical top-K membership, and mean Kendall's tau. --worst lists the
+seed sets with the lowest overlap.
+"""
+import argparse
+import json
+import statistics
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from shadow import SHADOW_LOG
+
+
+def load(path, engine=None):
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if engine is None or record.get('engine') == engine:
+                records.append(record)
+    return records
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def summarize(records):
+    overlaps = [r['overlap'] for r in records]
+    taus = [r['tau'] for r in records if r.get('tau') is not None]
+    summary = {'samples': len(records)}
+    for role in ('primary', 'shadow'):
+        ms = [r[f'{role}_ms'] for r in records]
+        summary[f'{role}_ms'] = {f'p{p}': percentile(ms, p) for p in (50, 95, 99)}
+    summary['overlap'] = {'mean': round(statistics.fmean(overlaps), 4), 'p5': percentile(overlaps, 5),
+                          'min': min(overlaps), 'identical': round(sum(o == 1 for o in overlaps) / len(overlaps), 4)}
+    summary['tau_mean'] = round(statistics.fmean(taus), 4) if taus else None
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--log', default=SHADOW_LOG)
+    parser.add_argument('--engine', help='only this shadow engine')
+    parser.add_argument('--worst', type=int, default=5, help='list the N samples with the lowest overlap')
+    parser.add_argument('--min-overlap', type=float, help='exit 1 if any engine has a lower mean overlap@K')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args()
+
+    try:
+        records = load(args.log, args.engine)
+    except FileNotFoundError:
+        sys.exit(f'No shadow log at {args.log} (set SHADOW_ENGINE and SHADOW_SAMPLE_RATE)')
+    by_engine = defaultdict(list)
+    for record in records:
+        by_engine[record['engine']].append(record)
+    report = {engine: summarize(rows) for engine, rows in sorted(by_engine.items())}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for engine, summary in report.items():
+            k = by_engine[engine][0].get('k')
+            print(f"== {engine}: {summary['samples']} samples, top {k}")
+            for role in ('primary', 'shadow'):
+                ms = summary[f'{role}_ms']
+                print(f"  {role:<8} p50 {ms['p50']:.2f}ms  p95 {ms['p95']:.2f}ms  p99 {ms['p99']:.2f}ms")
+            o = summary['overlap']
+            print(f"  overlap@{k} mean {o['mean']:.3f}  p5 {o['p5']:.3f}  min {o['min']:.3f}  "
+                  f"identical {o['identical']:.1%}")
+            print(f"  kendall tau mean {summary['tau_mean'] if summary['tau_mean'] is not None else 'n/a'}")
+            for r in sorted(by_engine[engine], key=lambda r: r['overlap'])[:args.worst]:
+                print(f"    overlap {r['overlap']:.2f} seeds {r['seeds']} filters {r.get('filters')}")
+
+    if args.min_overlap is not None:
+        failed = [engine for engine, summary in report.items() if summary['overlap']['mean'] < args.min_overlap]
+        for engine in failed:
+            print(f"OVERLAP {engine}: {report[engine]['overlap']['mean']} < {args.min_overlap}")
+        sys.exit(1 if failed else 0)
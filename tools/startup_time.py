@@ -0,0 +1,136 @@
+"""Measure how long each entry point takes to start.
+
+Each entry point is imported (and, for the web app, built) in a fresh
+interpreter several times; the median wall time is reported next to the bare
+interpreter start, along with the slowest imports from ``python -X importtime``.
+
+    python tools/startup_time.py                          # all entry points
+    python tools/startup_time.py --only app database      # a subset
+    python tools/startup_time.py --save startup.json      # record a baseline
+    python tools/startup_time.py --compare startup.json   # exit 1 on a regression
+
+--compare fails when an entry point got slower than the baseline by more than
+--max-regression (fraction, default 0.25) and --min-delta-ms (default 30).
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _tool(name):
+    # import a tools/ script without running its __main__ block
+    return ('import importlib.util; '
+            f"spec = importlib.util.spec_from_file_location('{name}', 'tools/{name}.py'); "
+            'spec.loader.exec_module(importlib.util.module_from_spec(spec))')
+
+
+ENTRY_POINTS = {
+    'interpreter': 'pass',
+    'app': 'import app; app.create_app()',
+    'asgi': 'import asgi',
+    'database': 'import database; database.get_app()',
+    'recommender': 'import recommender',
+    'snapshot': 'import snapshot',
+    'seed': 'import seed',
+    'create_db': 'import create_db',
+    'batch_recommend': _tool('batch_recommend'),
+    'score_debug': _tool('score_debug'),
+    'recommend_by_algorithm': _tool('recommend_by_algorithm'),
+    'tmdb_enrich': _tool('tmdb_enrich'),
+}
+
+
+def run_once(code, importtime=False):
+    cmd = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    started = time.perf_counter()
+    out = subprocess.run(cmd, cwd=str(ROOT), capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else 'failed')
+    return elapsed, out.stderr
+
+
+def _imports(stderr, max_depth):
+    """(cumulative microseconds, module) from -X importtime output, down to ``max_depth`` nesting."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= max_depth:
+            rows.append((int(cumulative), name.strip()))
+    return rows
+
+
+def slowest_imports(stderr, n, skip=()):
+    """The ``n`` slowest imports made by an entry point (its own module and interpreter startup excluded)."""
+    rows = sorted(((us, name) for us, name in _imports(stderr, 1) if name not in skip), reverse=True)
+    return [f'{name} {us / 1000:.0f}ms' for us, name in rows[:n]]
+
+
+def measure(names, repeat):
+    report = {}
+    startup = {name for _, name in _imports(run_once('pass', importtime=True)[1], 9)}
+    for name in names:
+        try:
+            samples = [run_once(ENTRY_POINTS[name])[0] for _ in range(repeat)]
+            _, stderr = run_once(ENTRY_POINTS[name], importtime=True)
+        except RuntimeError as e:
+            print(f"{name}: {e}", file=sys.stderr)
+            continue
+        report[name] = {'median_ms': round(statistics.median(samples) * 1000, 1),
+                        'min_ms': round(min(samples) * 1000, 1),
+                        'slowest_imports': slowest_imports(stderr, 3, startup | {name})}
+    return report
+
+
+def compare(report, baseline, max_regression, min_delta_ms):
+    failed = []
+    for name, entry in report.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        delta = entry['median_ms'] - before['median_ms']
+        if delta > min_delta_ms and delta > before['median_ms'] * max_regression:
+            failed.append(f"{name}: {before['median_ms']}ms -> {entry['median_ms']}ms")
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=list(ENTRY_POINTS), help='entry points to measure')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help='write the measurements to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file written by --save')
+    parser.add_argument('--max-regression', type=float, default=0.25)
+    parser.add_argument('--min-delta-ms', type=float, default=30)
+    args = parser.parse_args()
+
+    names = args.only or list(ENTRY_POINTS)
+    if 'interpreter' not in names:
+        names = ['interpreter'] + names
+    report = measure(names, args.repeat)
+
+    base = report.get('interpreter', {}).get('median_ms', 0)
+    print(f'{"entry point":<24} {"median":>9} {"min":>9} {"-python":>9}  slowest imports')
+    for name, entry in report.items():
+        print(f"{name:<24} {entry['median_ms']:>7.1f}ms {entry['min_ms']:>7.1f}ms "
+              f"{entry['median_ms'] - base:>7.1f}ms  {', '.join(entry['slowest_imports'])}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'entry_points': report}, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['entry_points']
+        failed = compare(report, baseline, args.max_regression, args.min_delta_ms)
+        for line in failed:
+            print(f'REGRESSION {line}')
+        sys.exit(1 if failed else 0)
@@ -8,11 +8,11 @@ from dotenv import load_dotenv
 import sys
 from pathlib import Path
 
-# ensure project root is on sys.path so `from app import app` works when running from tools/
+# ensure project root is on sys.path so `from database import app_context` works when running from tools/
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 
-from app import app
+from database import app_context
 from models import db, Movie
 
 # load .env from project root if present
@@ -109,7 +109,7 @@ def update_movie_from_tmdb(movie, tmdb_data):
 
 
 def run_enrichment(api_key, limit=None, only_missing_poster=True, batch_commit=25, sleep_between=0.15):
-    with app.app_context():
+    with app_context():
         q = Movie.query
         if only_missing_poster:
             q = q.filter((Movie.poster_url == None) | (Movie.poster_url.like('%No+Image%')))